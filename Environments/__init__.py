@@ -1,3 +1,5 @@
 from .multiAttribute import multiAttribute
 from .delayedFeedback import delayedFeedback
-from .counterFactual import counterFactual
\ No newline at end of file
+from .counterFactual import counterFactual
+from .batchMultiAttribute import BatchMultiAttribute
+from .trialStream import TrialStream
\ No newline at end of file
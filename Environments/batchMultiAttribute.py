@@ -0,0 +1,160 @@
+import numpy as np
+from .trialStream import trial_rewards
+
+
+class ChoiceDicts:
+    def __init__(self, env, codes):
+        """
+        Lazy view of a batch of integer coded choices as the lists of dictionaries used by
+        the single environment classes, built only for the environments actually indexed.
+        """
+        self.env = env
+        self.codes = codes
+        self.cache = {}
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, envIdx):
+        if(envIdx not in self.cache):
+            self.cache[envIdx] = [{attribute: self.env.values[code] for attribute, code in zip(self.env.attributes, choice)} for choice in self.codes[envIdx]]
+        return self.cache[envIdx]
+
+
+class BatchMultiAttribute:
+    def __init__(self, args, batch, rng=None, trials=None):
+        """
+        B independent multiAttribute (or, equivalently, counterFactual) environments,
+        stepped together. Choices are an integer array of shape (B, nc, na) of value
+        codes, code k being "Value k", and rewards and correctness are drawn for all the
+        environments at once.
+
+        :param batch: The number of environments, B.
+        :param rng: A numpy Generator, or a list of B Generators, one for each environment,
+                    from which only that environment draws, so that its choices and
+                    rewards do not depend on the other environments of the batch; by
+                    default one Generator is seeded from args.seed.
+        :param trials: Optionally, a TrialStream of at least B agents, whose trials are
+                       replayed instead of drawing choices and rewards at random.
+        """
+        self.args = args
+        self.batch = batch
+        if(isinstance(rng, (list, tuple))):
+            if(len(rng) != batch):
+                print("There must be one Generator for each environment")
+                assert(False)
+            self.rng = None
+            self.rngs = list(rng)
+        else:
+            self.rng = np.random.default_rng(args.seed) if rng is None else rng
+            self.rngs = None
+        self.trials = trials
+        self.phase = 0
+        self.trial = -1
+
+        self.num_dims = args.nd
+        self.num_attributes = args.na
+        self.num_choices = args.nc
+        self.values = ["Value " + str(value) for value in range(2*self.num_dims)]
+        self.attributes = ["Attribute " + str(attribute) for attribute in range(self.num_attributes)]
+        # Codes of the values currently in use are offset + 0..nd-1
+        self.offset = 0
+        if(self.trials is None):
+            self.valued_dim = self.integers(self.num_dims)
+            self.valued_attribute = self.integers(self.num_attributes)
+        else:
+            self.valued_dim = np.array(self.trials.valued_dim[:batch, 0], dtype=np.intp)
+            self.valued_attribute = np.array(self.trials.valued_attribute[:batch, 0], dtype=np.intp)
+        self.envIdx = np.arange(batch)
+        self.hasReset = False
+        self.choices = None
+        self.pending_choices = None
+
+    def integers(self, high, shape=()):
+        """Random integers below high, of the given shape for every environment."""
+        if(self.rngs is None):
+            return self.rng.integers(high, size=(self.batch,) + shape)
+        return np.array([rng.integers(high, size=shape) for rng in self.rngs])
+
+    def random(self, shape=()):
+        """Uniform random numbers, of the given shape for every environment."""
+        if(self.rngs is None):
+            return self.rng.random((self.batch,) + shape)
+        return np.array([rng.random(shape) for rng in self.rngs])
+
+    def normal(self, scale):
+        """A normal random number of mean 0 for every environment."""
+        if(self.rngs is None):
+            return self.rng.normal(0, scale, self.batch)
+        return np.array([rng.normal(0, scale) for rng in self.rngs])
+
+    @property
+    def valued_codes(self):
+        """The code of the rewarded value in each environment."""
+        return self.offset + self.valued_dim
+
+    def get_choices(self):
+        self.pending_choices = self.choices
+        if(self.trials is not None):
+            self.trial += 1
+            orderings = np.asarray(self.trials.orderings[:self.batch, self.phase, self.trial], dtype=np.intp)
+        else:
+            # An independent random ordering of the values for every attribute of every environment
+            orderings = np.argsort(self.random((self.num_attributes, self.num_dims)), axis=2)
+        self.choices = orderings[:, :, :self.num_choices].transpose(0, 2, 1) + self.offset
+        return self.choices
+
+    def choice_dicts(self, choices=None):
+        """
+        The choices as a lazily built sequence, indexed by environment, of lists of dictionaries.
+        """
+        return ChoiceDicts(self, self.choices if choices is None else choices)
+
+    def reset(self):
+        if(self.hasReset):
+            print("This environment does not support multiple resets.")
+            assert(False)
+        if(self.args.id or self.args.ed):
+            # New attribute values
+            self.offset = self.num_dims
+        if(self.args.ed):
+            # New dimension being relevant
+            if(self.trials is None):
+                self.valued_dim = self.integers(self.num_dims)
+                self.valued_attribute = self.integers(self.num_attributes)
+            else:
+                self.valued_dim = np.array(self.trials.valued_dim[:self.batch, 1], dtype=np.intp)
+                self.valued_attribute = np.array(self.trials.valued_attribute[:self.batch, 1], dtype=np.intp)
+        self.phase = 1
+        self.trial = -1
+        self.hasReset = True
+        return self.get_choices()
+
+    def step(self, actions):
+        """
+        Every environment responds to the choice made in it.
+
+        :param actions: The index of the choice made in each environment, of shape (B,).
+        :return: The next choices; the rewards, of shape (B,), or (B, nc) for "Additional"
+                 feedback; and whether each choice was correct, of shape (B,).
+        """
+        if(self.trials is not None):
+            highReward, lowReward = trial_rewards(self.trials.uniforms[:self.batch, self.phase, self.trial], self.trials.normals[:self.batch, self.phase, self.trial], self.args.risky)
+        elif(self.args.risky):
+            highReward = np.where(self.random() < 0.5, 10.0, 0.0)   # Higher reward risky option
+            lowReward = np.full(self.batch, 4.0)                                # Lower reward safe option
+        else:
+            highReward = (self.random() < 0.75) + self.normal(.1)
+            lowReward = (self.random() < 0.25) + self.normal(.1)
+
+        valued = self.choices[self.envIdx, :, self.valued_attribute] == self.valued_codes[:, None]
+        correct = valued[self.envIdx, actions].astype(int)
+        reward = np.where(correct, highReward, lowReward)
+
+        if(self.args.feedback == "Additional"):
+            # As in multiAttribute, the last choice is rewarded if none has the valued value
+            choice_idx = np.where(valued.any(axis=1), self.num_choices - 1 - np.argmax(valued[:, ::-1], axis=1), self.num_choices - 1)
+            reward = np.repeat(lowReward[:, None], self.num_choices, axis=1)
+            reward[self.envIdx, choice_idx] = highReward
+
+        return self.get_choices(), reward, correct
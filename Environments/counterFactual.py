@@ -3,8 +3,15 @@ import random
 import copy
 
 class counterFactual:
-    def __init__(self, args):
+    def __init__(self, args, trials=None):
+        """
+        :param trials: Optionally, an agent's precomputed trials from a TrialStream, which
+                       are replayed instead of drawing choices and rewards at random.
+        """
         self.args = args
+        self.trials = trials
+        self.phase = 0
+        self.trial = -1
         #np.random.seed(args.seed)
         #random.seed(args.seed)
 
@@ -14,8 +21,12 @@ class counterFactual:
         self.values = ["Value " + str(value) for value in range(self.num_dims)]
         self.default_values = copy.deepcopy(self.values)
         self.attributes = ["Attribute " + str(attribute) for attribute in range(self.num_attributes)]
-        self.valued_dim = np.random.choice(range(self.num_dims))
-        self.valued_attribute = np.random.choice(range(self.num_attributes))
+        if(self.trials is None):
+            self.valued_dim = np.random.choice(range(self.num_dims))
+            self.valued_attribute = np.random.choice(range(self.num_attributes))
+        else:
+            self.valued_dim = int(self.trials.valued_dim[0])
+            self.valued_attribute = int(self.trials.valued_attribute[0])
         self.hasReset = False
         self.choices = []
         self.pending_choices = None 
@@ -24,6 +35,13 @@ class counterFactual:
     def get_choices(self):
         self.pending_choices = self.choices
         self.choices = [{} for _ in range(self.num_choices)]
+        if(self.trials is not None):
+            self.trial += 1
+            orderings = self.trials.orderings[self.phase, self.trial]
+            for attributeIdx, attribute in enumerate(self.attributes):
+                for choice_idx in range(self.num_choices):
+                    self.choices[choice_idx][attribute] = self.default_values[orderings[attributeIdx, choice_idx]]
+            return self.choices
         for attribute in self.attributes :
             np.random.shuffle(self.values)
             for choice_idx in range(self.num_choices):
@@ -43,13 +61,21 @@ class counterFactual:
             self.values = ["Value " + str(value) for value in range(self.num_dims, 2*self.num_dims)]
             self.default_values = copy.deepcopy(self.values)
             # New dimension being relevant 
-            self.valued_dim = np.random.choice(range(self.num_dims))
-            self.valued_attribute = np.random.choice(range(self.num_attributes))
+            if(self.trials is None):
+                self.valued_dim = np.random.choice(range(self.num_dims))
+                self.valued_attribute = np.random.choice(range(self.num_attributes))
+            else:
+                self.valued_dim = int(self.trials.valued_dim[1])
+                self.valued_attribute = int(self.trials.valued_attribute[1])
+        self.phase = 1
+        self.trial = -1
         self.hasReset = True 
         return self.get_choices() 
 
     def step(self, action=None):
-        if(self.args.risky):
+        if(self.trials is not None):
+            highReward, lowReward = self.trials.rewards(self.phase, self.trial, self.args.risky)
+        elif(self.args.risky):
             highReward = np.random.choice([0,10], 1, p=[0.5, 0.5])[0]   # Higher reward risky option
             lowReward = 4                                               # Lower reward safe option
         else:
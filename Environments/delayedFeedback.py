@@ -3,8 +3,15 @@ import random
 import copy
 
 class delayedFeedback:
-    def __init__(self, args):
+    def __init__(self, args, trials=None):
+        """
+        :param trials: Optionally, an agent's precomputed trials from a TrialStream, which
+                       are replayed instead of drawing choices and rewards at random.
+        """
         self.args = args
+        self.trials = trials
+        self.phase = 0
+        self.trial = -1
         #np.random.seed(args.seed)
         #random.seed(args.seed)
 
@@ -23,6 +30,13 @@ class delayedFeedback:
     def get_choices(self):
         self.pending_choices = self.choices
         self.choices = [{} for _ in range(self.num_choices)]
+        if(self.trials is not None):
+            self.trial += 1
+            orderings = self.trials.orderings[self.phase, self.trial]
+            for attributeIdx, attribute in enumerate(self.attributes):
+                for choice_idx in range(self.num_choices):
+                    self.choices[choice_idx][attribute] = self.default_values[orderings[attributeIdx, choice_idx]]
+            return self.choices
         for attribute in self.attributes :
             np.random.shuffle(self.values)
             for choice_idx in range(self.num_choices):
@@ -30,8 +44,11 @@ class delayedFeedback:
         return self.choices 
 
     def step(self, action=None):
-        highReward = np.random.choice([0,10], 1, p=[0.5, 0.5])[0]   # Higher reward risky option
-        lowReward = 4                                               # Lower reward safe option
+        if(self.trials is not None):
+            highReward, lowReward = self.trials.rewards(self.phase, self.trial, True)
+        else:
+            highReward = np.random.choice([0,10], 1, p=[0.5, 0.5])[0]   # Higher reward risky option
+            lowReward = 4                                               # Lower reward safe option
 
         correct = 0
         if(list(action.values())[0] == self.default_values[self.valued_dim]):
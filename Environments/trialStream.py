@@ -0,0 +1,134 @@
+import os
+import numpy as np
+
+
+class AgentTrials:
+    def __init__(self, stream, agentIdx):
+        """
+        The trials of a single agent of a TrialStream, as read by the environments.
+        """
+        self.orderings = stream.orderings[agentIdx]
+        self.valued_dim = stream.valued_dim[agentIdx]
+        self.valued_attribute = stream.valued_attribute[agentIdx]
+        self.uniforms = stream.uniforms[agentIdx]
+        self.normals = stream.normals[agentIdx]
+
+    def rewards(self, phase, trial, risky):
+        """
+        The high and low rewards of a trial.
+        """
+        highReward, lowReward = trial_rewards(self.uniforms[phase, trial], self.normals[phase, trial], risky)
+        return float(highReward), float(lowReward)
+
+
+def trial_rewards(uniforms, normals, risky):
+    """
+    Turn the uniform and normal draws of trials, whose last axis is (high, low), into
+    their high and low rewards, as drawn by the environments' step methods.
+    """
+    uniforms = np.asarray(uniforms)
+    normals = np.asarray(normals)
+    if(risky):
+        highReward = np.where(uniforms[..., 0] < 0.5, 10.0, 0.0)   # Higher reward risky option
+        lowReward = np.full(uniforms.shape[:-1], 4.0)              # Lower reward safe option
+    else:
+        highReward = (uniforms[..., 0] < 0.75) + normals[..., 0]
+        lowReward = (uniforms[..., 1] < 0.25) + normals[..., 1]
+    return highReward, lowReward
+
+
+class TrialStream:
+    names = ["orderings", "valued_dim", "valued_attribute", "uniforms", "normals"]
+
+    def __init__(self, orderings, valued_dim, valued_attribute, uniforms, normals, seed=None):
+        """
+        Precomputed trials for a population of agents, so that every model can be shown
+        exactly the same choices and rewards (common random numbers). For every agent and
+        both phases, before and after the intra- or extra-dimensional shift, it holds the
+        ordering of the values of every attribute on every trial, the valued dimension
+        and attribute, and the uniform and normal draws from which the rewards are made.
+        These do not depend on the shift, feedback or risk condition, so the same stream
+        serves every condition.
+
+        orderings:        (agents, 2, timesteps + 1, na, nd) value indices
+        valued_dim:       (agents, 2)
+        valued_attribute: (agents, 2)
+        uniforms:         (agents, 2, timesteps + 1, 2) for the (high, low) rewards
+        normals:          (agents, 2, timesteps + 1, 2) for the (high, low) rewards
+        """
+        self.orderings = orderings
+        self.valued_dim = valued_dim
+        self.valued_attribute = valued_attribute
+        self.uniforms = uniforms
+        self.normals = normals
+        self.seed = seed
+
+    def __len__(self):
+        return len(self.orderings)
+
+    @classmethod
+    def generate(cls, args, agents, seed=None):
+        """
+        Draw the trials of agents agents, each from its own generator seeded with
+        (seed, agent index), so an agent's trials do not depend on how many agents
+        there are.
+        """
+        seed = args.seed if seed is None else seed
+        trials = args.timesteps + 1     # The choices following the last step are also drawn
+        orderings = np.empty((agents, 2, trials, args.na, args.nd), dtype=np.int16)
+        valued_dim = np.empty((agents, 2), dtype=np.int16)
+        valued_attribute = np.empty((agents, 2), dtype=np.int16)
+        uniforms = np.empty((agents, 2, trials, 2))
+        normals = np.empty((agents, 2, trials, 2))
+        for agentIdx in range(agents):
+            rng = np.random.default_rng([seed, agentIdx])
+            orderings[agentIdx] = np.argsort(rng.random((2, trials, args.na, args.nd)), axis=3)
+            valued_dim[agentIdx] = rng.integers(args.nd, size=2)
+            valued_attribute[agentIdx] = rng.integers(args.na, size=2)
+            uniforms[agentIdx] = rng.random((2, trials, 2))
+            normals[agentIdx] = rng.normal(0, .1, (2, trials, 2))
+        return cls(orderings, valued_dim, valued_attribute, uniforms, normals, seed=seed)
+
+    def save(self, path):
+        """
+        Write the stream to the directory path, one .npy file per array.
+        """
+        os.makedirs(path, exist_ok=True)
+        for name in self.names:
+            np.save(os.path.join(path, name + ".npy"), getattr(self, name))
+        np.save(os.path.join(path, "seed.npy"), np.array(-1 if self.seed is None else self.seed))
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        """
+        Read a stream written by save, memory-mapping its arrays by default.
+        """
+        seed = int(np.load(os.path.join(path, "seed.npy")))
+        return cls(*[np.load(os.path.join(path, name + ".npy"), mmap_mode=mmap_mode) for name in cls.names], seed=None if seed < 0 else seed)
+
+    @classmethod
+    def open(cls, path, args, agents):
+        """
+        Load the stream at path if it covers agents agents with the seed and shape described
+        by args, otherwise generate it and save it there first.
+        """
+        if(os.path.exists(os.path.join(path, "seed.npy"))):
+            stream = cls.load(path)
+            if(stream.seed == args.seed and len(stream) >= agents and stream.orderings.shape[2:] == (args.timesteps + 1, args.na, args.nd)):
+                return stream
+        stream = cls.generate(args, agents)
+        stream.save(path)
+        return cls.load(path)
+
+    def agent(self, agentIdx):
+        """
+        The trials of one agent, to be passed to an environment.
+        """
+        return AgentTrials(self, agentIdx)
+
+    def subset(self, agentIdx):
+        """
+        A stream of the trials of only the agents whose indices are given, in that order,
+        such as those of one shard of a sweep.
+        """
+        return TrialStream(*[np.asarray(getattr(self, name)[agentIdx]) for name in self.names], seed=self.seed)
@@ -0,0 +1,4 @@
+from .recorder import Recorder
+from .sweep import Sweep
+from .store import ResultStore
+from .curves import LearningCurves
\ No newline at end of file
@@ -0,0 +1,176 @@
+import numpy as np
+import pandas as pd
+import seaborn as sns
+
+
+class LearningCurves:
+    def __init__(self, keys, values=("Correct", "Reward"), bin_width=1, capacity=256):
+        """
+        Running means and variances of values, such as Correct and Reward, for every group
+        of keys, such as (Name, Feedback, IntraDimensional, ExtraDimensional), and Timestep
+        bin, updated row by row with Welford's algorithm, or population by population with
+        Chan et al.'s pairwise combination. It takes the place of a Recorder, with the same
+        record, record_many and to_frame methods, when only the learning curves are wanted
+        and not every trial. Missing (None or NaN) values are not counted.
+
+        :param keys: The names of the columns identifying a curve.
+        :param values: The names of the columns averaged.
+        :param bin_width: The width of the Timestep bins; a row of timestep t is counted in
+                          the bin starting at t // bin_width * bin_width.
+        :param capacity: The number of (curve, bin) groups initially allocated for.
+        """
+        self.keys = list(keys)
+        self.values = list(values)
+        self.bin_width = bin_width
+        self.groups = {}
+        capacity = max(int(capacity), 1)
+        self.count = np.zeros((capacity, len(self.values)))
+        self.mean = np.zeros((capacity, len(self.values)))
+        self.m2 = np.zeros((capacity, len(self.values)))
+
+    def __len__(self):
+        return len(self.groups)
+
+    def _group(self, row, timestep):
+        group = tuple(row[key] for key in self.keys) + (int(timestep) // self.bin_width * self.bin_width,)
+        if(group not in self.groups):
+            if(len(self.groups) == len(self.count)):
+                for name in ("count", "mean", "m2"):
+                    array = getattr(self, name)
+                    setattr(self, name, np.concatenate([array, np.zeros_like(array)]))
+            self.groups[group] = len(self.groups)
+        return self.groups[group]
+
+    def _combine(self, idx, count, mean, m2):
+        # Chan et al.'s combination of the group's statistics with those of a batch
+        total = self.count[idx] + count
+        delta = mean - self.mean[idx]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.mean[idx] = np.where(total > 0, self.mean[idx] + delta * count / total, 0)
+            self.m2[idx] = np.where(total > 0, self.m2[idx] + m2 + delta**2 * self.count[idx] * count / total, 0)
+        self.count[idx] = total
+
+    def record(self, Timestep, **row):
+        """
+        Count a row, given as keyword arguments; arguments other than the keys, the values
+        and Timestep are ignored.
+        """
+        idx = self._group(row, Timestep)
+        x = np.array([np.nan if row[value] is None else row[value] for value in self.values], dtype=np.float64)
+        present = ~np.isnan(x)
+        self.count[idx] += present
+        delta = np.where(present, x - self.mean[idx], 0)
+        self.mean[idx] += np.where(present, delta / np.maximum(self.count[idx], 1), 0)
+        self.m2[idx] += np.where(present, delta * (np.where(present, x, 0) - self.mean[idx]), 0)
+
+    def record_many(self, Timestep, **columns):
+        """
+        Count several rows of the same curve and Timestep at once, such as one per agent of
+        a population: the keys are single values, and each value an array or a single value.
+        """
+        idx = self._group(columns, Timestep)
+        count = np.empty(len(self.values))
+        mean = np.empty(len(self.values))
+        m2 = np.empty(len(self.values))
+        for valueIdx, value in enumerate(self.values):
+            x = np.asarray(columns[value], dtype=np.float64).ravel()
+            x = x[~np.isnan(x)]
+            count[valueIdx] = len(x)
+            mean[valueIdx] = x.mean() if len(x) else 0
+            m2[valueIdx] = ((x - mean[valueIdx])**2).sum()
+        self._combine(idx, count, mean, m2)
+
+    def merge(self, other):
+        """
+        Add the counts of other LearningCurves, of the same keys and values, to these.
+        """
+        for group, otherIdx in other.groups.items():
+            idx = self._group(dict(zip(self.keys, group)), group[-1])
+            self._combine(idx, other.count[otherIdx], other.mean[otherIdx], other.m2[otherIdx])
+        return self
+
+    def to_frame(self):
+        """
+        The curves, one row per curve and Timestep bin, with for every value its mean,
+        and its Var (sample variance), Count and SEM (standard error of the mean).
+        """
+        n = len(self.groups)
+        data = {key: [group[keyIdx] for group in self.groups] for keyIdx, key in enumerate(self.keys)}
+        data["Timestep"] = np.array([group[-1] for group in self.groups], dtype=np.int64)
+        count = self.count[:n]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            var = np.where(count > 1, self.m2[:n] / (count - 1), np.nan)
+            sem = np.sqrt(var / count)
+        for valueIdx, value in enumerate(self.values):
+            data[value] = np.where(count[:, valueIdx] > 0, self.mean[:n, valueIdx], np.nan)
+            data[value + "Var"] = var[:, valueIdx]
+            data[value + "Count"] = count[:, valueIdx].astype(np.int64)
+            data[value + "SEM"] = sem[:, valueIdx]
+        df = pd.DataFrame(data)
+        for key in self.keys:
+            if(not pd.api.types.is_numeric_dtype(df[key])):
+                df[key] = df[key].astype("category")
+        return df.sort_values(self.keys + ["Timestep"], ignore_index=True)
+
+    @classmethod
+    def from_frame(cls, df, keys, values=("Correct", "Reward"), bin_width=1):
+        """
+        LearningCurves holding the curves of a frame made by to_frame.
+        """
+        curves = cls(keys, values, bin_width, capacity=len(df))
+        for row in df.itertuples(index=False):
+            row = row._asdict()
+            idx = curves._group(row, row["Timestep"])
+            count = np.array([row[value + "Count"] for value in curves.values], dtype=np.float64)
+            mean = np.array([row[value] if row[value + "Count"] > 0 else 0 for value in curves.values])
+            m2 = np.array([row[value + "Var"] * (row[value + "Count"] - 1) if row[value + "Count"] > 1 else 0 for value in curves.values])
+            curves._combine(idx, count, mean, m2)
+        return curves
+
+    @classmethod
+    def summarize(cls, df, keys, values=("Correct", "Reward"), bin_width=1):
+        """
+        The curves of a frame of raw, per trial, results, as made by to_frame, without
+        streaming; useful for results recorded in full.
+        """
+        df = df.assign(Timestep=df["Timestep"] // bin_width * bin_width)
+        grouped = df.groupby(list(keys) + ["Timestep"], observed=True)
+        summary = grouped.size().rename("Rows").reset_index().drop(columns="Rows")
+        for value in values:
+            statistics = grouped[value].agg(["mean", "var", "count"]).reset_index(drop=True)
+            summary[value] = statistics["mean"].to_numpy()
+            summary[value + "Var"] = statistics["var"].to_numpy()
+            summary[value + "Count"] = statistics["count"].to_numpy()
+            summary[value + "SEM"] = np.sqrt(summary[value + "Var"] / summary[value + "Count"])
+        return summary
+
+    @classmethod
+    def combine(cls, frames, keys, values=("Correct", "Reward"), bin_width=1):
+        """
+        Merge frames made by to_frame, such as those of the shards of a sweep, into one.
+        """
+        curves = cls(keys, values, bin_width)
+        for df in frames:
+            curves.merge(cls.from_frame(df, keys, values, bin_width))
+        return curves.to_frame()
+
+
+def lineplot(summary, x="Timestep", y="Correct", hue=None, ax=None, **kwargs):
+    """
+    Draw learning curves from a frame made by LearningCurves, as sns.lineplot would from
+    the raw results, with a band of one standard error of the mean either side of each
+    curve, approximately the 68% confidence interval drawn by errorbar=('ci', 68).
+    """
+    kwargs.pop("errorbar", None)
+    ax = sns.lineplot(summary, x=x, y=y, hue=hue, ax=ax, errorbar=None, **kwargs)
+    if(isinstance(kwargs.get("palette"), list) and "hue_order" in kwargs):
+        colors = dict(zip(kwargs["hue_order"], kwargs["palette"]))
+    else:
+        # The legend's handles are labelled with the hue
+        colors = {line.get_label(): line.get_color() for line in ax.get_lines()}
+    groups = summary.groupby(hue, observed=True) if hue is not None else [(None, summary)]
+    for name, curve in groups:
+        curve = curve.sort_values(x)
+        color = colors.get(str(name)) if hue is not None else ax.get_lines()[-1].get_color()
+        ax.fill_between(curve[x], curve[y] - curve[y + "SEM"], curve[y] + curve[y + "SEM"], color=color, alpha=0.2, linewidth=0)
+    return ax
@@ -0,0 +1,346 @@
+import copy
+import argparse
+import itertools
+import concurrent.futures
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+import scipy.optimize
+from scipy.special import logsumexp
+from pyibl import Agent
+from Models import FRLAgent, FRLPopulation
+
+SQRT2 = np.sqrt(2)
+
+# One trial of a participant: the choices offered, each a dictionary from attribute names
+# to values; the index of the one chosen; and the outcome of the chosen option, a list of
+# the outcomes of every option (counterfactual feedback), or None (no feedback).
+Trial = namedtuple("Trial", ["choices", "chosen", "outcome"])
+
+
+def trials_from_frame(df, participant, chosen, attributes, outcome, options, order=None):
+    """
+    The trials of every participant in a frame of human data with one row per trial.
+
+    :param participant: The name of the column identifying participants.
+    :param chosen: The name of the column holding the index of the option chosen.
+    :param attributes: A dictionary from attribute names to the names of the columns
+                       holding their values, with {} standing for the option's index,
+                       such as {"color": "color_{}", "shape": "shape_{}"}.
+    :param outcome: The name of the column of the outcome of the option chosen, or, if it
+                    contains {}, of the columns of the outcomes of every option.
+    :param options: The number of options on every trial.
+    :param order: Optionally, the name of the column by which a participant's trials are ordered.
+    :return: A dictionary from participants to lists of Trials.
+    """
+    sequences = {}
+    for name, rows in df.groupby(participant, sort=True, observed=True):
+        if(order is not None):
+            rows = rows.sort_values(order)
+        columns = {attribute: [rows[column.format(optionIdx)].tolist() for optionIdx in range(options)] for attribute, column in attributes.items()}
+        if("{}" in outcome):
+            outcomes = list(zip(*[rows[outcome.format(optionIdx)].astype(float).tolist() for optionIdx in range(options)]))
+        else:
+            outcomes = rows[outcome].astype(float).tolist()
+        trials = []
+        for trialIdx, choiceIdx in enumerate(rows[chosen].astype(int).tolist()):
+            choices = [{attribute: columns[attribute][optionIdx][trialIdx] for attribute in attributes} for optionIdx in range(options)]
+            trialOutcome = list(outcomes[trialIdx]) if "{}" in outcome else outcomes[trialIdx]
+            trials.append(Trial(choices, choiceIdx, trialOutcome))
+        sequences[name] = trials
+    return sequences
+
+
+def trial_key(trial):
+    outcome = tuple(trial.outcome) if isinstance(trial.outcome, list) else trial.outcome
+    return (tuple(tuple(choice.items()) for choice in trial.choices), trial.chosen, outcome)
+
+
+class IBLTracer:
+    # The fitted parameters and their default bounds
+    parameters = {"noise": (0.05, 2.0), "decay": (0.05, 2.0), "mismatch_penalty": (0.0, 10.0)}
+
+    def __init__(self, params, attributes, default_utility=0.5):
+        """
+        Replays a participant's trials through a pyibl Agent, forcing the participant's
+        choices with respond(outcome, choice=...). Activation noise is not simulated, so
+        the blended values, and the likelihood, are deterministic; instead the probability
+        of a choice is the Boltzmann distribution of the blended values with the blending
+        temperature, by default the square root of 2 times the noise.
+        """
+        self.temperature = params.get("temperature", params["noise"] * SQRT2)
+        self.agent = Agent(attributes, noise=0, temperature=self.temperature, decay=params["decay"],
+                           mismatch_penalty=params.get("mismatch_penalty"), default_utility=default_utility)
+        if(params.get("mismatch_penalty") is not None):
+            self.agent.similarity(attributes, True)
+
+    def step(self, trial):
+        """
+        The log probability of the participant's choice on a trial, after which the
+        agent learns from its outcome.
+        """
+        _, details = self.agent.choose(trial.choices, details=True)
+        blended = {id(d["choice"]): d["blended_value"] for d in details}
+        values = np.array([blended[id(choice)] for choice in trial.choices]) / self.temperature
+        chosen = trial.choices[trial.chosen]
+        if(isinstance(trial.outcome, list)):
+            # Counterfactual feedback: the outcomes of the options not chosen are learned too
+            self.agent.respond(trial.outcome[trial.chosen], choice=chosen)
+            for choiceIdx, choice in enumerate(trial.choices):
+                if(choiceIdx != trial.chosen):
+                    self.agent.populate([choice], trial.outcome[choiceIdx], when=self.agent.time)
+        else:
+            self.agent.respond(trial.outcome, choice=chosen)
+        return values[trial.chosen] - logsumexp(values)
+
+
+class Coding:
+    def __init__(self, sequences):
+        """
+        The renaming of the attributes and values of a set of trials to the "Attribute i"
+        and "Value k" names used by FRLAgent and FRLPopulation.
+        """
+        self.attributes = list(dict.fromkeys(attribute for trials in sequences.values() for trial in trials for choice in trial.choices for attribute in choice))
+        self.values = list(dict.fromkeys(choice[attribute] for trials in sequences.values() for trial in trials for choice in trial.choices for attribute in self.attributes))
+        self.valueCodes = {value: code for code, value in enumerate(self.values)}
+        self.na = len(self.attributes)
+        self.nd = (len(self.values) + 1) // 2
+
+    def encode(self, choices):
+        return [{"Attribute " + str(attributeIdx): "Value " + str(self.valueCodes[choice[attribute]]) for attributeIdx, attribute in enumerate(self.attributes)} for choice in choices]
+
+    def codes(self, choices):
+        return [[self.valueCodes[choice[attribute]] for attribute in self.attributes] for choice in choices]
+
+    def args(self, params, default_utility):
+        return argparse.Namespace(na=self.na, nd=self.nd, lr=params["lr"], decay=params["decay"], softMaxInverseTemp=params["softMaxInverseTemp"], default_utility=default_utility)
+
+
+class FRLTracer:
+    # The fitted parameters and their default bounds
+    parameters = {"lr": (0.0, 1.0), "decay": (0.0, 1.0), "softMaxInverseTemp": (0.01, 50.0)}
+
+    def __init__(self, params, coding, default_utility=0.5):
+        """
+        Replays a participant's trials through an FRLAgent, forcing the participant's
+        choices; the probability of a choice is the softmax of the choices' values with
+        inverse temperature softMaxInverseTemp.
+        """
+        self.coding = coding
+        self.beta = params["softMaxInverseTemp"]
+        self.agent = FRLAgent(coding.args(params, default_utility), None)
+
+    def step(self, trial):
+        choices = self.coding.encode(trial.choices)
+        _, values = self.agent.choose(choices, details=True)
+        values = self.beta * np.array(values)
+        self.agent.respond(trial.outcome, choice=choices[trial.chosen])
+        return values[trial.chosen] - logsumexp(values)
+
+
+class _Node:
+    __slots__ = ("trial", "children", "logp")
+
+    def __init__(self, trial):
+        self.trial = trial
+        self.children = {}
+        self.logp = 0.0
+
+
+class PrefixTree:
+    def __init__(self, sequences):
+        """
+        The trials of every participant as a tree in which participants share the nodes of
+        the trials they share from the start, such as those of a common stimulus sequence,
+        so that the model's state after a shared prefix is computed only once.
+        """
+        self.root = _Node(None)
+        self.paths = {}
+        for participant, trials in sequences.items():
+            node = self.root
+            path = []
+            for trial in trials:
+                key = trial_key(trial)
+                if(key not in node.children):
+                    node.children[key] = _Node(trial)
+                node = node.children[key]
+                path.append(node)
+            self.paths[participant] = path
+
+    def evaluate(self, tracer):
+        """
+        The log probabilities of every participant's choices.
+
+        :param tracer: A function of no arguments returning a new tracer, such as an IBLTracer.
+        :return: A dictionary from participants to arrays of per trial log probabilities.
+        """
+        stack = [(self.root, tracer())]
+        while stack:
+            node, model = stack.pop()
+            children = list(node.children.values())
+            # Only branches need copies of the model; the last child continues with it
+            models = [copy.deepcopy(model) for _ in children[:-1]] + [model]
+            for child, childModel in zip(children, models):
+                child.logp = childModel.step(child.trial)
+                stack.append((child, childModel))
+        return {participant: np.array([node.logp for node in path]) for participant, path in self.paths.items()}
+
+
+def population_log_likelihoods(params, sequences, coding, default_utility=0.5):
+    """
+    The log probabilities of every participant's choices under FRL, computed for all the
+    participants at once with an FRLPopulation. Every trial must offer the same number of
+    options and have an outcome; participants with fewer trials are padded, and their
+    padding ignored.
+    """
+    participants = list(sequences)
+    population = len(participants)
+    length = max(len(trials) for trials in sequences.values())
+    agents = FRLPopulation(coding.args(params, default_utility), population)
+    logps = np.zeros((population, length))
+    agentIdx = np.arange(population)
+    for trialIdx in range(length):
+        trials = [sequences[participant][min(trialIdx, len(sequences[participant]) - 1)] for participant in participants]
+        codes = np.array([coding.codes(trial.choices) for trial in trials], dtype=np.intp)
+        chosen = np.array([trial.chosen for trial in trials], dtype=np.intp)
+        values = params["softMaxInverseTemp"] * agents.choice_values(codes)
+        logps[:, trialIdx] = values[agentIdx, chosen] - logsumexp(values, axis=1)
+        agents.choose(codes, chosen=chosen)
+        agents.respond(np.array([trial.outcome for trial in trials], dtype=np.float64))
+    return {participant: logps[participantIdx, :len(sequences[participant])] for participantIdx, participant in enumerate(participants)}
+
+
+class Likelihood:
+    def __init__(self, model, sequences, default_utility=0.5, fixed=None, vectorized=False):
+        """
+        The negative log likelihood of the choices of one or more participants under a
+        model, as a function of the model's parameters, found by model tracing: every
+        participant's trials are replayed through the model, which is made to choose as
+        the participant did, and the probabilities it gave to those choices are summed.
+        Participants' shared prefixes of trials are computed once, and values already
+        computed for the same parameters are remembered.
+
+        :param model: "IBL" or "FRL".
+        :param sequences: A dictionary from participants to lists of Trials.
+        :param default_utility: The model's value of options not yet experienced.
+        :param fixed: An optional dictionary of parameters held fixed.
+        :param vectorized: For FRL, compute every participant at once with an FRLPopulation,
+                           instead of one at a time.
+        """
+        assert(model in ("IBL", "FRL"))
+        self.model = model
+        self.sequences = sequences
+        self.default_utility = default_utility
+        self.fixed = dict(fixed or {})
+        self.vectorized = vectorized
+        self.tracer = IBLTracer if model == "IBL" else FRLTracer
+        self.names = [name for name in self.tracer.parameters if name not in self.fixed]
+        self.attributes = list(dict.fromkeys(attribute for trials in sequences.values() for trial in trials for choice in trial.choices for attribute in choice))
+        self.coding = Coding(sequences) if model == "FRL" else None
+        self.tree = None if vectorized else PrefixTree(sequences)
+        self.cache = {}
+
+    @property
+    def trials(self):
+        return sum(len(trials) for trials in self.sequences.values())
+
+    def params(self, x):
+        return dict(self.fixed, **dict(zip(self.names, (float(value) for value in x))))
+
+    def log_likelihoods(self, params):
+        """
+        The log probabilities of every participant's choices, given all the parameters.
+        """
+        if(self.vectorized):
+            return population_log_likelihoods(params, self.sequences, self.coding, self.default_utility)
+        if(self.model == "IBL"):
+            return self.tree.evaluate(lambda: IBLTracer(params, self.attributes, self.default_utility))
+        return self.tree.evaluate(lambda: FRLTracer(params, self.coding, self.default_utility))
+
+    def __call__(self, x):
+        """
+        The negative log likelihood of the free parameters x, in the order of names.
+        """
+        key = tuple(float(value) for value in x)
+        if(key not in self.cache):
+            self.cache[key] = -sum(logps.sum() for logps in self.log_likelihoods(self.params(x)).values())
+        return self.cache[key]
+
+
+class ScipyOptimizer:
+    def __init__(self, method="Nelder-Mead", **options):
+        """
+        Minimizes with scipy.optimize.minimize, using the given method and options.
+        """
+        self.method = method
+        self.options = options
+
+    def __call__(self, objective, x0, bounds):
+        result = scipy.optimize.minimize(objective, x0, method=self.method, bounds=bounds, options=self.options)
+        return result.x, result.fun
+
+
+class GridOptimizer:
+    def __init__(self, points=5):
+        """
+        Minimizes by evaluating every point of a regular grid of points values of each
+        parameter, spanning its bounds.
+        """
+        self.points = points
+
+    def __call__(self, objective, x0, bounds):
+        grid = itertools.product(*[np.linspace(low, high, self.points) for low, high in bounds])
+        best = min(((objective(np.array(x)), x) for x in grid), key=lambda result: result[0])
+        return np.array(best[1]), best[0]
+
+
+def fit(model, sequences, bounds=None, x0=None, optimizer=None, **kwargs):
+    """
+    Fit a model's parameters to the choices of the participants of sequences together.
+
+    :param bounds: A dictionary from the names of the free parameters to their bounds;
+                   by default those of the model's tracer. Parameters not named, and not
+                   given as fixed, take the midpoints of their default bounds.
+    :param x0: The starting values of the free parameters, by default their bounds' midpoints.
+    :param optimizer: A function of the objective, x0 and bounds returning the best
+                      parameters and objective value, by default ScipyOptimizer().
+    :param kwargs: Passed to Likelihood.
+    :return: A dictionary of the fitted parameters, with the NLL, number of Trials, and AIC.
+    """
+    tracer = IBLTracer if model == "IBL" else FRLTracer
+    bounds = dict(bounds or tracer.parameters)
+    fixed = dict(kwargs.pop("fixed", None) or {})
+    for name, (low, high) in tracer.parameters.items():
+        if(name not in bounds and name not in fixed):
+            fixed[name] = (low + high) / 2
+    likelihood = Likelihood(model, sequences, fixed=fixed, **kwargs)
+    boxes = [bounds[name] for name in likelihood.names]
+    x0 = np.array([(low + high) / 2 for low, high in boxes]) if x0 is None else np.asarray(x0, dtype=np.float64)
+    x, nll = (optimizer or ScipyOptimizer())(likelihood, x0, boxes)
+    params = likelihood.params(x)
+    result = {name: params[name] for name in list(tracer.parameters) + [name for name in params if name not in tracer.parameters]}
+    result.update({"NLL": float(nll), "Trials": likelihood.trials, "AIC": 2 * float(nll) + 2 * len(likelihood.names)})
+    return result
+
+
+def _fit_participant(job):
+    participant, model, trials, kwargs = job
+    return dict(Participant=participant, **fit(model, {participant: trials}, **kwargs))
+
+
+def fit_participants(model, sequences, processes=1, **kwargs):
+    """
+    Fit a model separately to each participant, the participants being fit in parallel in
+    a pool of processes.
+
+    :param kwargs: Passed to fit; an optimizer must be picklable, such as ScipyOptimizer
+                   or GridOptimizer.
+    :return: A DataFrame with one row of fitted parameters per participant.
+    """
+    jobs = [(participant, model, trials, kwargs) for participant, trials in sequences.items()]
+    if(processes > 1):
+        with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as pool:
+            rows = list(pool.map(_fit_participant, jobs))
+    else:
+        rows = [_fit_participant(job) for job in jobs]
+    return pd.DataFrame(rows)
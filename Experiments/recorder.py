@@ -0,0 +1,139 @@
+import os
+import numpy as np
+import pandas as pd
+
+
+class Recorder:
+    def __init__(self, columns, capacity=1024, path=None, chunk_rows=1_000_000, format="parquet"):
+        """
+        Collects simulation results one row, or one population of rows, at a time into
+        preallocated, typed column arrays, and builds a single DataFrame at the end,
+        instead of concatenating a one row DataFrame at every timestep. String columns
+        declared "category" are stored as integer codes and become pandas categoricals.
+
+        If path is given, every chunk_rows rows are written to a new Parquet or Feather
+        file in that directory, so that very large sweeps need not be held in memory;
+        this needs pyarrow.
+
+        :param columns: A dictionary from column names to their types: "category", bool,
+                        int or float. Missing (None) values of float columns become NaN.
+        :param capacity: The number of rows initially allocated for; this doubles as needed.
+        :param path: An optional directory to which chunks are streamed.
+        :param chunk_rows: The number of rows per streamed chunk.
+        :param format: "parquet" or "feather", the format of streamed chunks.
+        """
+        assert(format in ("parquet", "feather"))
+        self.columns = dict(columns)
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.format = format
+        self.chunks = []
+        self.categories = {name: {} for name, kind in self.columns.items() if kind == "category"}
+        self.capacity = max(int(capacity), 1)
+        if(self.path is not None):
+            os.makedirs(self.path, exist_ok=True)
+            self.capacity = min(self.capacity, self.chunk_rows)
+        self.arrays = {name: np.empty(self.capacity, dtype=self._dtype(kind)) for name, kind in self.columns.items()}
+        self.size = 0
+        self.flushed = 0
+
+    @staticmethod
+    def _dtype(kind):
+        if(kind == "category"):
+            return np.int32
+        elif(kind is bool):
+            return np.bool_
+        elif(kind is int):
+            return np.int64
+        return np.float64
+
+    def __len__(self):
+        return self.flushed + self.size
+
+    def _code(self, name, value):
+        codes = self.categories[name]
+        if(value not in codes):
+            codes[value] = len(codes)
+        return codes[value]
+
+    def _reserve(self, rows):
+        if(self.path is not None and self.size + rows > self.chunk_rows and self.size > 0):
+            self.flush()
+        needed = self.size + rows
+        if(needed > self.capacity):
+            capacity = max(2 * self.capacity, needed)
+            for name, array in self.arrays.items():
+                grown = np.empty(capacity, dtype=array.dtype)
+                grown[:self.size] = array[:self.size]
+                self.arrays[name] = grown
+            self.capacity = capacity
+
+    def record(self, **values):
+        """
+        Add a row, given as keyword arguments, one per column.
+        """
+        self._reserve(1)
+        for name, value in values.items():
+            if(name in self.categories):
+                value = self._code(name, value)
+            elif(value is None):
+                value = np.nan
+            self.arrays[name][self.size] = value
+        self.size += 1
+
+    def record_many(self, **values):
+        """
+        Add several rows at once, such as one per agent of a population. Each keyword
+        argument is either an array of values, one per row, or a single value shared by
+        every row; at least one must be an array.
+        """
+        rows = max(np.size(value) for name, value in values.items() if name not in self.categories or not isinstance(value, str))
+        self._reserve(rows)
+        for name, value in values.items():
+            if(name in self.categories):
+                if(isinstance(value, str)):
+                    value = self._code(name, value)
+                else:
+                    value = [self._code(name, v) for v in value]
+            self.arrays[name][self.size:self.size + rows] = value
+        self.size += rows
+
+    def _frame(self):
+        data = {}
+        for name, kind in self.columns.items():
+            array = self.arrays[name][:self.size]
+            if(kind == "category"):
+                data[name] = pd.Categorical.from_codes(array, categories=list(self.categories[name]))
+            else:
+                data[name] = array.copy()
+        return pd.DataFrame(data)
+
+    def flush(self):
+        """
+        Write the rows recorded since the last flush to a new chunk file in path.
+        """
+        if(self.path is None or self.size == 0):
+            return
+        frame = self._frame()
+        fileName = os.path.join(self.path, "part-%05d.%s" % (len(self.chunks), self.format))
+        if(self.format == "parquet"):
+            frame.to_parquet(fileName, index=False)
+        else:
+            frame.to_feather(fileName)
+        self.chunks.append(fileName)
+        self.flushed += self.size
+        self.size = 0
+
+    def to_frame(self):
+        """
+        All the rows recorded, as a single DataFrame. If chunks have been streamed they
+        are read back, so for very large sweeps read the chunk files selectively instead.
+        """
+        if(not self.chunks):
+            return self._frame()
+        self.flush()
+        read = pd.read_parquet if self.format == "parquet" else pd.read_feather
+        df = pd.concat([read(fileName) for fileName in self.chunks], ignore_index=True)
+        for name in self.categories:
+            df[name] = df[name].astype("category")
+        return df
@@ -0,0 +1,164 @@
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+import pandas as pd
+
+
+def config_key(config):
+    """
+    The content hash of a configuration, a dictionary of JSON serializable values.
+    """
+    return hashlib.sha1(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def code_version(fileNames):
+    """
+    A hash of the contents of the source files whose names are given.
+    """
+    digest = hashlib.sha1()
+    for fileName in sorted(set(fileNames)):
+        with open(fileName, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def concat(frames):
+    """
+    Concatenate frames of results, keeping categorical the columns categorical in the first.
+    """
+    categories = [name for name, dtype in frames[0].dtypes.items() if isinstance(dtype, pd.CategoricalDtype)]
+    df = pd.concat(frames, ignore_index=True)
+    for name in categories:
+        df[name] = df[name].astype("category")
+    return df
+
+
+def _compact(array):
+    # The smallest integer type holding every value, so cells take little space on disk
+    if(array.dtype.kind in "iu" and len(array) > 0):
+        for dtype in (np.int8, np.int16, np.int32):
+            info = np.iinfo(dtype)
+            if(info.min <= array.min() and array.max() <= info.max):
+                return array.astype(dtype)
+    return array
+
+
+class ResultStore:
+    def __init__(self, path):
+        """
+        Simulation results kept one cell per directory under path, a cell being the
+        results of one configuration, such as one model, feedback, shift, set of
+        parameters and code version. A cell is addressed by the hash of its configuration,
+        so results are never duplicated and a rerun can reuse any cell already stored.
+
+        Each column of a cell is a .npy file of the smallest type holding it, categorical
+        columns being stored as their codes, and is read memory-mapped, so that reading a
+        few cells or columns costs only what is read. A small index.json maps every key to
+        its configuration, number of rows and columns; it is rebuilt from the meta.json of
+        every cell if missing.
+
+        :param path: The directory of the store, created if needed.
+        """
+        self.path = path
+        os.makedirs(self.path, exist_ok=True)
+        self.index = self._read_index()
+
+    def _read_index(self):
+        fileName = os.path.join(self.path, "index.json")
+        if(os.path.exists(fileName)):
+            with open(fileName) as f:
+                return json.load(f)
+        index = {}
+        for key in os.listdir(self.path):
+            meta = os.path.join(self.path, key, "meta.json")
+            if(os.path.exists(meta)):
+                with open(meta) as f:
+                    index[key] = json.load(f)
+        return index
+
+    def _write_index(self):
+        fileName = os.path.join(self.path, "index.json")
+        with open(fileName + ".tmp", "w") as f:
+            json.dump(self.index, f, sort_keys=True, default=str)
+        os.replace(fileName + ".tmp", fileName)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def put(self, config, df):
+        """
+        Store the results of a configuration, unless already stored.
+
+        :param config: A dictionary of JSON serializable values describing the results.
+        :param df: The results, a DataFrame of numeric, boolean and categorical columns.
+        :return: The key of the cell.
+        """
+        key = config_key(config)
+        if(key in self.index):
+            return key
+        meta = {"config": config, "rows": len(df), "columns": []}
+        temporary = os.path.join(self.path, key + ".%d.tmp" % os.getpid())
+        os.makedirs(temporary, exist_ok=True)
+        for name in df.columns:
+            column = df[name]
+            if(isinstance(column.dtype, pd.CategoricalDtype)):
+                meta["columns"].append({"name": name, "categories": [str(category) for category in column.cat.categories]})
+                array = _compact(column.cat.codes.to_numpy())
+            else:
+                meta["columns"].append({"name": name})
+                array = _compact(column.to_numpy())
+            np.save(os.path.join(temporary, name + ".npy"), array)
+        with open(os.path.join(temporary, "meta.json"), "w") as f:
+            json.dump(meta, f, sort_keys=True, default=str)
+        shutil.rmtree(os.path.join(self.path, key), ignore_errors=True)
+        os.replace(temporary, os.path.join(self.path, key))
+        self.index[key] = meta
+        self._write_index()
+        return key
+
+    def get(self, key, columns=None):
+        """
+        The results of a cell, read memory-mapped.
+
+        :param key: The key of the cell.
+        :param columns: The names of the columns to read, by default all of them.
+        """
+        meta = self.index[key]
+        data = {}
+        for column in meta["columns"]:
+            name = column["name"]
+            if(columns is not None and name not in columns):
+                continue
+            array = np.load(os.path.join(self.path, key, name + ".npy"), mmap_mode="r")
+            if("categories" in column):
+                data[name] = pd.Categorical.from_codes(array, categories=column["categories"])
+            else:
+                data[name] = array
+        return pd.DataFrame(data, copy=False)
+
+    def find(self, **query):
+        """
+        The keys of the cells whose configurations match a query, in which every keyword
+        argument gives either the value of that configuration entry or a list of values.
+        """
+        keys = []
+        for key, meta in self.index.items():
+            config = meta["config"]
+            if(all(name in config and (config[name] in value if isinstance(value, list) else config[name] == value) for name, value in query.items())):
+                keys.append(key)
+        return keys
+
+    def load(self, columns=None, **query):
+        """
+        The results of every cell matching a query, as described by find, as a single
+        DataFrame, reading only those cells and, if given, only those columns.
+        """
+        frames = [self.get(key, columns) for key in self.find(**query)]
+        if(not frames):
+            return pd.DataFrame()
+        return concat(frames)
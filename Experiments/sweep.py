@@ -0,0 +1,231 @@
+import os
+import glob
+import json
+import inspect
+import argparse
+import itertools
+import concurrent.futures
+import numpy as np
+import pandas as pd
+import pyactup
+from pyibl import Agent
+from Environments import TrialStream
+from .store import config_key, code_version, concat
+
+
+def cells(grid):
+    """
+    The cells of a declarative grid, as dictionaries of the args they set.
+
+    :param grid: A list of axes, each a dictionary from args names to lists of values
+                 of the same length, which are zipped together; the cells are every
+                 combination of one entry from each axis. For example
+                 [{"feedback": ["Immediate", "Clustered"]}, {"id": [False, True], "ed": [True, False]}]
+                 has four cells.
+    """
+    axes = []
+    for axis in grid:
+        lengths = set(len(values) for values in axis.values())
+        if(len(lengths) != 1):
+            print("The values of every argument of a grid axis must have the same length")
+            assert(False)
+        axes.append([dict(zip(axis.keys(), entry)) for entry in zip(*axis.values())])
+    for entries in itertools.product(*axes):
+        cell = {}
+        for entry in entries:
+            cell.update(entry)
+        yield cell
+
+
+def agent_seed(seed, key, agentIdx):
+    """
+    The seed of one agent of a cell, derived from the sweep seed, the cell's key and
+    the agent's index, so it does not depend on the order or sharding of the sweep.
+    """
+    return int(np.random.SeedSequence([seed, int(key[:16], 16), agentIdx]).generate_state(1)[0])
+
+
+def run_shard(train, args, shard, fileName=None):
+    """
+    Train the agents of one shard of a cell and, if fileName is given, write their
+    results there. Written first to a temporary file and then renamed, so that an
+    interrupted sweep never leaves a partial shard in the cache.
+    """
+    df = train(argparse.Namespace(**vars(args)), shard)    # train may change args
+    if(fileName is not None):
+        temporary = "%s.%d.tmp" % (fileName, os.getpid())
+        df.to_pickle(temporary)
+        os.replace(temporary, fileName)
+    return df
+
+
+class Sweep:
+    # args that do not change the results of a cell
+    ignored = ("agents", "saveFolder", "plot", "processes", "cache", "shard_size", "store")
+    # args that change only what is recorded of a cell, so do not change its seeds
+    outputs = ("summary",)
+
+    def __init__(self, train, args, grid, shard_size=0, cache=None, processes=1, store=None, combine=None):
+        """
+        Runs train for every cell of a grid of args, splitting the args.agents agents
+        of each cell into shards that are run in parallel in a pool of processes. Every
+        agent is seeded from (args.seed, cell, agent index), so a shard's results do not
+        depend on which process runs it or on what else is run.
+
+        The code version of a sweep is a hash of the source of train, Models,
+        Environments, Experiments, and the modules implementing pyibl and pyactup.
+
+        If cache is given, every completed shard is written to
+        cache/<cell key>/agents-<first>-<last>.pkl, where the cell key is a hash of the
+        args of the cell, the name of train, the code version, and the seed, but not of
+        the number of agents, so shards run by different code are never mixed. A sweep
+        that is interrupted, extended with more cells, or extended with more agents (in
+        multiples of shard_size) only runs the shards not yet in the cache. A config.json
+        describing the cell is written next to its shards.
+
+        If store, a ResultStore, is given, the results of every cell are kept there under
+        the hash of the cell's args, number of agents and code version, and a cell already
+        in the store is not run at all.
+
+        :param train: A function of args and a shard, a list of (agent index, seed) pairs,
+                      returning a DataFrame of the results of those agents, such as Train.
+                      It must be defined at the top level of a module.
+        :param args: The args shared by every cell.
+        :param grid: The cells, as described by cells.
+        :param shard_size: The number of agents per shard, 0 for all of a cell's agents.
+        :param cache: An optional directory in which completed shards are kept.
+        :param processes: The number of worker processes, 1 to run every shard in this process.
+        :param store: An optional ResultStore in which the results of every cell are kept.
+        :param combine: A function combining the list of the results of the shards of a
+                        cell into the results of the cell, by default concatenating them;
+                        LearningCurves.combine, for example, merges learning curves.
+        """
+        self.train = train
+        self.args = args
+        self.grid = grid
+        self.shard_size = shard_size if shard_size > 0 else args.agents
+        self.cache = cache
+        self.processes = processes
+        self.store = store
+        self.combine = concat if combine is None else combine
+
+    def cell_args(self, cell):
+        cellArgs = argparse.Namespace(**vars(self.args))
+        for name, value in cell.items():
+            setattr(cellArgs, name, value)
+        return cellArgs
+
+    def config(self, cellArgs):
+        """
+        The args and name of train describing a cell, whose hash seeds its agents.
+        """
+        config = {name: value for name, value in vars(cellArgs).items() if name not in self.ignored}
+        config["train"] = os.path.basename(self.train.__code__.co_filename) + ":" + self.train.__name__
+        return config
+
+    @staticmethod
+    def key(config):
+        return config_key(config)
+
+    def source_files(self):
+        """
+        The names of the source files of train and of the modules it uses.
+        """
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        fileNames = [self.train.__code__.co_filename]
+        for package in ("Models", "Environments", "Experiments"):
+            fileNames += [fileName for fileName in glob.glob(os.path.join(root, package, "*.py"))
+                          if not os.path.basename(fileName).startswith("test_")]
+        # The modules defining the classes, not the packages' __init__.py, which only
+        # import them
+        fileNames += [inspect.getsourcefile(Agent), inspect.getsourcefile(pyactup.Memory)]
+        return fileNames
+
+    def code_version(self):
+        """
+        A hash of the source of train and of the modules it uses.
+        """
+        return code_version(self.source_files())
+
+    def cache_config(self, config):
+        """
+        The configuration whose hash is the key of a cell's directory in the cache.
+        """
+        return dict(config, code=self.code)
+
+    def store_config(self, config):
+        """
+        The configuration under which the results of a cell are kept in the store.
+        """
+        return dict(config, agents=self.args.agents, code=self.code)
+
+    def shards(self, key, seedKey):
+        """
+        Every shard of a cell, as (shard, cache file name or None).
+        """
+        for first in range(0, self.args.agents, self.shard_size):
+            last = min(first + self.shard_size, self.args.agents)
+            shard = [(agentIdx, agent_seed(self.args.seed, seedKey, agentIdx)) for agentIdx in range(first, last)]
+            fileName = None if self.cache is None else os.path.join(self.cache, key, "agents-%d-%d.pkl" % (first, last))
+            yield shard, fileName
+
+    def run(self):
+        """
+        Run every shard of every cell not already in the store or cache.
+
+        :return: The results of every cell, in grid order, as a single DataFrame.
+        """
+        if(getattr(self.args, "trials", None)):
+            # Written once here, rather than raced for by the workers
+            TrialStream.open(self.args.trials, self.args, self.args.agents)
+        if(self.store is not None or self.cache is not None):
+            self.code = self.code_version()
+        stored = {}
+        reused = set()
+        results = {}
+        pending = []
+        for cellIdx, cell in enumerate(cells(self.grid)):
+            cellArgs = self.cell_args(cell)
+            config = self.config(cellArgs)
+            seedKey = self.key({name: value for name, value in config.items() if name not in self.outputs})
+            if(self.store is not None):
+                storeKey = config_key(self.store_config(config))
+                if(storeKey in self.store):
+                    results[(cellIdx, 0)] = self.store.get(storeKey)
+                    reused.add(cellIdx)
+                    continue
+                stored[cellIdx] = config
+            key = None
+            if(self.cache is not None):
+                cacheConfig = self.cache_config(config)
+                key = self.key(cacheConfig)
+                directory = os.path.join(self.cache, key)
+                os.makedirs(directory, exist_ok=True)
+                with open(os.path.join(directory, "config.json"), "w") as f:
+                    json.dump(cacheConfig, f, sort_keys=True, indent=1, default=str)
+            for shard, fileName in self.shards(key, seedKey):
+                if(fileName is not None and os.path.exists(fileName)):
+                    results[(cellIdx, shard[0][0])] = pd.read_pickle(fileName)
+                else:
+                    pending.append((cellIdx, cellArgs, shard, fileName))
+        print("Cells stored: ", len(reused), " shards cached: ", len(results) - len(reused), " to run: ", len(pending))
+
+        if(self.processes > 1 and len(pending) > 1):
+            with concurrent.futures.ProcessPoolExecutor(max_workers=self.processes) as pool:
+                futures = {pool.submit(run_shard, self.train, cellArgs, shard, fileName): (cellIdx, shard[0][0]) for cellIdx, cellArgs, shard, fileName in pending}
+                for done, future in enumerate(concurrent.futures.as_completed(futures)):
+                    results[futures[future]] = future.result()
+                    print("Shard: ", done + 1, "/", len(pending))
+        else:
+            for done, (cellIdx, cellArgs, shard, fileName) in enumerate(pending):
+                results[(cellIdx, shard[0][0])] = run_shard(self.train, cellArgs, shard, fileName)
+                print("Shard: ", done + 1, "/", len(pending))
+
+        frames = {}
+        for cellIdx, first in sorted(results):
+            frames.setdefault(cellIdx, []).append(results[(cellIdx, first)])
+        frames = {cellIdx: cellFrames[0] if cellIdx in reused else self.combine(cellFrames) for cellIdx, cellFrames in frames.items()}
+        for cellIdx, config in stored.items():
+            self.store.put(self.store_config(config), frames[cellIdx])
+        return concat([frames[cellIdx] for cellIdx in sorted(frames)])
+
@@ -0,0 +1,58 @@
+import os
+import argparse
+import shutil
+import inspect
+import pyactup
+import pandas as pd
+from pyibl import Agent
+from Experiments import Sweep
+from Experiments.store import code_version
+
+
+def train(args, shard):
+    return None
+
+
+def test_code_version(tmp_path):
+    sweep = Sweep(train, None, [], shard_size=1)
+    fileNames = sweep.source_files()
+    # The modules implementing pyibl and pyactup, not just their packages' __init__.py
+    assert inspect.getsourcefile(Agent) in fileNames
+    assert inspect.getsourcefile(pyactup.Memory) in fileNames
+    assert any(os.path.basename(fileName) == "likelihood.py" for fileName in fileNames)
+    assert sweep.code_version() == code_version(fileNames)
+    # Editing pyibl.py changes the code version
+    copies = []
+    for i, fileName in enumerate(fileNames):
+        copies.append(str(tmp_path / ("%d-%s" % (i, os.path.basename(fileName)))))
+        shutil.copyfile(fileName, copies[-1])
+    before = code_version(copies)
+    with open(copies[fileNames.index(inspect.getsourcefile(Agent))], "a") as f:
+        f.write("\n")
+    assert code_version(copies) != before
+
+
+def count_train(args, shard):
+    count_train.calls += 1
+    return pd.DataFrame({"agent": [agentIdx for agentIdx, seed in shard]})
+
+
+def test_cache_code_version(tmp_path):
+    args = argparse.Namespace(agents=2, seed=1)
+    count_train.calls = 0
+    Sweep(count_train, args, [{"x": [1, 2]}], shard_size=1, cache=str(tmp_path / "cache")).run()
+    assert count_train.calls == 4
+    Sweep(count_train, args, [{"x": [1, 2]}], shard_size=1, cache=str(tmp_path / "cache")).run()
+    assert count_train.calls == 4
+    # Shards cached by another version of pyibl.py are not reused
+    edited = tmp_path / "pyibl.py"
+    shutil.copyfile(inspect.getsourcefile(Agent), edited)
+    with open(edited, "a") as f:
+        f.write("\n")
+    sweep = Sweep(count_train, args, [{"x": [1, 2]}], shard_size=1, cache=str(tmp_path / "cache"))
+    fileNames = sweep.source_files()
+    fileNames[fileNames.index(inspect.getsourcefile(Agent))] = str(edited)
+    sweep.source_files = lambda: fileNames
+    df = sweep.run()
+    assert count_train.calls == 8
+    assert df["agent"].tolist() == [0, 1, 0, 1]
@@ -1,50 +1,28 @@
 import os 
 import pandas as pd 
-import scipy.io as sio
 import seaborn as sns 
 import matplotlib.pyplot as plt 
 
-directory = 'files'
- 
-# iterate over files in
-# that directory
-ldf = pd.DataFrame([])
-mdf = pd.DataFrame([])
-tdf = pd.DataFrame([])
+from ingest import ingest, load
 
-for directory in ['./Complete', './Partial']:
-    for filename in os.listdir(directory):
-        f = os.path.join(directory, filename)
-        # checking if it is a file
-        if os.path.isfile(f):
-            file_name, file_extension = os.path.splitext(f)
-            if(file_extension == '.mat'):
-                participant = file_name.split('_')[0].split("\\")[1]
-                mat_data = sio.loadmat(f)
-                # 'data_Learning', 'data_Mean', 'data_Test'
-                if('Learn' in file_name):
-                    data = mat_data['data_Learning']
-                    d = pd.DataFrame(data)
-                    d['Type'] = directory.split('/')[1]
-                    d['Participant'] = participant
-                    d.rename(columns={14: "Reward"}, inplace=True)
-                    d.rename(columns={2: "Timestep"}, inplace=True)
-                    ldf = pd.concat([ldf, d])
+if __name__ == "__main__":
+    # Parses, in parallel, only the .mat files not already in ./Dataset
+    ingest()
+    ldf = load("Learn")
 
+    ldf.to_pickle("./Learn.pkl")
+    grp = ldf.groupby([4, "Type", "Participant", "Timestep"], as_index=False, observed=True).mean()
 
-ldf.to_pickle("./Learn.pkl")
-grp = ldf.groupby([4, "Type", "Participant", "Timestep"], as_index=False).mean()
-
-c = ldf[ldf['Type'] == "Complete"]
-sns.lineplot(data=c, x='Timestep', y=14, hue=4)
-plt.show()
-#print(ldf[4].unique())
+    c = ldf[ldf['Type'] == "Complete"]
+    sns.lineplot(data=c, x='Timestep', y="Reward", hue=4)
+    plt.show()
+    #print(ldf[4].unique())
 
-c = ldf[ldf['Type'] == 'Complete']
-p = ldf[ldf['Type'] == 'Partial']
+    c = ldf[ldf['Type'] == 'Complete']
+    p = ldf[ldf['Type'] == 'Partial']
 
-#print(c['Reward'].mean())
-#print(p['Reward'].mean())
+    #print(c['Reward'].mean())
+    #print(p['Reward'].mean())
 
 """
 import os 
@@ -0,0 +1,172 @@
+"""
+Convert the participants' .mat files in ./Complete and ./Partial into one typed, columnar
+dataset per matrix (Learn, Mean and Test), kept in ./Dataset and read memory-mapped.
+
+Each table has the numbered columns of its MATLAB matrix, as in clean.py, with Timestep
+and Reward named in Learn, and Type (Complete or Partial) and Participant (such as S10)
+added. Columns whose values are all whole numbers are stored as the smallest integer type
+holding them, the others as float64, and Type and Participant as categorical codes.
+
+A manifest records the SHA-1 of every source file, and the matrix of every file is kept
+under that hash, so that rerunning only parses files that are new or have changed.
+
+    python ingest.py                   # convert, in parallel
+    load("Learn", ["Participant", "Timestep", "Reward"])
+"""
+import os
+import json
+import hashlib
+import argparse
+import concurrent.futures
+import numpy as np
+import pandas as pd
+import scipy.io as sio
+
+tables = {"Learn": "data_Learning", "Mean": "data_Mean", "Test": "data_Test"}
+names = {"Learn": {2: "Timestep", 14: "Reward"}}
+
+
+def file_hash(fileName):
+    digest = hashlib.sha1()
+    with open(fileName, "rb") as f:
+        digest.update(f.read())
+    return digest.hexdigest()
+
+
+def sources(directories=("./Complete", "./Partial")):
+    """
+    The .mat files, as (file name, Type, Participant, table) tuples.
+    """
+    found = []
+    for directory in directories:
+        for fileName in sorted(os.listdir(directory)):
+            f = os.path.join(directory, fileName)
+            if(os.path.isfile(f) and os.path.splitext(f)[1] == ".mat"):
+                participant, table = os.path.basename(f).split("_")[:2]
+                if(table in tables):
+                    found.append((f, os.path.basename(os.path.normpath(directory)), participant, table))
+    return found
+
+
+def convert(fileName, table, partName):
+    """
+    Parse the matrix of a table from a .mat file and save it as partName.
+    """
+    matrix = np.asarray(sio.loadmat(fileName)[tables[table]], dtype=np.float64)
+    np.save(partName, matrix)
+    return matrix.shape
+
+
+def _column(values):
+    # The smallest integer type holding whole numbered columns, float64 otherwise
+    if(len(values) > 0 and np.all(np.isfinite(values)) and np.all(values == np.round(values))):
+        for dtype in (np.int8, np.int16, np.int32, np.int64):
+            info = np.iinfo(dtype)
+            if(info.min <= values.min() and values.max() <= info.max):
+                return values.astype(dtype)
+    return values
+
+
+def ingest(path="./Dataset", directories=("./Complete", "./Partial"), processes=None):
+    """
+    Bring the dataset at path up to date with the .mat files in directories, parsing in
+    a pool of processes only the files not already converted, and rewriting only the
+    tables with a file added, changed or removed.
+
+    :return: The number of files parsed.
+    """
+    partPath = os.path.join(path, "parts")
+    os.makedirs(partPath, exist_ok=True)
+    manifestName = os.path.join(path, "manifest.json")
+    manifest = {"files": {}, "tables": {}}
+    if(os.path.exists(manifestName)):
+        with open(manifestName) as f:
+            manifest = json.load(f)
+
+    files = {}
+    pending = []
+    for fileName, fileType, participant, table in sources(directories):
+        stat = os.stat(fileName)
+        known = manifest["files"].get(fileName)
+        # Only rehash files whose size or modification time has changed
+        if(known is not None and known["size"] == stat.st_size and known["mtime"] == stat.st_mtime):
+            sha1 = known["sha1"]
+        else:
+            sha1 = file_hash(fileName)
+        files[fileName] = {"sha1": sha1, "size": stat.st_size, "mtime": stat.st_mtime, "Type": fileType, "Participant": participant, "table": table}
+        partName = os.path.join(partPath, sha1 + ".npy")
+        if(not os.path.exists(partName)):
+            pending.append((fileName, table, partName))
+
+    if(pending):
+        with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as pool:
+            list(pool.map(convert, *zip(*pending)))
+
+    for table in tables:
+        members = sorted((fileName, meta) for fileName, meta in files.items() if meta["table"] == table)
+        signature = hashlib.sha1(json.dumps([(fileName, meta["sha1"]) for fileName, meta in members]).encode()).hexdigest()
+        if(manifest["tables"].get(table, {}).get("signature") == signature and os.path.exists(os.path.join(path, table, "meta.json"))):
+            continue
+        matrices = [np.load(os.path.join(partPath, meta["sha1"] + ".npy")) for fileName, meta in members]
+        write_table(os.path.join(path, table), table, matrices, [meta for fileName, meta in members])
+        manifest["tables"][table] = {"signature": signature, "rows": int(sum(len(matrix) for matrix in matrices))}
+
+    manifest["files"] = files
+    with open(manifestName + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(manifestName + ".tmp", manifestName)
+    return len(pending)
+
+
+def write_table(directory, table, matrices, metas):
+    """
+    Write the rows of the matrices of a table, one .npy file per column.
+    """
+    os.makedirs(directory, exist_ok=True)
+    data = np.concatenate(matrices) if matrices else np.empty((0, 0))
+    columns = []
+    for columnIdx in range(data.shape[1]):
+        name = names.get(table, {}).get(columnIdx, columnIdx)
+        np.save(os.path.join(directory, "%s.npy" % name), _column(data[:, columnIdx]))
+        columns.append({"name": name})
+    for name in ("Type", "Participant"):
+        categories = sorted(set(meta[name] for meta in metas))
+        codes = np.concatenate([np.full(len(matrix), categories.index(meta[name]), dtype=np.int16) for matrix, meta in zip(matrices, metas)]) if matrices else np.empty(0, dtype=np.int16)
+        np.save(os.path.join(directory, name + ".npy"), codes)
+        columns.append({"name": name, "categories": categories})
+    with open(os.path.join(directory, "meta.json"), "w") as f:
+        json.dump({"columns": columns, "rows": len(data)}, f, indent=1)
+
+
+def load(table, columns=None, path="./Dataset"):
+    """
+    A table of the dataset as a DataFrame whose columns are memory-mapped.
+
+    :param table: "Learn", "Mean" or "Test".
+    :param columns: The names of the columns to read, by default all of them.
+    """
+    directory = os.path.join(path, table)
+    with open(os.path.join(directory, "meta.json")) as f:
+        meta = json.load(f)
+    data = {}
+    for column in meta["columns"]:
+        name = column["name"]
+        if(columns is not None and name not in columns):
+            continue
+        array = np.load(os.path.join(directory, "%s.npy" % name), mmap_mode="r")
+        if("categories" in column):
+            data[name] = pd.Categorical.from_codes(array, categories=column["categories"])
+        else:
+            data[name] = array
+    return pd.DataFrame(data, copy=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", type=str, default="./Dataset", help="Directory of the dataset")
+    parser.add_argument("--processes", type=int, default=None, help="Worker processes parsing .mat files, by default one per CPU")
+    args = parser.parse_args()
+    parsed = ingest(args.path, processes=args.processes)
+    print("Files parsed: ", parsed)
+    for table in tables:
+        print(table, load(table, path=args.path).shape)
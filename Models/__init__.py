@@ -1,4 +1,5 @@
 from .ibl import IBLAgent
 from .frl import FRLAgent
 from .hibl import HIBLAgent
-from .hfrl import HFRLAgent
\ No newline at end of file
+from .hfrl import HFRLAgent
+from .frlPopulation import FRLPopulation
\ No newline at end of file
@@ -0,0 +1,64 @@
+import numpy as np
+
+
+class ExperienceBuffer:
+    def __init__(self, num_features, capacity=64):
+        """
+        Growable store of observations, each the integer value codes of num_features
+        attributes together with a real valued outcome, held in preallocated NumPy
+        arrays whose capacity doubles when full, so that appending is amortized O(1)
+        and the history can be read without copying.
+
+        :param num_features: The number of attribute value codes in each observation.
+        :param capacity: The number of observations initially allocated for.
+        """
+        self.num_features = num_features
+        self.initial_capacity = max(int(capacity), 1)
+        self.reset()
+
+    def reset(self):
+        self.size = 0
+        self._codes = np.empty((self.initial_capacity, self.num_features), dtype=np.intp)
+        self._outcomes = np.empty(self.initial_capacity, dtype=np.float64)
+
+    def __len__(self):
+        return self.size
+
+    def append(self, values, outcome):
+        """
+        Add an observation.
+
+        :param values: The value codes of each of the attributes.
+        :param outcome: The real valued outcome observed.
+        """
+        if(self.size == len(self._outcomes)):
+            capacity = 2 * len(self._outcomes)
+            codes = np.empty((capacity, self.num_features), dtype=np.intp)
+            codes[:self.size] = self._codes
+            outcomes = np.empty(capacity, dtype=np.float64)
+            outcomes[:self.size] = self._outcomes
+            self._codes = codes
+            self._outcomes = outcomes
+        self._codes[self.size] = values
+        self._outcomes[self.size] = outcome
+        self.size += 1
+
+    @property
+    def codes(self):
+        """A view of the value codes of all the observations, one row per observation."""
+        return self._codes[:self.size]
+
+    @property
+    def outcomes(self):
+        """A view of the outcomes of all the observations."""
+        return self._outcomes[:self.size]
+
+    def last(self, k):
+        """
+        Views of the value codes and outcomes of the most recent k observations.
+
+        :param k: The number of observations, fewer being returned if fewer have been made.
+        :return: A tuple of the codes, one row per observation, and the outcomes.
+        """
+        start = max(self.size - k, 0)
+        return self._codes[start:self.size], self._outcomes[start:self.size]
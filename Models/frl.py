@@ -18,6 +18,8 @@ class FRLAgent:
         #random.seed(args.seed)
         self.attributes = ["Attribute " + str(attr) for attr in range(self.args.na)]
         self.values = ["Value " + str(value) for value in range(2*self.args.nd)]
+        self.valueCodes = {value: code for code, value in enumerate(self.values)}
+        self.attributeCodes = {attribute: code for code, attribute in enumerate(self.attributes)}
         self.env = env
 
         self.f_table = np.ones((self.args.na, 2*self.args.nd)) * self.args.default_utility
@@ -42,7 +44,14 @@ class FRLAgent:
         self.pending_weight = 0
         return
 
-    def respond(self, response):
+    def respond(self, response, choice=None):
+        """
+        Learn from the outcome of the most recent choice. As with pyibl's Agent, a choice
+        other than the one chosen may be given, the outcome then being attached to it,
+        for model tracing of a human's choices.
+        """
+        if(choice is not None):
+            self.pend(self.choices.index(choice))
         if(response == None):
             return 
         elif(isinstance(response, list)):
@@ -52,40 +61,53 @@ class FRLAgent:
                 self.respond(addReward)
         else:
             for atr, val in zip(self.pending_attributes, self.pending_values):
-                featureIdx = self.values.index(val)
-                attributeIdx = self.attributes.index(atr)
+                featureIdx = self.valueCodes[val]
+                attributeIdx = self.attributeCodes[atr]
                 self.f_table[attributeIdx, featureIdx] = self.f_table[attributeIdx, featureIdx] + self.args.lr * (response - self.f_table[attributeIdx, featureIdx])
                 self.pending_error = self.args.lr * (response - self.f_table[attributeIdx, featureIdx])
                 self.pending_weight = attributeIdx
 
             for atr, val in zip(self.unchosen_attributes, self.unchosen_values):
-                featureIdx = self.values.index(val)
-                attributeIdx = self.attributes.index(atr)
+                featureIdx = self.valueCodes[val]
+                attributeIdx = self.attributeCodes[atr]
                 self.f_table[attributeIdx, featureIdx] *= self.args.decay
         return
 
-    def choose(self, choices=None, details=False):
-        self.choices = choices 
+    def choice_values(self, choices):
+        """
+        The value of each of the choices, the sum of the values of its features.
+        """
         choice_values = []
         for choice in choices:
             value = 0
             for attributeIdx, attribute in enumerate(self.attributes):
-                featureIdx = self.values.index(choice[attribute])
+                featureIdx = self.valueCodes[choice[attribute]]
                 value += self.f_table[attributeIdx, featureIdx]
             choice_values.append(value)
+        return choice_values
+
+    def pend(self, choiceIdx):
+        # The choice learned from by respond, and the others, whose features decay
+        self.pending_attributes = list(self.choices[choiceIdx].keys())
+        self.pending_values = list(self.choices[choiceIdx].values())
+        choicesCopy = [choice for idx, choice in enumerate(self.choices) if idx != choiceIdx]
+        self.unchosen_attributes = [attribute for choice in choicesCopy for attribute in choice.keys()]
+        self.unchosen_values = [value for choice in choicesCopy for value in choice.values()]
+
+    def choose(self, choices=None, details=False):
+        """
+        Choose the choice of greatest value; if details, the values of all the choices are
+        returned as well.
+        """
+        self.choices = choices 
+        choice_values = self.choice_values(choices)
         softmax = np.array(choice_values)
         exp_x = np.exp(choice_values - np.max(choice_values)) * self.args.softMaxInverseTemp
         softmax = exp_x / np.sum(exp_x)
         choiceIdx = np.argmax(softmax)
         chosen = choices[choiceIdx]
-        self.pending_attributes = list(choices[choiceIdx].keys())
-        self.pending_values = list(choices[choiceIdx].values())
-        choicesCopy = copy.deepcopy(choices)
-        choicesCopy.pop(choiceIdx)
-
-        self.unchosen_attributes = list(choicesCopy[0].keys()) + list(choicesCopy[1].keys())
-        self.unchosen_values = list(choicesCopy[0].values()) + list(choicesCopy[1].values())
-        return chosen, None 
+        self.pend(choiceIdx)
+        return chosen, (choice_values if details else None)
 
     def updateWeights(self):
         self.weights[self.pending_weight] = self.alpha * (self.pending_error - self.weights[self.pending_weight])
@@ -0,0 +1,123 @@
+import numpy as np
+
+
+class FRLPopulation:
+    def __init__(self, args, population):
+        """
+        A population of feature reinforcement learning agents, equivalent to as many
+        independent FRLAgents, but simulated together: the feature tables of all the
+        agents are held in a single (population, na, 2*nd) array, choices are given as
+        integer value codes, and each of choose, respond and updateWeights is a few
+        array operations for the whole population.
+
+        self.args.default_utility
+        self.args.na
+        self.args.nd
+        self.args.lr
+        self.args.decay
+        self.args.softMaxInverseTemp
+
+        :param population: The number of agents.
+        """
+        self.args = args
+        self.population = population
+        self.attributes = ["Attribute " + str(attr) for attr in range(self.args.na)]
+        self.values = ["Value " + str(value) for value in range(2*self.args.nd)]
+        self.valueCodes = {value: code for code, value in enumerate(self.values)}
+        self.alpha = 0.5
+        self.agentIdx = np.arange(population)
+        self.attributeIdx = np.arange(self.args.na)
+        self.reset()
+
+    def reset(self):
+        self.f_table = np.ones((self.population, self.args.na, 2*self.args.nd)) * self.args.default_utility
+        self.weights = np.ones((self.population, self.args.na))
+        self.choice_codes = None
+        self.pending_codes = None
+        self.unchosen_codes = None
+        self.pending_error = np.zeros(self.population)
+        self.pending_weight = np.zeros(self.population, dtype=np.intp)
+
+    def encode(self, choices):
+        """
+        Convert choices given as dictionaries of attribute values to integer codes.
+
+        :param choices: A list of choices, each a dictionary from attribute names to values,
+                        shared by every agent; or a list of such lists, one per agent.
+        :return: An integer array of shape (population, nc, na).
+        """
+        if(isinstance(choices[0], dict)):
+            choices = [choices]
+        codes = np.array([[[self.valueCodes[choice[attribute]] for attribute in self.attributes] for choice in agentChoices] for agentChoices in choices], dtype=np.intp)
+        return np.broadcast_to(codes, (self.population,) + codes.shape[1:])
+
+    def decode(self, codes):
+        """
+        Convert the integer codes of one agent's choice back to a dictionary.
+        """
+        return {attribute: self.values[code] for attribute, code in zip(self.attributes, codes)}
+
+    def choice_values(self, codes):
+        """
+        The value of each choice to each agent, the sum of its features' values.
+
+        :param codes: An integer array of shape (population, nc, na).
+        :return: An array of shape (population, nc).
+        """
+        return self.f_table[self.agentIdx[:, None, None], self.attributeIdx, codes].sum(axis=2)
+
+    def choose(self, codes, chosen=None):
+        """
+        Every agent chooses from its choices.
+
+        :param codes: The integer codes of the choices, of shape (population, nc, na), as
+                      returned by encode.
+        :param chosen: Optionally, for model tracing, the index of the choice each agent is
+                       to be taken to have made, of shape (population,), instead of the
+                       choice of greatest value.
+        :return: The index of the choice made by each agent, an array of shape (population,).
+        """
+        codes = np.asarray(codes)
+        if(chosen is None):
+            choice_values = self.choice_values(codes)
+            exp_x = np.exp(choice_values - np.max(choice_values, axis=1, keepdims=True)) * self.args.softMaxInverseTemp
+            softmax = exp_x / np.sum(exp_x, axis=1, keepdims=True)
+            choiceIdx = np.argmax(softmax, axis=1)
+        else:
+            choiceIdx = np.asarray(chosen, dtype=np.intp)
+        unchosen = np.ones(codes.shape[:2], dtype=bool)
+        unchosen[self.agentIdx, choiceIdx] = False
+        self.choice_codes = codes
+        self.pending_codes = codes[self.agentIdx, choiceIdx]
+        self.unchosen_codes = codes[unchosen].reshape(self.population, -1, self.args.na)
+        return choiceIdx
+
+    def _update(self, codes, rewards):
+        features = self.f_table[self.agentIdx[:, None], self.attributeIdx, codes]
+        features += self.args.lr * (rewards[:, None] - features)
+        self.f_table[self.agentIdx[:, None], self.attributeIdx, codes] = features
+        self.pending_error = self.args.lr * (rewards - features[:, -1])
+        self.pending_weight[:] = self.args.na - 1
+        np.multiply.at(self.f_table, (self.agentIdx[:, None, None], self.attributeIdx, self.unchosen_codes), self.args.decay)
+
+    def respond(self, rewards):
+        """
+        Every agent learns from the outcome of its most recent choice.
+
+        :param rewards: None if there is no feedback; an array of shape (population,) of
+                        the rewards of the chosen options; or, for counterfactual feedback,
+                        an array of shape (population, nc) of the rewards of every option.
+        """
+        if(rewards is None):
+            return
+        rewards = np.asarray(rewards, dtype=np.float64)
+        if(rewards.ndim == 2):
+            for choiceIdx in range(rewards.shape[1]):
+                self._update(self.choice_codes[:, choiceIdx], rewards[:, choiceIdx])
+        else:
+            self._update(self.pending_codes, np.broadcast_to(rewards, (self.population,)))
+
+    def updateWeights(self):
+        weights = self.weights[self.agentIdx, self.pending_weight]
+        self.weights[self.agentIdx, self.pending_weight] = self.alpha * (self.pending_error - weights)
+        return None
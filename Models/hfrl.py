@@ -18,6 +18,8 @@ class HFRLAgent:
         #random.seed(args.seed)
         self.attributes = ["Attribute " + str(attr) for attr in range(self.args.na)]
         self.values = ["Value " + str(value) for value in range(2*self.args.nd)]
+        self.valueCodes = {value: code for code, value in enumerate(self.values)}
+        self.attributeCodes = {attribute: code for code, attribute in enumerate(self.attributes)}
         self.env = env
 
         self.f_table = np.ones((self.args.na, 2*self.args.nd)) * self.args.default_utility
@@ -51,15 +53,15 @@ class HFRLAgent:
                 self.respond(addReward)
         else:
             for atr, val in zip(self.pending_attributes, self.pending_values):
-                featureIdx = self.values.index(val)
-                attributeIdx = self.attributes.index(atr)
+                featureIdx = self.valueCodes[val]
+                attributeIdx = self.attributeCodes[atr]
                 self.f_table[attributeIdx, featureIdx] = self.f_table[attributeIdx, featureIdx] + self.args.lr * (response - self.f_table[attributeIdx, featureIdx])
                 self.pending_error = self.args.lr * (response - self.f_table[attributeIdx, featureIdx])
                 self.pending_weight = attributeIdx
 
             for atr, val in zip(self.unchosen_attributes, self.unchosen_values):
-                featureIdx = self.values.index(val)
-                attributeIdx = self.attributes.index(atr)
+                featureIdx = self.valueCodes[val]
+                attributeIdx = self.attributeCodes[atr]
                 self.f_table[attributeIdx, featureIdx] *= self.args.decay
         return
 
@@ -68,7 +70,7 @@ class HFRLAgent:
         for choice in choices:
             value = 0
             for attributeIdx, attribute in enumerate(self.attributes):
-                featureIdx = self.values.index(choice[attribute])
+                featureIdx = self.valueCodes[choice[attribute]]
                 value += self.f_table[attributeIdx, featureIdx]
             choice_values.append(value)
         softmax = np.array(choice_values)
@@ -78,8 +80,7 @@ class HFRLAgent:
         chosen = choices[choiceIdx]
         self.pending_attributes = list(choices[choiceIdx].keys())
         self.pending_values = list(choices[choiceIdx].values())
-        choicesCopy = copy.deepcopy(choices)
-        choicesCopy.pop(choiceIdx)
+        choicesCopy = [choice for idx, choice in enumerate(choices) if idx != choiceIdx]
 
         self.unchosen_attributes = list(choicesCopy[0].keys()) + list(choicesCopy[1].keys())
         self.unchosen_values = list(choicesCopy[0].values()) + list(choicesCopy[1].values())
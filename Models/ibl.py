@@ -4,6 +4,8 @@ import random
 from pyibl import Agent 
 from sklearn.feature_selection import mutual_info_regression
 from scipy.stats import entropy, mode 
+from .mutualInfo import IncrementalMutualInfo
+from .experienceBuffer import ExperienceBuffer
 
 class IBLAgent:
     def __init__(self, args, env):
@@ -19,11 +21,16 @@ class IBLAgent:
 
         self.attributes = ["Attribute " + str(attr) for attr in range(self.args.na)]
         self.values = ["Value " + str(value) for value in range(2*self.args.nd)]
+        self.valueCodes = {value: code for code, value in enumerate(self.values)}
         self.agent = Agent(name="name", attributes=self.attributes, default_utility=self.args.default_utility, mismatch_penalty=1)
         for attribute in self.attributes:
-            self.agent.similarity([attribute], lambda x,y: 1 if x == y else 0)
+            self.agent.similarity([attribute], True)
         self.weights = np.ones(len(self.attributes))
-        self.memory = []
+        self.memory = ExperienceBuffer(self.args.na, capacity=2*self.args.timesteps)
+        if(self.args.mi_estimator == "incremental"):
+            self.mutualInfo = IncrementalMutualInfo(self.args.na, len(self.values), bin_width=self.args.mi_bin_width, window=self.args.mi_window, decay=self.args.mi_decay)
+        else:
+            self.mutualInfo = None 
         self.alpha = .5
         self.env = env
         self.delayedResponses = []
@@ -33,7 +40,9 @@ class IBLAgent:
     def reset(self):
         self.weights = np.ones(len(self.attributes))
         self.agent.reset()
-        self.memory = []
+        self.memory.reset()
+        if(self.mutualInfo is not None):
+            self.mutualInfo.reset()
 
     def respond(self, response):
         reward = None 
@@ -47,22 +56,22 @@ class IBLAgent:
                 choice_idx = pending_choices.index(choice)
                 self.agent._pending_decision = (choice_idx, pending_choices, queries, utilities)
                 self.agent.respond(addReward)
-                values = [self.values.index(list(choice.values())[attr_idx]) for attr_idx in range(self.args.na)]
-                values.append(addReward)
-                self.memory.append(values)
+                values = [self.valueCodes[value] for value in list(choice.values())[:self.args.na]]
+                if(self.mutualInfo is not None):
+                    self.mutualInfo.update(values, addReward)
+                self.memory.append(values, addReward)
             reward = response[indx]
         else:
             # Need to do something different here for delayed feedback
-            values = [self.values.index(list(self.pending_choice.values())[attr_idx]) for attr_idx in range(self.args.na)]
-            values.append(response)
-            self.memory.append(values)
+            values = [self.valueCodes[value] for value in list(self.pending_choice.values())[:self.args.na]]
+            if(self.mutualInfo is not None):
+                self.mutualInfo.update(values, response)
+            self.memory.append(values, response)
             self.agent.respond(response)
             if(self.delay != 0):
                 if(self.args.weight_updating and len(self.memory) > 5):
-                    data = np.array(self.memory)
-                    last_five_slice = slice(-5, None)
-                    sample = data[last_five_slice]
-                    X = sample[:, :3] 
+                    X, _ = self.memory.last(5)
+                    X = X[:, :3] 
                     
                     valuedDimPrediction = np.argmax(self.weights)
                     mostCommonValuedDim = mode(X[:, valuedDimPrediction])
@@ -100,19 +109,17 @@ class IBLAgent:
             return None 
         
         if(len(self.memory) > 5):
-            data = np.array(self.memory)
-            #last_twenty_slice = slice(-20, None)
-            #sample = data[last_twenty_slice]
-            sample = data
-            
-            X = sample[:, :3]  # First three columns
-            y = sample[:, -1]    # Last column
-            
-            mi = np.array(mutual_info_regression(X, y, discrete_features=True))
+            if(self.mutualInfo is not None):
+                mi = self.mutualInfo.mutual_info()
+            else:
+                #X, y = self.memory.last(20)
+                X = self.memory.codes[:, :3]  # First three attributes
+                y = self.memory.outcomes
+                
+                mi = np.array(mutual_info_regression(X, y, discrete_features=True))
             self.weights = self.weights + (self.alpha * (mi - self.weights))
-            for attribute, weight in zip(self.attributes, self.weights):
-                weight = np.clip(weight, 0, 1)
-                self.agent.similarity([attribute], weight=weight*100)
+            self.agent.set_weights({attribute: np.clip(weight, 0, 1) * 100
+                                    for attribute, weight in zip(self.attributes, self.weights)})
 
             #print(self.weights, " With relevant attribute: ", self.env.valued_attribute)
 
@@ -0,0 +1,90 @@
+import numpy as np
+from collections import deque
+
+
+class IncrementalMutualInfo:
+    def __init__(self, num_features, num_values, bin_width=0.25, window=0, decay=1.0):
+        """
+        Running estimate of the mutual information between each of several discrete
+        features and a real valued outcome, a replacement for calling sklearn's
+        mutual_info_regression on the whole history at every timestep.
+
+        The outcome is discretized into bins of width bin_width, and joint counts of
+        (feature value, outcome bin) are kept for every feature, so adding an observation
+        costs O(num_features) and estimating the mutual information costs
+        O(num_features * num_values * bins), independent of the length of the history.
+
+        :param num_features: The number of discrete features, e.g. attributes.
+        :param num_values: The number of values each feature can take, coded 0..num_values-1.
+        :param bin_width: The width of the bins into which outcomes are discretized.
+        :param window: If positive, only the most recent window observations are counted.
+        :param decay: If less than one, each observation's weight is multiplied by decay
+                      at every subsequent observation.
+        """
+        assert(bin_width > 0)
+        assert(0 < decay <= 1)
+        self.num_features = num_features
+        self.num_values = num_values
+        self.bin_width = bin_width
+        self.window = window
+        self.decay = decay
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.bins = {}
+        # Joint counts, one column per outcome bin, added as new bins are encountered
+        self.joint = np.zeros((self.num_features, self.num_values, 0))
+        self.history = deque()
+        # With exponential decay new observations are given a weight that grows by
+        # 1/decay each step, rather than shrinking all the existing counts
+        self.increment = 1.0
+
+    def _bin(self, outcome):
+        key = int(np.floor(outcome / self.bin_width))
+        if(key not in self.bins):
+            self.bins[key] = len(self.bins)
+            self.joint = np.concatenate((self.joint, np.zeros((self.num_features, self.num_values, 1))), axis=2)
+        return self.bins[key]
+
+    def update(self, values, outcome):
+        """
+        Add an observation.
+
+        :param values: The value codes of each of the features.
+        :param outcome: The real valued outcome observed.
+        """
+        features = np.arange(self.num_features)
+        values = np.asarray(values[:self.num_features], dtype=np.intp)
+        outcome_bin = self._bin(outcome)
+        if(self.decay < 1):
+            self.increment /= self.decay
+            if(self.increment > 1e100):
+                self.joint /= self.increment
+                self.history = deque((v, b, w / self.increment) for v, b, w in self.history)
+                self.increment = 1.0
+        self.joint[features, values, outcome_bin] += self.increment
+        self.count += 1
+        if(self.window > 0):
+            self.history.append((values, outcome_bin, self.increment))
+            if(len(self.history) > self.window):
+                old_values, old_bin, old_weight = self.history.popleft()
+                self.joint[features, old_values, old_bin] -= old_weight
+                self.count -= 1
+
+    def mutual_info(self):
+        """
+        The estimated mutual information, in nats, between each feature and the outcome.
+
+        :return: An array of num_features non-negative values.
+        """
+        joint = np.clip(self.joint, 0, None)
+        total = joint[0].sum()
+        if(total <= 0):
+            return np.zeros(self.num_features)
+        p = joint / total
+        p_value = p.sum(axis=2, keepdims=True)
+        p_outcome = p.sum(axis=1, keepdims=True)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            terms = p * np.log(p / (p_value * p_outcome))
+        return np.clip(np.nansum(terms, axis=(1, 2)), 0, None)
@@ -2,7 +2,8 @@ import warnings
 warnings.simplefilter("ignore", UserWarning)
 
 import argparse
-import tqdm
+import random
+from functools import partial
 
 import numpy as np 
 import pandas as pd 
@@ -13,6 +14,9 @@ import matplotlib.pyplot as plt
 from Environments import multiAttribute
 from pyibl import Agent 
 from Models import FRLAgent 
+from Models.mutualInfo import IncrementalMutualInfo
+from Experiments import Recorder, Sweep, ResultStore, LearningCurves
+from Experiments.curves import lineplot
 from sklearn.feature_selection import mutual_info_regression
 
 
@@ -28,63 +32,77 @@ def get_choices():
             choices[choice_idx][attribute] = values[choice_idx]
     return choices
 
-def Train(args):
-    columns = ["Timestep", "Correct", "Model"]
-    df = pd.DataFrame([], columns=columns)
-    delayedResponses = []
-    choices = []
-    reward_sum = 0
+def TrainModel(args, shard=None):
+    """
+    Train args.agents agents of args.model, one of "IBL", "WIBL", "FRL" or "WFRL", or,
+    given a shard of a Sweep, a list of (agent index, seed) pairs, only those agents,
+    each seeded with its own seed.
+    """
     window = 10
     attributes = ['Attribute 0', 'Attribute 1', 'Attribute 2']
     values = ['Value 0', "Value 1", 'Value 2']
-    weights = np.ones(3)
     alpha = 0.75
     env = multiAttribute(args)
-    num_agents = 200
-    num_resets = 2
     num_timesteps = 50
-    num_models = 4
-    pbar = tqdm.tqdm(total=num_models*num_timesteps*num_resets*num_agents)
-    for model in ["IBL", "WIBL", "FRL", "WFRL"]:
-        for _ in range(num_agents):
-            memory = []
-            if(model == "IBL" or model == "WIBL"):
-                a = Agent(name="name", attributes=['Attribute 0', 'Attribute 1', 'Attribute 2'], mismatch_penalty=1, default_utility=0.5)
-            if(model == "FRL" or model == "WFRL"):
-                a = FRLAgent(args=args, env=env)
-            for reset in  [0,1]:
-                for ts in range(num_timesteps):
-                    pbar.update(1)
-                    choices = get_choices()
-                    choice = a.choose(choices)
-                    if(isinstance(choice, tuple)):
-                        choice = choice[0]
-                    if(reset):
-                        if(choice['Attribute 0'] == 'Value 1'):
-                            reward = np.random.choice([0,1], 1, p=[0.25, 0.75])[0] #+ np.random.normal(0,.1)
-                            correct = 1
-                        else:
-                            reward = np.random.choice([0,1], 1, p=[0.75, 0.25])[0] #+ np.random.normal(0,.1)
-                            correct = 0
+    model = args.model
+    if(shard is None):
+        shard = [(agentIdx, None) for agentIdx in range(args.agents)]
+    if(args.summary):
+        recorder = LearningCurves(["Model"], ["Correct"])
+    else:
+        recorder = Recorder({"Timestep": int, "Correct": int, "Model": "category"}, capacity=num_timesteps*2*len(shard))
+    for agentIdx, seed in shard:
+        if(seed is not None):
+            random.seed(seed)
+            np.random.seed(seed)
+        # Every agent starts afresh, so that its results do not depend on its shard
+        delayedResponses = []
+        reward_sum = 0
+        weights = np.ones(3)
+        memory = []
+        if(args.mi_estimator == "incremental"):
+            mutualInfo = IncrementalMutualInfo(3, len(values), bin_width=args.mi_bin_width, window=args.mi_window, decay=args.mi_decay)
+        if(model == "IBL" or model == "WIBL"):
+            a = Agent(name="name", attributes=['Attribute 0', 'Attribute 1', 'Attribute 2'], mismatch_penalty=1, default_utility=0.5)
+        if(model == "FRL" or model == "WFRL"):
+            a = FRLAgent(args=args, env=env)
+        for reset in  [0,1]:
+            for ts in range(num_timesteps):
+                choices = get_choices()
+                choice = a.choose(choices)
+                if(isinstance(choice, tuple)):
+                    choice = choice[0]
+                if(reset):
+                    if(choice['Attribute 0'] == 'Value 1'):
+                        reward = np.random.choice([0,1], 1, p=[0.25, 0.75])[0] #+ np.random.normal(0,.1)
+                        correct = 1
                     else:
-                        if(choice['Attribute 0'] == 'Value 1'):
-                            reward = np.random.choice([0,1], 1, p=[0.25, 0.75])[0] #+ np.random.normal(0,.1)
-                            correct = 1
-                        else:
-                            reward = np.random.choice([0,1], 1, p=[0.75, 0.25])[0] #+ np.random.normal(0,.1)
-                            correct = 0
-                    reward_sum += reward
-                    if(model == "IBL" or model == "WIBL"):
-                        delayedResponses.append(a.respond())
+                        reward = np.random.choice([0,1], 1, p=[0.75, 0.25])[0] #+ np.random.normal(0,.1)
+                        correct = 0
+                else:
+                    if(choice['Attribute 0'] == 'Value 1'):
+                        reward = np.random.choice([0,1], 1, p=[0.25, 0.75])[0] #+ np.random.normal(0,.1)
+                        correct = 1
+                    else:
+                        reward = np.random.choice([0,1], 1, p=[0.75, 0.25])[0] #+ np.random.normal(0,.1)
+                        correct = 0
+                reward_sum += reward
+                if(model == "IBL" or model == "WIBL"):
+                    delayedResponses.append(a.respond())
 
-                    if(model == "WFRL"):
-                        a.updateWeights()
-                    if(model == "WIBL"):
-                        memVals = [values.index(list(choice.values())[attr_idx]) for attr_idx in range(3)]
-                        memVals.append(reward)
-                        memory.append(memVals)
+                if(model == "WFRL"):
+                    a.updateWeights()
+                if(model == "WIBL"):
+                    memVals = [values.index(list(choice.values())[attr_idx]) for attr_idx in range(3)]
+                    if(args.mi_estimator == "incremental"):
+                        mutualInfo.update(memVals, reward)
+                    memVals.append(reward)
+                    memory.append(memVals)
 
-                        if(len(memory) > 5):
+                    if(len(memory) > 5):
+                        if(args.mi_estimator == "incremental"):
+                            mi = mutualInfo.mutual_info()
+                        else:
                             data = np.array(memory)
                             #last_twenty_slice = slice(-20, None)
                             #sample = data[last_twenty_slice]
@@ -94,30 +112,37 @@ def Train(args):
                             y = sample[:, -1]    # Last column
                             
                             mi = np.array(mutual_info_regression(X, y, discrete_features=True))
-                            weights = weights + (alpha * (mi - weights))
-                            for attribute, weight in zip(attributes, weights):
-                                weight = np.clip(weight, 0, 1)
-                                a.similarity([attribute], weight=weight*100)
-                    
+                        weights = weights + (alpha * (mi - weights))
+                        for attribute, weight in zip(attributes, weights):
+                            weight = np.clip(weight, 0, 1)
+                            a.similarity([attribute], weight=weight*100)
+                
 
-                    d = pd.DataFrame([[ts + (reset * num_timesteps), correct, model]], columns=columns)
-                    df = pd.concat([d, df], ignore_index=True)
+                recorder.record(Timestep=ts + (reset * num_timesteps), Correct=correct, Model=model)
 
-                    if(ts % window == 0):
-                        if(model == "WIBL"):
-                            for delayedResponse in delayedResponses:
-                                delayedResponse.update(reward_sum/window)
-                        elif(model == "IBL"):
-                            for delayedResponse in delayedResponses:
-                                delayedResponse.update(reward_sum/window)
-                        else:
-                            a.respond(reward_sum)
-                        delayedResponses = []
-                        reward_sum = 0
-    pbar.close()
+                if(ts % window == 0):
+                    if(model == "WIBL"):
+                        for delayedResponse in delayedResponses:
+                            delayedResponse.update(reward_sum/window)
+                    elif(model == "IBL"):
+                        for delayedResponse in delayedResponses:
+                            delayedResponse.update(reward_sum/window)
+                    else:
+                        a.respond(reward_sum)
+                    delayedResponses = []
+                    reward_sum = 0
+    return recorder.to_frame()
+
+def Train(args):
+    args.agents = 200
+    sweep = Sweep(TrainModel, args, [{"model": ["IBL", "WIBL", "FRL", "WFRL"]}], shard_size=args.shard_size, cache=args.cache, processes=args.processes, store=ResultStore(args.store) if args.store else None, combine=partial(LearningCurves.combine, keys=["Model"], values=["Correct"]) if args.summary else None)
+    df = sweep.run()
     df.to_pickle("./Results/Clustered_Intra.pkl")
-    df['Timestep'] = round(df['Timestep'] / 50) * 50
-    sns.lineplot(df, x="Timestep", y="Correct", hue="Model")
+    if(args.summary):
+        lineplot(df, x="Timestep", y="Correct", hue="Model")
+    else:
+        df['Timestep'] = round(df['Timestep'] / 50) * 50
+        sns.lineplot(df, x="Timestep", y="Correct", hue="Model")
     plt.show()
 
 if __name__ == "__main__":
@@ -146,7 +171,16 @@ if __name__ == "__main__":
     parser.add_argument("--risky", dest="risky", type=bool, default=False, help="Whether to use risky rewards")
     parser.add_argument("--softTemp", dest="softMaxInverseTemp", type=float, default=0.01, help="FRL model softmax inverse temperature")
     parser.add_argument("--lr", "--learning-rate", dest="lr", type=float, default=0.9, help="FRL model learning rate")
+    parser.add_argument("--mi-estimator", dest="mi_estimator", type=str, default="sklearn", choices=["sklearn", "incremental"], help="Mutual information estimator used for attention weight updating")
+    parser.add_argument("--mi-window", dest="mi_window", type=int, default=0, help="Observations counted by the incremental estimator, 0 for all")
+    parser.add_argument("--mi-decay", dest="mi_decay", type=float, default=1.0, help="Exponential decay of observations in the incremental estimator")
+    parser.add_argument("--mi-bin-width", dest="mi_bin_width", type=float, default=0.25, help="Width of the outcome bins of the incremental estimator")
     parser.add_argument("--feedback", dest="feedback", type=str, default="Clustered", help="FRL model decay")
+    parser.add_argument("--processes", dest="processes", type=int, default=1, help="Worker processes running the shards of the sweep")
+    parser.add_argument("--shard-size", dest="shard_size", type=int, default=0, help="Agents per shard of the sweep, 0 for all the agents of a model")
+    parser.add_argument("--cache", dest="cache", type=str, default=None, help="Directory of completed shards, so that an interrupted or extended sweep only runs missing shards")
+    parser.add_argument("--summary", dest="summary", action="store_true", help="Keep only the mean and variance of each learning curve, not every trial")
+    parser.add_argument("--store", dest="store", type=str, default=None, help="Directory of a result store, from which cells already run with the same args and code are reused")
                         
     args = parser.parse_args()
 
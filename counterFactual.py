@@ -8,16 +8,90 @@ import seaborn as sns
 import pandas as pd 
 import numpy as np
 import random 
+from functools import partial
 
-from Models import IBLAgent, FRLAgent
-from Environments import multiAttribute
+from Models import IBLAgent, FRLAgent, FRLPopulation
+from Environments import multiAttribute, BatchMultiAttribute, TrialStream
+from Experiments import Recorder, Sweep, ResultStore, LearningCurves
 
-def Train(args):
-    cols = ["Name", "Timestep", "Reward", "Correct", "Resets", "IntraDimensional", "ExtraDimensional", "Feedback"]
-    df = pd.DataFrame([], columns=cols)
-    for agentIdx in range(args.agents):
-        args.seed = args.seed + agentIdx # Different seed for each agent but same set of seeds across agent population
-        env = multiAttribute(args)
+# Types of the columns of the results of Train
+columns = {"Name": "category", "Timestep": int, "Reward": float, "Correct": int, "Resets": int, "IntraDimensional": bool, "ExtraDimensional": bool, "Feedback": "category"}
+# The columns identifying a learning curve
+curveKeys = ["Name", "Feedback", "IntraDimensional", "ExtraDimensional"]
+
+def MakeRecorder(args, rows):
+    # Only the running mean and variance of each learning curve are kept if args.summary
+    if(args.summary):
+        return LearningCurves(curveKeys)
+    return Recorder(columns, capacity=rows)
+
+def TrainPopulation(args, shard=None):
+    # All the FRL agents learn together, each in its own environment
+    population = args.agents if shard is None else len(shard)
+    recorder = MakeRecorder(args, population * args.timesteps * 2)
+    trials = TrialStream.open(args.trials, args, args.agents) if args.trials else None
+    if(shard is None):
+        rng = None
+    else:
+        # A shard of a sweep replays its own agents' trials, and each agent's environment
+        # draws from its own generator, seeded by its agent's seed, so that the results do
+        # not depend on how the agents are sharded
+        trials = trials.subset([agentIdx for agentIdx, seed in shard]) if trials else None
+        rng = [np.random.default_rng(seed) for agentIdx, seed in shard]
+    env = BatchMultiAttribute(args, population, rng=rng, trials=trials)
+    agents = FRLPopulation(args, population)
+    choices = env.get_choices()
+    reward_sum = np.zeros(population)
+    for resets in range(2):
+        for ts in range(args.timesteps): 
+            choiceIdx = agents.choose(choices)
+            next_choices, reward, correct = env.step(choiceIdx)
+            if(args.feedback == "Immediate"):
+                agents.respond(reward)
+            elif(args.feedback == "Clustered"):
+                reward_sum += reward
+                if(ts % 5 == 0):
+                    agents.respond(reward_sum)
+                    reward_sum = np.zeros(population)
+                else:
+                    agents.respond(None)
+            elif(args.feedback == "Additional"):
+                agents.respond(reward)
+                reward = reward[env.envIdx, choiceIdx]
+            else:
+                print("Feedback method not recognized")
+                assert(False)
+
+            agents.updateWeights()
+            choices = next_choices
+            timestep = ts + (resets * args.timesteps)
+            timestep = int((timestep / 2)) * 2
+            recorder.record_many(Name=args.name, Timestep=timestep, Reward=reward, Correct=correct, Resets=resets, IntraDimensional=args.id, ExtraDimensional=args.ed, Feedback=args.feedback)
+        if(resets == 0):
+            choices = env.reset()
+
+    return recorder.to_frame()
+
+def Train(args, shard=None):
+    """
+    Train args.agents agents of args.model, or, given a shard of a Sweep, a list of
+    (agent index, seed) pairs, only those agents, each seeded with its own seed.
+    """
+    if(args.model == "FRLPopulation"):
+        return TrainPopulation(args, shard)
+    if(shard is None):
+        shard = [(agentIdx, None) for agentIdx in range(args.agents)]
+    recorder = MakeRecorder(args, len(shard) * args.timesteps * 2)
+    # Every model replays the same precomputed trials if a trial stream is given
+    trials = TrialStream.open(args.trials, args, args.agents) if args.trials else None
+    for agentIdx, seed in shard:
+        if(seed is None):
+            args.seed = args.seed + agentIdx # Different seed for each agent but same set of seeds across agent population
+        else:
+            args.seed = seed
+            random.seed(seed)
+            np.random.seed(seed)
+        env = multiAttribute(args, trials=trials.agent(agentIdx) if trials else None)
         if(args.model == "FRLAgent"):
             agent = FRLAgent(args, env)
         elif(args.model == "IBLAgent"):
@@ -53,12 +127,11 @@ def Train(args):
                 choices = next_choices
                 timestep = ts + (resets * args.timesteps)
                 timestep = int((timestep / 2)) * 2
-                d = pd.DataFrame([[args.name, timestep, reward, correct, resets, args.id, args.ed, args.feedback]], columns=cols)
-                df = pd.concat([df, d], ignore_index=True)
+                recorder.record(Name=args.name, Timestep=timestep, Reward=reward, Correct=correct, Resets=resets, IntraDimensional=args.id, ExtraDimensional=args.ed, Feedback=args.feedback)
             if(resets == 0):
                 choices = env.reset()
 
-    return df
+    return recorder.to_frame()
 
 
 if __name__ == "__main__":
@@ -87,29 +160,29 @@ if __name__ == "__main__":
     parser.add_argument("--risky", dest="risky", type=bool, default=False, help="Whether to use risky rewards")
     parser.add_argument("--softTemp", dest="softMaxInverseTemp", type=float, default=0.01, help="FRL model softmax inverse temperature")
     parser.add_argument("--lr", "--learning-rate", dest="lr", type=float, default=0.9, help="FRL model learning rate")
+    parser.add_argument("--mi-estimator", dest="mi_estimator", type=str, default="sklearn", choices=["sklearn", "incremental"], help="Mutual information estimator used for attention weight updating")
+    parser.add_argument("--mi-window", dest="mi_window", type=int, default=0, help="Observations counted by the incremental estimator, 0 for all")
+    parser.add_argument("--mi-decay", dest="mi_decay", type=float, default=1.0, help="Exponential decay of observations in the incremental estimator")
+    parser.add_argument("--trials", dest="trials", type=str, default=None, help="Directory of a precomputed trial stream replayed by every model, created if needed")
+    parser.add_argument("--mi-bin-width", dest="mi_bin_width", type=float, default=0.25, help="Width of the outcome bins of the incremental estimator")
+    parser.add_argument("--processes", dest="processes", type=int, default=1, help="Worker processes running the shards of the sweep")
+    parser.add_argument("--shard-size", dest="shard_size", type=int, default=0, help="Agents per shard of the sweep, 0 for all the agents of a cell")
+    parser.add_argument("--cache", dest="cache", type=str, default=None, help="Directory of completed shards, so that an interrupted or extended sweep only runs missing shards")
+    parser.add_argument("--summary", dest="summary", action="store_true", help="Keep only the mean and variance of each learning curve, not every trial")
+    parser.add_argument("--store", dest="store", type=str, default=None, help="Directory of a result store, from which cells already run with the same args and code are reused")
 
     args = parser.parse_args()
 
-    cols = ["Name", "Timestep", "Reward", "Correct", "Resets", "IntraDimensional", "ExtraDimensional"]
-    df = pd.DataFrame([], columns=cols)
-    iterations = 0
-    #for feedback in ["Additional", "Immediate", "Clustered"]:
-    for feedback in ["Clustered"]:
-        args.feedback = feedback
-        #for weight_updating, name, model in zip([True, True, False, False], ["WIBL", "WFRL", "IBL", "FRL"], ["IBLAgent", "FRLAgent", "IBLAgent", "FRLAgent"]):
-        for weight_updating, name, model in zip([True], ["WIBL"], ["IBLAgent"]):
-            for shift, id, ed in zip(["IntraDimensional", "ExtraDimensional"], [False, True], [True, False]):
-                iterations += 1
-                print("Iteration: ", iterations)
-                args.id = id
-                args.ed = ed 
-                args.name = name
-                args.model = model 
-                args.weight_updating = weight_updating
-                d = Train(args)
-                fileName = model + "_" + feedback + "_" + shift + ".pkl"
-                #df.to_pickle(args.saveFolder + fileName)
-                df = pd.concat([df, d], ignore_index=True)
+    # The cells are every feedback, each (weight_updating, name, model) and each shift
+    grid = [
+        #{"feedback": ["Additional", "Immediate", "Clustered"]},
+        {"feedback": ["Clustered"]},
+        #{"weight_updating": [True, True, False, False], "name": ["WIBL", "WFRL", "IBL", "FRL"], "model": ["IBLAgent", "FRLAgent", "IBLAgent", "FRLAgent"]},
+        {"weight_updating": [True], "name": ["WIBL"], "model": ["IBLAgent"]},
+        {"id": [False, True], "ed": [True, False]},
+    ]
+    sweep = Sweep(Train, args, grid, shard_size=args.shard_size, cache=args.cache, processes=args.processes, store=ResultStore(args.store) if args.store else None, combine=partial(LearningCurves.combine, keys=curveKeys) if args.summary else None)
+    df = sweep.run()
 
     #df.to_pickle(args.saveFolder + "All_Results.pkl")
     
@@ -2,8 +2,29 @@ import pandas as pd
 import seaborn as sns 
 import matplotlib.pyplot as plt 
 import numpy as np 
+import os
+
+from Experiments import ResultStore, LearningCurves
+from Experiments.curves import lineplot
+
+# Read only the cells of each panel from the result store written by the sweeps with --store,
+# or else filter the single pickle of all the simulations, and draw the learning curves from
+# their means and standard errors, as kept by the sweeps with --summary or computed here
+store = ResultStore("./Results/Store") if os.path.exists("./Results/Store") else None
+if(store is None or len(store) == 0):
+    store = None
+    df = pd.read_pickle("./Results/Simulations.pkl")
+
+def panel(names, feedback, shift):
+    if(store is not None):
+        results = store.load(name=names, feedback=feedback, id=(shift == "IntraDimensional"), ed=(shift == "ExtraDimensional"))
+    else:
+        results = df[df['Name'].isin(names) & (df['Feedback'] == feedback)]
+        results = results[results[shift] == 1]
+    if("CorrectSEM" not in results):
+        results = LearningCurves.summarize(results, ["Name"], values=["Correct"])
+    return results
 
-df = pd.read_pickle("./Results/Simulations.pkl")
 fig = plt.figure(figsize=(16, 4))
 # Top Row
 ax1 = plt.subplot2grid((1, 6), (0, 0), colspan=1)
@@ -18,40 +39,13 @@ iblPalette.reverse()
 frlPalette = sns.color_palette(palette='tab10')[3:5]
 palette = iblPalette + frlPalette
 
-model = "IBL"
-ibl = df[(df['Name'] == 'IBL') | (df['Name'] == 'WIBL')]
-im=df[df['Feedback'] == "Immediate"]
-sns.lineplot(im[im["IntraDimensional"] == 1], x="Timestep", y="Correct", ax=ax1, hue="Name", palette=iblPalette, hue_order=['W' + model, model], errorbar=('ci', 68))
-sns.lineplot(im[im["ExtraDimensional"] == 1], x="Timestep", y="Correct", ax=ax2, hue="Name", palette=iblPalette, hue_order=['W' + model, model], errorbar=('ci', 68))
-ax1.set_title("Intradimensional", fontsize=16)
-ax2.set_title("Extradimensional", fontsize=16)
-
-cl=df[df['Feedback'] == "Clustered"]
-sns.lineplot(cl[cl["IntraDimensional"] == 1], x="Timestep", y="Correct", ax=ax3, hue="Name", palette=iblPalette, hue_order=['W' + model, model], errorbar=('ci', 68))
-sns.lineplot(cl[cl["ExtraDimensional"] == 1], x="Timestep", y="Correct", ax=ax4, hue="Name", palette=iblPalette, hue_order=['W' + model, model], errorbar=('ci', 68))
-ax3.set_title("Intradimensional", fontsize=16)
-ax4.set_title("Extradimensional", fontsize=16)
-
-ad=df[df['Feedback'] == "Additional"]
-sns.lineplot(ad[ad["IntraDimensional"] == 1], x="Timestep", y="Correct", ax=ax5, hue="Name", palette=iblPalette, hue_order=['W' + model, model], errorbar=('ci', 68))
-sns.lineplot(ad[ad["ExtraDimensional"] == 1], x="Timestep", y="Correct", ax=ax6, hue="Name", palette=iblPalette, hue_order=['W' + model, model], errorbar=('ci', 68))
-ax5.set_title("Intradimensional", fontsize=16)
-ax6.set_title("Extradimensional", fontsize=16)
-
-model = "FRL"
-frl = df[(df['Name'] == 'FRL') | (df['Name'] == 'WFRL')]
-im = frl[frl["Feedback"] == "Immediate"]
-sns.lineplot(im[im["IntraDimensional"] == 1], x="Timestep", y="Correct", ax=ax1, hue="Name", palette=frlPalette, hue_order=['W' + model, model], errorbar=('ci', 68))
-sns.lineplot(im[im["ExtraDimensional"] == 1], x="Timestep", y="Correct", ax=ax2, hue="Name", palette=frlPalette, hue_order=['W' + model, model], errorbar=('ci', 68))
-
-cl = frl[frl["Feedback"] == "Clustered"]
-sns.lineplot(cl[cl["IntraDimensional"] == 1], x="Timestep", y="Correct", ax=ax3, hue="Name", palette=frlPalette, hue_order=['W' + model, model], errorbar=('ci', 68))
-sns.lineplot(cl[cl["ExtraDimensional"] == 1], x="Timestep", y="Correct", ax=ax4, hue="Name", palette=frlPalette, hue_order=['W' + model, model], errorbar=('ci', 68))
-
-ad = frl[frl["Feedback"] == "Additional"]
-sns.lineplot(ad[ad["IntraDimensional"] == 1], x="Timestep", y="Correct", ax=ax5, hue="Name", palette=frlPalette, hue_order=['W' + model, model], errorbar=('ci', 68))
-sns.lineplot(ad[ad["ExtraDimensional"] == 1], x="Timestep", y="Correct", ax=ax6, hue="Name", palette=frlPalette, hue_order=['W' + model, model], errorbar=('ci', 68))
-
+for model, modelPalette in zip(["IBL", "FRL"], [iblPalette, frlPalette]):
+    names = ['W' + model, model]
+    for feedback, intraAx, extraAx in zip(["Immediate", "Clustered", "Additional"], [ax1, ax3, ax5], [ax2, ax4, ax6]):
+        lineplot(panel(names, feedback, "IntraDimensional"), x="Timestep", y="Correct", ax=intraAx, hue="Name", palette=modelPalette, hue_order=names, errorbar=('ci', 68))
+        lineplot(panel(names, feedback, "ExtraDimensional"), x="Timestep", y="Correct", ax=extraAx, hue="Name", palette=modelPalette, hue_order=names, errorbar=('ci', 68))
+        intraAx.set_title("Intradimensional", fontsize=16)
+        extraAx.set_title("Extradimensional", fontsize=16)
 
 ax1.set_ylabel("Probability of Correct Choice", fontsize=14)
 ax1.legend(fontsize=14) 
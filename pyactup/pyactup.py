@@ -61,7 +61,7 @@ from prettytable import PrettyTable
 from pylru import lrucache
 from warnings import warn
 
-__all__ = ["__version__", "Memory"]
+__all__ = ["__version__", "Memory", "PopulationMemory", "ActivationHistory"]
 
 
 DEFAULT_NOISE = 0.25
@@ -70,9 +70,97 @@ DEFAULT_DECAY = 0.5
 MINIMUM_TEMPERATURE = 0.01
 
 REFERENCES_FACTOR = 4
+INITIAL_STORE_SIZE = 64
+POPULATION_INITIAL_CHUNKS = 8
+HISTORY_INITIAL_SIZE = 256
 SIMILARITY_CACHE_SIZE = 10_000
 MAXIMUM_RANDOM_SEED = 2**62
 
+# The multipliers and key increments of the Philox4x32 counter-based random number
+# generator of Salmon et al., "Parallel random numbers: as easy as 1, 2, 3", SC 2011
+PHILOX_MULTIPLIERS = (np.uint64(0xD2511F53), np.uint64(0xCD9E8D57))
+PHILOX_INCREMENTS = (0x9E3779B9, 0xBB67AE85)
+PHILOX_ROUNDS = 10
+SCALAR_NOISE_LIMIT = 8
+_MASK32 = np.uint64(0xFFFFFFFF)
+_SHIFT32 = np.uint64(32)
+
+
+def _philox(counters, key):
+    # The four 32 bit words of the Philox4x32-10 bijection of each of the counters, given
+    # as four arrays of 32 bit words, under a key of two 32 bit words, each either a
+    # single value or an array of them broadcastable against the counters.
+    c0, c1, c2, c3 = (np.asarray(c, dtype=np.uint64) & _MASK32 for c in counters)
+    k0, k1 = (np.asarray(k, dtype=np.uint64) for k in key)
+    for i in range(PHILOX_ROUNDS):
+        p0 = PHILOX_MULTIPLIERS[0] * c0
+        p1 = PHILOX_MULTIPLIERS[1] * c2
+        c0, c1, c2, c3 = ((p1 >> _SHIFT32) ^ c1 ^ k0, p1 & _MASK32,
+                          (p0 >> _SHIFT32) ^ c3 ^ k1, p0 & _MASK32)
+        k0 = (k0 + np.uint64(PHILOX_INCREMENTS[0])) & _MASK32
+        k1 = (k1 + np.uint64(PHILOX_INCREMENTS[1])) & _MASK32
+    return c0, c1, c2, c3
+
+
+def _unit_interval(w0, w1):
+    # A real number strictly between zero and one from the 52 high bits of two 32 bit
+    # words, either Python integers or arrays of them, offset by half a unit so that it
+    # is never zero or one; all 52 bits and the half are exactly representable, while
+    # with 53 bits the largest value plus a half would round up to one.
+    return ((((w0 << 32) | w1) >> 12) + 0.5) / 4503599627370496
+
+
+def _scalar_logistic(seed, time_bits, serial, draw):
+    # The standard logistic noise value computed by _logistic_noise, for a single serial
+    # number and draw
+    c0, c1, c2, c3 = int(serial), int(draw), time_bits & 0xFFFFFFFF, time_bits >> 32
+    k0, k1 = seed & 0xFFFFFFFF, seed >> 32
+    m0, m1 = int(PHILOX_MULTIPLIERS[0]), int(PHILOX_MULTIPLIERS[1])
+    for i in range(PHILOX_ROUNDS):
+        p0 = m0 * c0
+        p1 = m1 * c2
+        c0, c1, c2, c3 = (p1 >> 32) ^ c1 ^ k0, p1 & 0xFFFFFFFF, (p0 >> 32) ^ c3 ^ k1, p0 & 0xFFFFFFFF
+        k0 = (k0 + PHILOX_INCREMENTS[0]) & 0xFFFFFFFF
+        k1 = (k1 + PHILOX_INCREMENTS[1]) & 0xFFFFFFFF
+    u = _unit_interval(c0, c1)
+    return math.log(u / (1 - u))
+
+
+def _derived_seeds(entropy, index, n):
+    # A list of n seeds, the index'th such list derived from entropy, a list of integers
+    return np.random.SeedSequence(entropy, spawn_key=(index,)).generate_state(
+        n, np.uint64).tolist()
+
+
+def _logistic_noise(seed, time, serials, draws, scale):
+    # Logistic noise, one value for each pair of a chunk serial number and a draw index,
+    # at the given time, a pure function of these and of the seed. The seed may instead
+    # be an array of seeds, broadcast against the serials and draws.
+    time_bits = int(np.float64(time).view(np.uint64))
+    if isinstance(seed, np.ndarray):
+        seed = seed.astype(np.uint64)
+        shape = np.broadcast_shapes(np.shape(serials), np.shape(draws), seed.shape)
+        serials = np.broadcast_to(np.asarray(serials, dtype=np.uint64), shape)
+        draws = np.broadcast_to(np.asarray(draws, dtype=np.uint64), shape)
+        key = (seed & _MASK32, seed >> _SHIFT32)
+    elif np.size(serials) <= SCALAR_NOISE_LIMIT and np.size(draws) <= SCALAR_NOISE_LIMIT:
+        # for a few values numpy's per operation overhead dominates, so use Python integers
+        return scale * np.array([_scalar_logistic(seed, time_bits, s, d) for s, d in
+                                 zip(*np.broadcast_arrays(np.atleast_1d(serials),
+                                                          np.atleast_1d(draws)))],
+                                dtype=np.float64)
+    else:
+        serials, draws = np.broadcast_arrays(np.asarray(serials, dtype=np.uint64),
+                                             np.asarray(draws, dtype=np.uint64))
+        key = (seed & 0xFFFFFFFF, seed >> 32)
+    w0, w1, w2, w3 = _philox((serials, draws,
+                              np.full(serials.shape, time_bits & 0xFFFFFFFF, dtype=np.uint64),
+                              np.full(serials.shape, time_bits >> 32, dtype=np.uint64)),
+                             key)
+    u = _unit_interval(w0, w1)
+    return scale * np.log(u / (1 - u))
+
+
 class Memory(dict):
     """A cognitive entity containing a collection of learned things, its chunks.
     A ``Memory`` object also contains a current time, which can be queried as the
@@ -114,6 +202,21 @@ class Memory(dict):
     after the ``Memory`` was created. All chunks in a ``Memory`` with an *index* must
     contain values for all the attributes listed in the *index*; if any are omitted in the
     argument to :meth:`learn` they will be automatically added with a value of ``None``.
+    Independently of any *index*, every ``Memory`` also maintains, for each attribute
+    value, the chunks containing it, so that chunks matching any combination of exact
+    conditions are found without examining every chunk; an *index* remains slightly faster
+    when its attributes are exactly those matched.
+
+    For models with a *very* large number of chunks the ``columnar`` keyword argument, if
+    true, stores the reference times of all the chunks in a single array, allowing the
+    base-level activations of many chunks to be computed at once. See :attr:`columnar`
+    for further details.
+
+    The activation noise is a pure function of the ``seed`` keyword argument, the chunk,
+    the time and how many times noise has already been drawn at that time, so a ``Memory``
+    given the same *seed* and used in the same way produces exactly the same results,
+    whatever else is run before it or alongside it, in this or any other process. See
+    :attr:`seed` for further details.
 
     If, when creating a ``Memory`` object, any of the various parameters have unsupported
     values an :exc:`Exception` will be raised. See the documentation for the various
@@ -130,9 +233,15 @@ class Memory(dict):
                  mismatch=None,
                  optimized_learning=False,
                  use_actr_similarity=False,
-                 index=None):
+                 index=None,
+                 columnar=False,
+                 seed=None):
         self._fixed_noise = None
         self._fixed_noise_time = None
+        self._fixed_distribution_noise = dict()
+        self._draw = 0
+        self._draw_time = None
+        self._chunk_serial = 0
         self._temperature_param = 1 # will be reset below, but is needed for noise assignment
         self._noise = None
         self._noise_distribution = None
@@ -143,6 +252,11 @@ class Memory(dict):
         self._maximum_similarity = 1
         self._similarities = defaultdict(Similarity)
         self._extra_activation = None
+        self._store = None
+        self._base_level_cache = dict()
+        self._base_level_time = None
+        self._interned = defaultdict(dict)
+        self._interned_values = defaultdict(list)
         self.noise = noise
         self.decay = decay
         if temperature is None and not self._validate_temperature(None, noise):
@@ -155,13 +269,18 @@ class Memory(dict):
         self.mismatch = mismatch
         self.optimized_learning = optimized_learning
         self.use_actr_similarity = use_actr_similarity
+        self.columnar = columnar
         self._slot_name_index = defaultdict(list)
+        self._value_index = defaultdict(dict)
         self._indexed_attributes = set()
         self._index = defaultdict(list)
         self.index = index
         self._activation_history = None
-        # Initialize the noise RNG from the parent Python RNG, in case the latter gets seeded for determinancy.
-        self._rng = np.random.default_rng([random.randint(0, MAXIMUM_RANDOM_SEED) for i in range(16)])
+        self._seed_param = Memory._validate_seed(seed)
+        # Drawn from the parent Python RNG, in case the latter gets seeded for
+        # determinancy; seeds are derived from these, without drawing any more.
+        self._entropy = [random.randint(0, MAXIMUM_RANDOM_SEED) for i in range(16)]
+        self._seeds_derived = 0
         self.reset()
 
     def __repr__(self):
@@ -185,17 +304,37 @@ class Memory(dict):
                                           if r <= 0])
                 c._reference_count = len(c._references)
         self.clear()
+        # The interned values are discarded, so that they do not accumulate over the
+        # participants simulated by a reused Memory, except those of declared domains.
+        self._interned.clear()
+        self._interned_values.clear()
+        for a, sim in self._similarities.items():
+            sim._domain_positions = None
+            for v in sim._domain or ():
+                self._intern(a, v)
+        if self._store is not None:
+            self._store.clear()
+        self._base_level_cache.clear()
         self._slot_name_index.clear()
+        self._value_index.clear()
         self._index.clear()
-        self._clear_fixed_noise()
         self._activation_history = None
         self._time = 0
+        self._chunk_serial = 0
+        self._new_seed()
         if index is not None:
             self.index = index
         if preserve_prepopulated:
+            self._chunk_serial = max((c._serial + 1 for c in preserved.values()), default=0)
             for k, c in preserved.items():
+                c._codes = {n: self._intern(n, v) for n, v in c.items()}
+                if self._store is not None:
+                    refs = c._references
+                    self._store.add(c, max(refs.size, 1))
+                    c._references[:refs.size] = refs
                 self[k] = c
                 self._slot_name_index[frozenset(c.keys())].append(c)
+                self._add_to_value_index(c)
                 if  self._indexed_attributes:
                     self._index[Memory._signature(c, "learn", self._indexed_attributes)
                                 ].append(c)
@@ -264,17 +403,88 @@ class Memory(dict):
         old_fixed_noise_time = self._fixed_noise_time
         try:
             if self._fixed_noise is None:
-                self._fixed_noise = dict()
-                self._fixed_noise_time = self._time
+                # a draw index is reserved the first time noise is needed
+                self._fixed_noise = True
+                self._fixed_noise_time = None
+                self._fixed_distribution_noise.clear()
             yield self
         finally:
             self._fixed_noise = old_fixed_noise
             self._fixed_noise_time = old_fixed_noise_time
 
     def _clear_fixed_noise(self):
-        if self._fixed_noise:
-            self._fixed_noise.clear()
-            self._fixed_noise_time = self._time
+        if self._fixed_noise is not None:
+            self._fixed_noise_time = None
+            self._fixed_distribution_noise.clear()
+
+    @property
+    def seed(self):
+        r"""The key of this ``Memory``'s activation noise, a non-negative integer less than 2\ :sup:`64`.
+        Rather than being drawn in sequence from a random number generator, the noise
+        added to the activation of a chunk is computed by the Philox4x32-10
+        counter-based random number generator from this seed, the serial number of the
+        chunk in this ``Memory``, the time, and the index of the draw, the number of
+        times noise has been drawn at that time. Noise for many chunks is computed in a
+        single vectorized operation, and two ``Memory`` objects with the same seed, and
+        the same sequence of operations, have bit-identical noise, no matter in which
+        process or in what order they are run, so that a population of simulated
+        participants, each seeded for example from its index, gives the same results
+        however it is split between workers.
+
+        If, when the ``Memory`` is created, or this property is set, the seed is
+        ``None``, a seed is derived from values drawn from Python's :mod:`random` module
+        when the ``Memory`` was created, so that seeding the latter also makes the noise
+        deterministic, and a new one is derived from them each time the ``Memory`` is
+        :meth:`reset`, so that a ``Memory`` reused for several simulated participants
+        gives each of them independent noise. No further values are drawn from
+        :mod:`random`, which therefore produces the same values as it did before
+        noise was computed in this way. An explicitly set seed is
+        kept when the ``Memory`` is reset. Setting it to anything other than
+        ``None`` or a non-negative integer less than 2\ :sup:`64` raises a
+        :exc:`ValueError`.
+
+        If a :attr:`noise_distribution` is set, it is called for each noise value
+        needed, so the noise then depends only upon it.
+        """
+        return self._seed
+
+    @seed.setter
+    def seed(self, value):
+        self._seed_param = Memory._validate_seed(value)
+        self._new_seed()
+
+    @staticmethod
+    def _validate_seed(value):
+        if value is None:
+            return None
+        if (isinstance(value, bool) or not isinstance(value, (int, np.integer))
+                or not 0 <= value < 2**64):
+            raise ValueError(f"The seed, {value}, is not a non-negative integer less than 2**64")
+        return int(value)
+
+    def _new_seed(self):
+        if self._seed_param is None:
+            self._seed = _derived_seeds(self._entropy, self._seeds_derived, 1)[0]
+            self._seeds_derived += 1
+        else:
+            self._seed = self._seed_param
+        self._draw_time = None
+        self._clear_fixed_noise()
+
+    def _draws(self, n):
+        # The indices of n noise draws at the current time; within fixed_noise every draw
+        # at a given time has the same index, reserved when noise is first needed.
+        if self._draw_time != self._time:
+            self._draw_time = self._time
+            self._draw = 0
+        if self._fixed_noise is not None:
+            if self._fixed_noise_time != self._time:
+                self._fixed_noise = self._draw
+                self._fixed_noise_time = self._time
+                self._draw += 1
+            return np.full(n, self._fixed_noise, dtype=np.uint64)
+        self._draw += n
+        return np.arange(self._draw - n, self._draw, dtype=np.uint64)
 
     @property
     def index(self):
@@ -461,6 +671,7 @@ class Memory(dict):
             self._decay = float(value)
         else:
             self._decay = None
+        self._base_level_cache.clear()
 
     @property
     def temperature(self):
@@ -611,6 +822,35 @@ class Memory(dict):
                                "already contains chunks")
         self._optimized_learning = v
 
+    @property
+    def columnar(self):
+        """Whether or not this Memory keeps its chunks' reference times in a single, columnar store.
+        If ``False``, the default, each chunk holds its own array of the times at which it
+        was reinforced, and base-level activations are computed one chunk at a time. If
+        ``True`` the reference times of all the chunks are instead held in one flat array,
+        each chunk owning a segment of it, with their creation times and reference counts
+        held in parallel arrays; the base-level activations of all the chunks considered
+        by a retrieval or blending operation are then computed in a single, vectorized
+        reduction, which can be significantly faster for models with a large number of
+        chunks. The results of the two representations are the same, other than possibly
+        in the last few bits of floating point values.
+
+        The value of this attribute can only be changed when the :class:`Memory` object
+        does not contain any chunks, typically immediately after it is created or
+        :meth:`reset`. Otherwise a :exc:`RuntimeError` is raised.
+        """
+        return self._store is not None
+
+    @columnar.setter
+    def columnar(self, value):
+        value = bool(value)
+        if value == (self._store is not None):
+            return
+        if self:
+            raise RuntimeError("Cannot change the columnar setting of a Memory that "
+                               "already contains chunks")
+        self._store = ChunkStore() if value else None
+
     @property
     def use_actr_similarity(self):
         """ Whether similarity computations for this :class:`Memory` use "natural" similarity values or traditional ACT-R ones.
@@ -628,7 +868,7 @@ class Memory(dict):
     @use_actr_similarity.setter
     def use_actr_similarity(self, value):
         for s in self._similarities.values():
-            s._cache.clear()
+            s._clear()
         if value:
             self._minimum_similarity = -1
             self._maximum_similarity =  0
@@ -688,14 +928,16 @@ class Memory(dict):
         also collected for blending operations.
         The details collected are presented as dictionaries.
         As a convenience setting :attr:`activation_history` to ``True`` assigns a fresh,
-        empty list as its value.
+        empty list as its value. It may instead be set to an :class:`ActivationHistory`,
+        which records the same details in preallocated arrays, much more cheaply.
 
         If PyACTUp is being used in a loop, the details collected will likely become
         voluminous. It is usually best to clear them frequently, such as on each
         iteration.
 
-        Attempting to set :attr:`activation_history` to anything but ``None``, ``True`` or
-        a :class:`MutableSequence` raises a :exc:`ValueError`.
+        Attempting to set :attr:`activation_history` to anything but ``None``, ``True``,
+        a :class:`MutableSequence` or an :class:`ActivationHistory` raises a
+        :exc:`ValueError`.
 
         >>> m = Memory()
         >>> m.learn({"color": "red", "size": 3})
@@ -739,11 +981,11 @@ class Memory(dict):
             self._activation_history = None
         elif value is True:
             self._activation_history = list()
-        elif isinstance(value, abc.MutableSequence):
+        elif isinstance(value, (abc.MutableSequence, ActivationHistory)):
             self._activation_history = value
         else:
-            raise ValueError(
-                f"A value assigned to activation_history must be a MutableSequence ({value}).")
+            raise ValueError(f"A value assigned to activation_history must be a "
+                             f"MutableSequence or an ActivationHistory ({value}).")
 
     @property
     def chunks(self):
@@ -843,6 +1085,7 @@ class Memory(dict):
             created = True
             self[signature] = chunk
             self._slot_name_index[frozenset(slots.keys())].append(chunk)
+            self._add_to_value_index(chunk)
             if  self._indexed_attributes:
                 self._index[Memory._signature(chunk, "learn", self._indexed_attributes)
                             ].append(chunk)
@@ -895,22 +1138,76 @@ class Memory(dict):
                 raise ValueError(f"No attributes provided")
         return result
 
+    def _intern(self, name, value):
+        # Returns a small, non-negative integer uniquely identifying value amongst the
+        # values this Memory has seen for the slot name.
+        codes = self._interned[name]
+        if (code := codes.get(value)) is None:
+            code = codes[value] = len(codes)
+            self._interned_values[name].append(value)
+        return code
+
+    def _slot_codes(self, name, chunks):
+        return np.fromiter((c._codes[name] for c in chunks), dtype=np.intp, count=len(chunks))
+
+    def _penalty_column(self, name, value, similarity, codes):
+        # The weighted mismatch penalties of chunks whose values of the slot name have the
+        # given interned codes, when matched against value.
+        code = self._interned[name].get(value)
+        if similarity._function is True:
+            if code is None:
+                return np.full(codes.size, -similarity._weight)
+            return np.where(codes == code, 0.0, -similarity._weight)
+        if similarity._domain is not None and code is not None:
+            positions = similarity._positions(self._interned_values[name])
+            if (row := positions[code]) >= 0:
+                columns = positions[codes]
+                inside = columns >= 0
+                if inside.all():
+                    return similarity._weight * similarity._rows()[row][columns]
+                # values outside the domain are compared as if there were no domain
+                result = np.empty(codes.shape)
+                result[inside] = similarity._weight * similarity._rows()[row][columns[inside]]
+                result[~inside] = Memory._distinct_penalties(value, similarity, code,
+                                                             self._interned_values[name],
+                                                             codes[~inside])
+                return result
+        return Memory._distinct_penalties(value, similarity, code,
+                                          self._interned_values[name], codes)
+
+    @staticmethod
+    def _distinct_penalties(value, similarity, code, interned, codes):
+        # Only the distinct values of the candidates are compared with value, so the
+        # similarity function is never called on values of chunks that could not match.
+        distinct, inverse = np.unique(codes, return_inverse=True)
+        table = similarity._unweighted([interned[c] for c in distinct], value)
+        if code is not None:
+            table[distinct == code] = 0
+        return similarity._weight * table[inverse.reshape(codes.shape)]
+
     def _cite(self, chunk):
         if self._optimized_learning is None:
             if chunk._reference_count >= chunk._references.size:
-                chunk._references.resize(REFERENCES_FACTOR * chunk._references.size,
-                                         refcheck=False)
+                self._resize_references(chunk, REFERENCES_FACTOR * chunk._references.size)
             chunk._references[chunk._reference_count] = self._time
         elif  chunk._reference_count < self._optimized_learning:
             if chunk._reference_count >= chunk._references.size:
-                chunk._references.resize(min(REFERENCES_FACTOR * chunk._references.size,
-                                             self._optimized_learning),
-                                         refcheck=False)
+                self._resize_references(chunk, min(REFERENCES_FACTOR * chunk._references.size,
+                                                   self._optimized_learning))
             chunk._references[chunk._reference_count] = self._time
         elif self._optimized_learning:
             chunk._references[:-1] = chunk._references[1:]
             chunk._references[-1] = self._time
         chunk._reference_count += 1
+        if self._store is not None:
+            self._store._counts[chunk._id] = chunk._reference_count
+        self._base_level_cache.pop(chunk._name, None)
+
+    def _resize_references(self, chunk, size):
+        if self._store is not None:
+            self._store.resize(chunk, size)
+        else:
+            chunk._references.resize(size, refcheck=False)
 
     def forget(self, slots, when):
         """Undoes the operation of a previous call to :meth:`learn`.
@@ -941,19 +1238,89 @@ class Memory(dict):
         if i < chunk._reference_count:
             chunk._references[i:chunk._reference_count-1] = chunk._references[i+1:chunk._reference_count]
         chunk._reference_count -= 1
+        if self._store is not None:
+            self._store._counts[chunk._id] = chunk._reference_count
+        self._base_level_cache.pop(chunk._name, None)
         if not chunk._reference_count:
+            if self._store is not None:
+                self._store.remove(chunk)
             self._slot_name_index[frozenset(chunk.keys())].remove(chunk)
+            self._remove_from_value_index(chunk)
             del self[signature]
             if self._indexed_attributes:
                 self._index[Memory._signature(chunk, "forget", self._indexed_attributes)
                             ].remove(chunk)
         return True
 
-    def _activations(self, conditions, extra=None, partial=True):
-        slot_names = conditions.keys()
-        if extra:
-            slot_names = set(slot_names)
-            slot_names.add(extra)
+    def _base_levels(self, chunks):
+        # Base-level activations only change when time passes or a chunk is learned or
+        # forgotten, so they are cached for the current time, and shared by the several
+        # retrieval or blending operations typically performed at one time.
+        if self._base_level_time != self._time:
+            self._base_level_cache.clear()
+            self._base_level_time = self._time
+        cache = self._base_level_cache
+        if missing := [c for c in chunks if c._name not in cache]:
+            for c, b in zip(missing, self._compute_base_levels(missing)):
+                cache[c._name] = b
+        return np.fromiter((cache[c._name] for c in chunks), dtype=np.float64,
+                           count=len(chunks))
+
+    def _compute_base_levels(self, chunks):
+        nchunks = len(chunks)
+        if self._store is not None and (self._optimized_learning is None
+                                        or self._optimized_learning == 0):
+            ids = self._store.ids(chunks)
+            if self._optimized_learning is None:
+                result = np.log(self._store.power_sums(ids, self._time, self._decay))
+            else:
+                result = (np.log(self._store._counts[ids] / (1 - self._decay))
+                          - self._decay * np.log(self._time - self._store._creations[ids]))
+        elif self._optimized_learning is None:
+            result = np.empty(nchunks)
+            for c, i in zip(chunks, count()):
+                result[i] = np.sum((self._time - c._references[0:c._reference_count])
+                                   ** -self._decay)
+            result = np.log(result)
+        elif self._optimized_learning == 0:
+            counts = np.empty(nchunks)
+            ages = np.empty(nchunks)
+            for c, i in zip(chunks, count()):
+                counts[i] = c._reference_count
+                ages[i] = self._time - c._creation
+            result = (np.log(counts / (1 - self._decay))
+                      - self._decay * np.log(ages))
+        else:
+            result = np.empty(nchunks)
+            counts = np.ma.masked_all(nchunks)
+            ages = np.ma.masked_all(nchunks)
+            middles = np.ma.masked_all(nchunks)
+            for c, i in zip(chunks, count()):
+                if c._reference_count <= self._optimized_learning:
+                    result[i] = np.sum((self._time - c._references[0:c._reference_count])
+                                       ** -self._decay)
+                else:
+                    result[i] = np.sum((self._time - c._references[0:self._optimized_learning])
+                                       ** -self._decay)
+                    counts[i] = c._reference_count
+                    ages[i] = self._time - c._creation
+                    middles[i] = c._references[0]
+            dd = 1 - self._decay
+            counts -= self._optimized_learning
+            diff = ages - middles
+            diff *= dd
+            ages **= dd
+            middles **= dd
+            tmp = ages
+            tmp -= middles
+            tmp *= counts
+            tmp /= diff
+            result = np.log(result + tmp.filled(0))
+        return result
+
+    def _split_slots(self, conditions, partial):
+        # Divides the conditions into those to be matched exactly, as (name, value) pairs,
+        # and those to be matched partially, as (name, value, Similarity) triples.
         partial_slots = []
         if partial and self._mismatch is not None:
             exact_slots =[]
@@ -964,114 +1331,158 @@ class Memory(dict):
                     exact_slots.append((n, v))
         else:
             exact_slots = list(conditions.items())
+        return exact_slots, partial_slots
+
+    def _add_to_value_index(self, chunk):
+        # The value index maps each (attribute name, value) pair to the chunks containing
+        # it, grouped by the chunks' sets of slot names, so that the chunks matching any
+        # set of exact conditions can be found by intersecting these postings, in the same
+        # order as they would be found by scanning _slot_name_index. Each posting is a
+        # dict from chunk names to chunks, which retains the order in which chunks were
+        # added while allowing constant time membership tests and removals.
+        group = frozenset(chunk.keys())
+        for item in chunk.items():
+            postings = self._value_index[item]
+            if (posting := postings.get(group)) is None:
+                posting = postings[group] = dict()
+            posting[chunk._name] = chunk
+
+    def _remove_from_value_index(self, chunk):
+        group = frozenset(chunk.keys())
+        for item in chunk.items():
+            postings = self._value_index[item]
+            posting = postings[group]
+            del posting[chunk._name]
+            if not posting:
+                del postings[group]
+                if not postings:
+                    del self._value_index[item]
+
+    def _matching_chunks(self, conditions, slot_names, exact_slots):
         if self._indexed_attributes and (set(a[0] for a in exact_slots)
                                          == self._indexed_attributes):
-            chunks = self._index[Memory._signature(conditions,
-                                                   None,
-                                                   self._indexed_attributes)]
+            return self._index[Memory._signature(conditions,
+                                                 None,
+                                                 self._indexed_attributes)]
+        if exact_slots:
+            try:
+                return self._intersect_postings(slot_names, exact_slots)
+            except TypeError:
+                # an unhashable value, which can only be matched by scanning
+                pass
+        chunks = []
+        for k, candidates in self._slot_name_index.items():
+            if slot_names <= k: # subset
+                for c in candidates:
+                    if not all(c[n] == v for n, v in exact_slots):
+                        continue
+                    chunks.append(c)
+        return chunks
+
+    def _intersect_postings(self, slot_names, exact_slots):
+        all_postings = []
+        for item in exact_slots:
+            if not (postings := self._value_index.get(item)):
+                return []
+            all_postings.append(postings)
+        chunks = []
+        for k in self._slot_name_index:
+            if not slot_names <= k:
+                continue
+            group_postings = []
+            for postings in all_postings:
+                if not (posting := postings.get(k)):
+                    break
+                group_postings.append(posting)
+            else:
+                group_postings.sort(key=len)
+                smallest, others = group_postings[0], group_postings[1:]
+                chunks.extend(c for name, c in smallest.items()
+                              if all(name in p for p in others))
+        return chunks
+
+    def _noise_values(self, chunks, rows=None):
+        # The activation noise of the chunks, drawn once. If rows, an array of indices, is
+        # supplied chunks is instead a flattened sequence of the chunks of several rows,
+        # rows giving the row of each, numbered consecutively from zero, and noise is drawn
+        # once for each row.
+        nchunks = len(chunks)
+        if self._noise_distribution is not None:
+            noise = self._noise * np.array([self._noise_distribution()
+                                            for i in range(nchunks)],
+                                           dtype=np.float64)
+            if self._fixed_noise is not None:
+                if self._fixed_noise_time != self._time:
+                    self._fixed_distribution_noise.clear()
+                    self._fixed_noise_time = self._time
+                fixed = self._fixed_distribution_noise
+                for c, i in zip(chunks, count()):
+                    noise[i] = fixed.setdefault(c._serial, noise[i])
+            return noise
+        serials = np.fromiter((c._serial for c in chunks), dtype=np.uint64, count=nchunks)
+        if rows is None:
+            draws = self._draws(1)
         else:
-            chunks = []
-            for k, candidates in self._slot_name_index.items():
-                if slot_names <= k: # subset
-                    for c in candidates:
-                        if not all(c[n] == v for n, v in exact_slots):
-                            continue
-                        chunks.append(c)
+            draws = self._draws(int(rows[-1]) + 1 if nchunks else 0)[rows]
+        return _logistic_noise(self._seed, self._time, serials, draws, self._noise)
+
+    def _activations(self, conditions, extra=None, partial=True):
+        slot_names = conditions.keys()
+        if extra:
+            slot_names = set(slot_names)
+            slot_names.add(extra)
+        exact_slots, partial_slots = self._split_slots(conditions, partial)
+        chunks = self._matching_chunks(conditions, slot_names, exact_slots)
         if len(chunks) == 0:
             return None, None, 0
         nchunks = len(chunks)
+        history = self._activation_history
+        records = history if isinstance(history, ActivationHistory) else None
+        if records is not None:
+            history = None
+        noise = similarities = penalties = extra_activations = None
         with np.errstate(divide="raise", over="raise", under="ignore", invalid="raise"):
             try:
                 if self._decay is not None:
-                    if self._optimized_learning is None:
-                        result = np.empty(nchunks)
-                        for c, i in zip(chunks, count()):
-                            result[i] = np.sum((self._time - c._references[0:c._reference_count])
-                                               ** -self._decay)
-                        result = np.log(result)
-                    elif self._optimized_learning == 0:
-                        counts = np.empty(nchunks)
-                        ages = np.empty(nchunks)
-                        for c, i in zip(chunks, count()):
-                            counts[i] = c._reference_count
-                            ages[i] = self._time - c._creation
-                        result = (np.log(counts / (1 - self._decay))
-                                  - self._decay * np.log(ages))
-                    else:
-                        result = np.empty(nchunks)
-                        counts = np.ma.masked_all(nchunks)
-                        ages = np.ma.masked_all(nchunks)
-                        middles = np.ma.masked_all(nchunks)
-                        for c, i in zip(chunks, count()):
-                            if c._reference_count <= self._optimized_learning:
-                                result[i] = np.sum((self._time - c._references[0:c._reference_count])
-                                                   ** -self._decay)
-                            else:
-                                result[i] = np.sum((self._time - c._references[0:self._optimized_learning])
-                                                   ** -self._decay)
-                                counts[i] = c._reference_count
-                                ages[i] = self._time - c._creation
-                                middles[i] = c._references[0]
-                        dd = 1 - self._decay
-                        counts -= self._optimized_learning
-                        diff = ages - middles
-                        diff *= dd
-                        ages **= dd
-                        middles **= dd
-                        tmp = ages
-                        tmp -= middles
-                        tmp *= counts
-                        tmp /= diff
-                        result = np.log(result + tmp.filled(0))
+                    result = self._base_levels(chunks)
                 else:
                     result = np.zeros(nchunks)
-                if self._activation_history is not None:
-                    initial_history_length = len(self._activation_history)
+                if records is not None:
+                    base = result.copy()
+                if history is not None:
+                    initial_history_length = len(history)
                     for c, r in zip(chunks, result):
-                        self._activation_history.append({"time": self.time,
-                                                         "name": c._name,
-                                                         "creation_time": c._creation,
-                                                         "attributes": tuple(c.items()),
-                                                         "reference_count": c.reference_count,
-                                                         "references": c.references,
-                                                         "base_level_activation": r})
+                        history.append({"time": self.time,
+                                        "name": c._name,
+                                        "creation_time": c._creation,
+                                        "attributes": tuple(c.items()),
+                                        "reference_count": c.reference_count,
+                                        "references": c.references,
+                                        "base_level_activation": r})
                 if self._noise:
-                    if self._noise_distribution is not None:
-                        noise = self._noise * np.array([self._noise_distribution()
-                                                        for i in range(nchunks)],
-                                                       dtype=np.float64)
-                    else:
-                        noise = self._rng.logistic(scale=self._noise, size=nchunks)
-                    if self._fixed_noise is not None:
-                        if self._fixed_noise_time != self._time:
-                            self._clear_fixed_noise()
-                            for c, s in zip(chunks, noise):
-                                self._fixed_noise[c._name] = s
-                        else:
-                            for c, s, i in zip(chunks, noise, count()):
-                                if x := self._fixed_noise.get(c._name):
-                                    noise[i] = x
-                                else:
-                                    self._fixed_noise[c._name] = s
+                    noise = self._noise_values(chunks)
                     result += noise
-                    if self._activation_history is not None:
+                    if history is not None:
                         for i, s in zip(count(initial_history_length), noise):
-                            self._activation_history[i]["activation_noise"] = s
+                            history[i]["activation_noise"] = s
                 if partial_slots:
                     penalties = np.empty((nchunks, len(partial_slots)))
-                    for c, row in zip(chunks, count()):
-                        penalties[row] = [s._similarity(c[n], v) for n, v, s in partial_slots]
-                    if self._activation_history is not None:
-                        offset = 0 if self.use_actr_similarity else 1
+                    for (n, v, s), col in zip(partial_slots, count()):
+                        penalties[:, col] = self._penalty_column(n, v, s,
+                                                                 self._slot_codes(n, chunks))
+                    offset = 0 if self.use_actr_similarity else 1
+                    if records is not None:
+                        similarities = penalties + offset
+                    if history is not None:
                         for i, pens in zip(count(initial_history_length), penalties):
                             similarities = {ps[0]: p + offset
                                             for ps, p in zip(partial_slots, pens)}
-                            self._activation_history[i]["similarities"] = similarities
+                            history[i]["similarities"] = similarities
                     penalties = np.sum(penalties, 1) * self._mismatch
                     result += penalties
-                    if self._activation_history is not None:
+                    if history is not None:
                         for i, p in zip(count(initial_history_length), penalties):
-                            self._activation_history[i]["mismatch"] = p
+                            history[i]["mismatch"] = p
                 if self._extra_activation is not None:
                     extra_activations = np.empty((nchunks))
                     try:
@@ -1080,14 +1491,18 @@ class Memory(dict):
                     except:
                         raise RuntimeError("Error attempting to compute extra activation values")
                     result += extra_activations
-                    if self._activation_history is not None:
+                    if history is not None:
                         for i, ea in zip(count(initial_history_length), extra_activations):
-                            self._activation_history[i]["extra_activation"] = ea
-                if self._activation_history is not None:
+                            history[i]["extra_activation"] = ea
+                if history is not None:
                     for i, r in zip(count(initial_history_length), result):
-                        self._activation_history[i]["activation"] = r
+                        history[i]["activation"] = r
                         if self._threshold is not None:
-                            self._activation_history[i]["meets_threshold"] = (r >= self._threshold)
+                            history[i]["meets_threshold"] = (r >= self._threshold)
+                if records is not None:
+                    records._record(self.time, chunks, base, noise, similarities,
+                                    [ps[0] for ps in partial_slots], penalties,
+                                    extra_activations, result, self._threshold)
                 raw_activations_count = len(result)
                 if self._threshold is not None:
                     m = np.ma.masked_less(result, self._threshold)
@@ -1159,7 +1574,10 @@ class Memory(dict):
         with np.errstate(divide="raise", over="raise", under="ignore", invalid="raise"):
             wp = np.exp(activations / self._temperature)
             wp /= np.sum(wp)
-        if self._activation_history is not None:
+        if isinstance(self._activation_history, ActivationHistory):
+            h = self._activation_history
+            h._set_probabilities(len(h) - raw, len(h), wp)
+        elif self._activation_history is not None:
             h = self._activation_history
             # this i malarkey is in case one or more candidates didn't clear the threshold
             i = len(h) - raw
@@ -1268,6 +1686,184 @@ class Memory(dict):
             fsal = {}
         return result, isal, fsal
 
+    def blend_many(self, outcome_attribute, slots_list):
+        """Returns a list of blended values for the given attribute, one for each of the :class:`Mapping` objects in *slots_list*.
+        Each element of the result is the value that would be returned by :meth:`blend`
+        were it called with *outcome_attribute* and the corresponding element of
+        *slots_list*, including ``None`` if there are no matching chunks that contain
+        *outcome_attribute*; however, the computations for all the elements of
+        *slots_list* are done together. The set of chunks to consider and their base-level
+        activations are determined only once, the activations and mismatch penalties of
+        those chunks for all the elements of *slots_list* are computed as a single matrix,
+        with one row per element of *slots_list*, and the retrieval probabilities and
+        blended values are then computed row by row. For models that blend over several
+        sets of slots at the same time, such as choosing between several options, this is
+        typically much faster than calling :meth:`blend` repeatedly. Each element of
+        *slots_list* receives its own, independent activation noise, just as if
+        :meth:`blend` were called separately for each.
+
+        If :attr:`activation_history` is being collected in a list this simply calls
+        :meth:`blend` for each of the elements of *slots_list*, so that the history
+        collected is as it would be for those individual calls. An
+        :class:`ActivationHistory` is instead filled in from the matrix, with the same
+        rows as those individual calls would record.
+
+        >>> m = Memory()
+        >>> m.learn({"color":"red", "size":2})
+        <Chunk 0000 {'color': 'red', 'size': 2} 1>
+        >>> m.advance()
+        1
+        >>> m.learn({"color":"blue", "size":30})
+        <Chunk 0001 {'color': 'blue', 'size': 30} 1>
+        >>> m.advance()
+        2
+        >>> m.learn({"color":"red", "size":1})
+        <Chunk 0002 {'color': 'red', 'size': 1} 1>
+        >>> m.advance()
+        3
+        >>> m.blend_many("size", [{"color": "red"}, {"color": "blue"}, {"color": "green"}])
+        [1.3660254037844388, 30.0, None]
+        """
+        Memory._ensure_slot_name(outcome_attribute)
+        queries = [self._ensure_slots(s) for s in slots_list]
+        recorded = None
+        if isinstance(self._activation_history, ActivationHistory):
+            recorded = []
+        elif self._activation_history is not None:
+            return [self.blend(outcome_attribute, q) for q in queries]
+        result = [None] * len(queries)
+        activations, chunks = self._activation_matrix(outcome_attribute, queries,
+                                                      recorded=recorded)
+        if chunks is None:
+            return result
+        with np.errstate(divide="raise", over="raise", under="ignore", invalid="raise"):
+            retrieved = np.isfinite(activations).any(axis=1)
+            if not retrieved.any():
+                return result
+            activations = activations[retrieved]
+            try:
+                outcomes = np.array([c[outcome_attribute] for c in chunks], dtype=np.float64)
+                wp = np.exp(activations / self._temperature)
+                wp /= np.sum(wp, axis=1, keepdims=True)
+                blended = np.sum(wp * outcomes, axis=1) / np.sum(wp, axis=1)
+            except Exception as e:
+                raise RuntimeError(f"Error computing blended value, is perhaps the value "
+                                   f"of the {outcome_attribute} slotis not numeric in "
+                                   f"one of the matching chunks? ({e})")
+        if recorded:
+            rows = np.cumsum(retrieved) - 1
+            for i, first, cols in recorded:
+                if retrieved[i]:
+                    meets = np.isfinite(activations[rows[i], cols])
+                    self._activation_history._set_probabilities(
+                        first, first + len(cols), wp[rows[i], cols][meets])
+        for i, b in zip(np.flatnonzero(retrieved), blended):
+            result[i] = float(b)
+        return result
+
+    def _activation_matrix(self, outcome_attribute, queries, noise=True, recorded=None):
+        # The activations of the chunks matching any of the queries, which must already
+        # have been passed through _ensure_slots, as a matrix with one row per query and
+        # one column per chunk, and the list of those chunks; a chunk not matching a query
+        # has an activation of -inf in that query's row. If noise is false the activations
+        # are computed without activation noise, and without applying the threshold, for
+        # callers adding their own noise. Returns None, None if no chunk matches. If
+        # recorded, a list, is supplied the activations of each query matching any chunks
+        # are also recorded in the activation_history, an ActivationHistory, as they would
+        # be by _activations, and a (query index, first row, columns) triple appended to
+        # recorded.
+        chunks = []
+        columns = dict()
+        groups = dict()
+        rows = []
+        for q in queries:
+            exact_slots, partial_slots = self._split_slots(q, True)
+            slot_names = set(q.keys())
+            slot_names.add(outcome_attribute)
+            try:
+                key = (frozenset(slot_names), frozenset(exact_slots))
+                group = groups.get(key)
+            except TypeError:
+                key = None
+                group = None
+            if group is None:
+                found = self._matching_chunks(q, slot_names, exact_slots)
+                for c in found:
+                    if c._name not in columns:
+                        columns[c._name] = len(chunks)
+                        chunks.append(c)
+                group = (np.fromiter((columns[c._name] for c in found), dtype=np.intp,
+                                     count=len(found)),
+                         found,
+                         dict())
+                if key is not None:
+                    groups[key] = group
+            rows.append((group, partial_slots))
+        if not chunks:
+            return None, None
+        nchunks = len(chunks)
+        with np.errstate(divide="raise", over="raise", under="ignore", invalid="raise"):
+            try:
+                if self._decay is not None:
+                    base = self._base_levels(chunks)
+                else:
+                    base = np.zeros(nchunks)
+                base_levels = extras = None
+                if self._extra_activation is not None:
+                    try:
+                        extras = np.array([sum(f(c) for f in self._extra_activation)
+                                           for c in chunks],
+                                          dtype=np.float64)
+                    except:
+                        raise RuntimeError("Error attempting to compute extra activation values")
+                    base_levels = base
+                    base = base + extras
+                activations = np.full((len(queries), nchunks), -np.inf)
+                if noise and self._noise:
+                    # the noise of every query is drawn in a single vectorized operation, as
+                    # if drawn query by query, skipping those matching no chunks
+                    lengths = [len(group[1]) for group, p in rows]
+                    nonempty = [n for n in lengths if n]
+                    noises = self._noise_values([c for group, p in rows for c in group[1]],
+                                                np.repeat(np.arange(len(nonempty)), nonempty))
+                    offsets = np.concatenate(([0], np.cumsum(lengths)))
+                for i, ((cols, found, codes), partial_slots) in enumerate(rows):
+                    if not found:
+                        continue
+                    row = base[cols]
+                    if noise and self._noise:
+                        row = row + noises[offsets[i]:offsets[i + 1]]
+                    penalties = []
+                    for n, v, s in partial_slots:
+                        if (slot_codes := codes.get(n)) is None:
+                            slot_codes = codes[n] = self._slot_codes(n, found)
+                        penalties.append(self._penalty_column(n, v, s, slot_codes))
+                        row = row + self._mismatch * penalties[-1]
+                    activations[i, cols] = row
+                    if recorded is not None:
+                        recorded.append((i, self._record_row(
+                            found, cols, base if base_levels is None else base_levels,
+                            noises[offsets[i]:offsets[i + 1]] if noise and self._noise else None,
+                            partial_slots, penalties, extras, row), cols))
+                if noise and self._threshold is not None:
+                    activations[activations < self._threshold] = -np.inf
+            except FloatingPointError as e:
+                raise RuntimeError(f"Error when computing activations, perhaps a chunk's "
+                                   f"creation or reinforcement time is not in the past? ({e})")
+        return activations, chunks
+
+    def _record_row(self, found, cols, base, noise, partial_slots, penalties, extras, row):
+        # Records one row of _activation_matrix in the ActivationHistory, returning the
+        # index of its first record
+        similarities = mismatch = None
+        if partial_slots:
+            similarities = np.column_stack(penalties) + (0 if self.use_actr_similarity else 1)
+            mismatch = np.sum(penalties, 0) * self._mismatch
+        return self._activation_history._record(
+            self.time, found, base[cols], noise, similarities,
+            [ps[0] for ps in partial_slots], mismatch,
+            None if extras is None else extras[cols], row, self._threshold)
+
     def best_blend(self, outcome_attribute, iterable, select_attribute=None, minimize=False):
         """Returns two values (as a 2-tuple), describing the extreme blended value of the *outcome_attribute* over the values provided by *iterable*.
         The extreme value is normally the maximum, but can be made the minimum by setting
@@ -1319,12 +1915,11 @@ class Memory(dict):
         comparator = operator.gt if not minimize else operator.lt
         best_value = -math.inf if not minimize else math.inf
         best_args = []
-        for thing in iterable:
-            if select_attribute is not None:
-                slots = { select_attribute : thing }
-            else:
-                slots = thing
-            value = self.blend(outcome_attribute, slots)
+        if select_attribute is not None:
+            slots_list = [{ select_attribute : thing } for thing in iterable]
+        else:
+            slots_list = list(iterable)
+        for slots, value in zip(slots_list, self.blend_many(outcome_attribute, slots_list)):
             if value is None:
                 pass
             elif value == best_value:
@@ -1386,7 +1981,8 @@ class Memory(dict):
         return (random.choice(best),
                 dict(sorted(candidates.items(), key=lambda x: x[1], reverse=True)))
 
-    def similarity(self, attributes, function=None, weight=None, derivative=None):
+    def similarity(self, attributes, function=None, weight=None, derivative=None,
+                   vectorized=None, domain=None):
         """Assigns a similarity function and/or corresponding weight to be used when comparing attribute values with the given *attributes*.
         The *attributes* should be an :class:`Iterable` of strings, attribute names.
         The *function* should take two arguments, and return a real number between 0 and 1,
@@ -1410,6 +2006,26 @@ class Memory(dict):
         these cases the argument to :meth:`similarity` should return a value; often zero
         is a good choice in these cases.
 
+        If *vectorized* is true the *function* is declared to be able to compare a whole
+        vector of values at once: it will then be called with a NumPy array of attribute
+        values as its first argument and a single value as its second, and should return
+        an array of the same length as its first argument, the similarities of each of
+        its elements to the second argument. This can greatly reduce the cost of
+        computing mismatch penalties when a :class:`Memory` contains many chunks. The
+        values of each attribute are interned, so a similarity function is typically
+        only called for values not previously compared; and when *function* is ``True``
+        the comparisons are performed with a single vectorized equality test on these
+        interned values, with no Python level calls at all.
+
+        If *domain* is supplied it should be an :class:`Iterable` of the values the
+        *attributes* can take on, typically a small vocabulary of categorical values. The
+        similarity function is then evaluated once for every pair of these values, and
+        the resulting matrix of mismatch penalties is subsequently consulted by simple
+        indexing; changing only the *weight* scales the penalties without evaluating the
+        similarity function again. Values outside the *domain* are still permitted, but
+        are not added to the matrix; their penalties are computed as if there were no
+        *domain*. A *domain* has no effect if *function* is ``True``.
+
         If only one or two of *function*, *weight* and *derivatve* are supplied, they
         changed without changing those not supplied; the initial defaults are ``True`` for
         *function*, ``1`` for *weight*, and ``None`` for *derivative*. If none
@@ -1445,7 +2061,8 @@ class Memory(dict):
         if weight is not None and weight <= 0:
             raise ValueError(f"Similarity weight, {weight}, is not a positive number")
         for a in Memory._ensure_slot_names(attributes):
-            if function is None and weight is None and derivative is None:
+            if (function is None and weight is None and derivative is None
+                    and vectorized is None and domain is None):
                 if a in self._similarities:
                     del self._similarities[a]
             else:
@@ -1457,7 +2074,573 @@ class Memory(dict):
                     sim._derivative = derivative
                 if weight is not None and weight != sim._weight:
                     sim._weight = weight
-                sim._cache.clear()
+                if vectorized is not None:
+                    sim._vectorized = bool(vectorized)
+                if domain is not None:
+                    sim._domain = tuple(domain)
+                    for v in sim._domain:
+                        self._intern(a, v)
+                if (function is not None or derivative is not None
+                        or vectorized is not None or domain is not None):
+                    # all the cached penalties are unweighted, so remain valid if only
+                    # the weight has changed
+                    sim._clear()
+
+    def set_weights(self, weights):
+        """Changes the weights of the similarities of several attributes at once.
+        The *weights* should be a :class:`Mapping` from attribute names to positive, real
+        numbers, or an :class:`Iterable` of such pairs. The effect is the same as calling
+        :meth:`similarity` with just a *weight* for each attribute in turn; in particular
+        an attribute without a similarity function is given the default one. Changing
+        only weights never discards the similarity values this ``Memory`` has already
+        computed, so this is suitable for models that adjust attention weights on every
+        time step. If any of the weights is not a positive, real number a
+        :exc:`ValueError` is raised and none of the weights are changed.
+
+        >>> m.set_weights({"color": 0.5, "size": 2})
+        """
+        weights = dict(weights)
+        for a, w in weights.items():
+            Memory._ensure_slot_name(a)
+            if w <= 0:
+                raise ValueError(f"Similarity weight, {w}, is not a positive number")
+        for a, w in weights.items():
+            sim = self._similarities[a]
+            sim._memory = self
+            sim._weight = w
+
+
+class PopulationMemory:
+    """The memories of a population of participants, learning and blending all together.
+    A ``PopulationMemory`` holds *population* memories, each equivalent to a
+    :class:`Memory`, that share a clock and a set of chunk contents, but each have their own
+    references to those chunks. The reference times are kept as a single array of shape
+    ``(population, chunks, references)``, unused entries being masked, so that
+    :meth:`learn`, :meth:`advance`, :meth:`blend` and :meth:`blend_many` each operate on
+    every participant in one vectorized call. This allows, for example, simulating
+    thousands of virtual participants in an experiment in about the time a few
+    :class:`Memory` objects take.
+
+    Each participant's activations and blended values are as a :class:`Memory` with the
+    same parameters would compute them, including independent activation noise. The
+    parameters :attr:`noise`, :attr:`decay`, :attr:`temperature`, :attr:`threshold`,
+    :attr:`mismatch` and :attr:`optimized_learning` are shared by the population, and have
+    the same meanings and constraints as those of a :class:`Memory`, except that
+    :attr:`optimized_learning` may only be ``True`` or ``False``. Partial matching uses
+    similarities declared with :meth:`similarity`. Fixed noise, noise distributions, extra
+    activation and activation history are not supported.
+
+    Each participant's activation noise is computed as a :class:`Memory`'s is, from its
+    own seed, see :attr:`seeds`, and the serial numbers of its chunks, numbered in the
+    order in which it first learned them, so a participant given the seed of a
+    :class:`Memory` that learns and blends just as it does has exactly the same noise,
+    and a population split into several smaller ones, with the corresponding seeds,
+    gives bit-identical results.
+
+    The *population* must be a positive integer; if it is not a :exc:`ValueError` is
+    raised.
+
+    >>> m = PopulationMemory(3, noise=0, temperature=1)
+    >>> m.learn({"color": "red", "size": np.array([1, 2, 3])})
+    >>> m.advance()
+    1
+    >>> m.learn({"color": "red", "size": 4}, participants=[0, 2])
+    >>> m.advance()
+    2
+    >>> m.blend("size", {"color": "red"})
+    array([2.75735931, 2.        , 3.58578644])
+    """
+
+    def __init__(self,
+                 population,
+                 noise=DEFAULT_NOISE,
+                 decay=DEFAULT_DECAY,
+                 temperature=None,
+                 threshold=None,
+                 mismatch=None,
+                 optimized_learning=False,
+                 seeds=None):
+        if not (isinstance(population, int) and not isinstance(population, bool)
+                and population > 0):
+            raise ValueError(f"The population, {population}, is not a positive integer")
+        self._population = population
+        self._seeds_param = self._validate_seeds(seeds)
+        self._minimum_similarity = 0
+        self._maximum_similarity = 1
+        self._use_actr_similarity = False
+        self._similarities = defaultdict(Similarity)
+        self._temperature_param = 1 # will be reset below, but is needed for noise assignment
+        self._noise = None
+        self._decay = None
+        self._optimized_learning = False
+        self.noise = noise
+        self.decay = decay
+        if temperature is None and not Memory._validate_temperature(None, noise):
+            warn(f"A noise of {noise} and temperature of None will make the temperature "
+                 f"too low; setting temperature to 1")
+            self.temperature = 1
+        else:
+            self.temperature = temperature
+        self.threshold = threshold
+        self.mismatch = mismatch
+        self.optimized_learning = optimized_learning
+        # Drawn from the parent Python RNG, in case the latter gets seeded for
+        # determinancy; seeds are derived from these, as for a Memory.
+        self._entropy = [random.randint(0, MAXIMUM_RANDOM_SEED) for i in range(16)]
+        self._seeds_derived = 0
+        self.reset()
+
+    def __repr__(self):
+        return f"<PopulationMemory {id(self)}: {self._population}, {len(self)}, {self._time}>"
+
+    def __len__(self):
+        return len(self._chunks)
+
+    def reset(self):
+        """Deletes all the chunks of every participant, and resets the time to zero."""
+        self._time = 0
+        self._chunks = []
+        self._signatures = dict()
+        self._codes = dict()
+        self._interned = defaultdict(dict)
+        self._interned_values = defaultdict(list)
+        self._outcomes = dict()
+        self._base_level_cache = None
+        self._counts = np.zeros((self._population, POPULATION_INITIAL_CHUNKS), dtype=np.int64)
+        self._creations = np.full((self._population, POPULATION_INITIAL_CHUNKS), np.nan)
+        # each participant's serial number of each chunk, and of its next new one
+        self._serials = np.zeros((self._population, POPULATION_INITIAL_CHUNKS), dtype=np.uint64)
+        self._next_serials = np.zeros(self._population, dtype=np.uint64)
+        # each participant's count of noise draws at the time _draw_time
+        self._draw_time = None
+        self._draws = np.zeros(self._population, dtype=np.uint64)
+        self._new_seeds()
+        if self._optimized_learning:
+            self._references = None
+        else:
+            # unused references are -inf, so that they contribute nothing to base levels
+            self._references = np.full((self._population, POPULATION_INITIAL_CHUNKS,
+                                        REFERENCES_FACTOR), -np.inf)
+
+    @property
+    def population(self):
+        """The number of participants whose memories this :class:`PopulationMemory` holds. It cannot be changed."""
+        return self._population
+
+    @property
+    def seeds(self):
+        r"""The keys of the participants' activation noise, an array of :attr:`population` non-negative integers less than 2\ :sup:`64`.
+        Each is used as :attr:`Memory.seed` is. If, when the ``PopulationMemory`` is
+        created, or this property is set, it is ``None``, the seeds are derived from
+        values drawn from Python's :mod:`random` module when it was created, and new
+        ones are derived each time it is :meth:`reset`; otherwise it should be a
+        sequence of :attr:`population` seeds, which are kept when it is reset, and if
+        it is not a :exc:`ValueError` is raised.
+        """
+        return self._seeds.copy()
+
+    @seeds.setter
+    def seeds(self, value):
+        self._seeds_param = self._validate_seeds(value)
+        self._new_seeds()
+
+    def _validate_seeds(self, value):
+        if value is None:
+            return None
+        value = [Memory._validate_seed(s) for s in value]
+        if len(value) != self._population:
+            raise ValueError(f"There must be {self._population} seeds, not {len(value)}")
+        return np.array(value, dtype=np.uint64)
+
+    def _new_seeds(self):
+        if self._seeds_param is None:
+            self._seeds = np.array(_derived_seeds(self._entropy, self._seeds_derived,
+                                                  self._population), dtype=np.uint64)
+            self._seeds_derived += 1
+        else:
+            self._seeds = self._seeds_param.copy()
+
+    @property
+    def time(self):
+        """This :class:`PopulationMemory`'s current time, shared by all its participants.
+        Time in PyACTUp is a dimensionless quantity, typically advanced with :meth:`advance`.
+        """
+        return self._time
+
+    @time.setter
+    def time(self, value):
+        Memory.is_real(value, "time", False, False, False)
+        self._time = value
+
+    def advance(self, amount=1):
+        """Adds the given *amount*, which defaults to 1, to the time of every participant, and returns the new, current time."""
+        if amount is not None:
+            self.time += amount
+        return self._time
+
+    @property
+    def noise(self):
+        """The amount of noise to add during chunk activation computation, as for :attr:`Memory.noise`."""
+        return self._noise
+
+    @noise.setter
+    def noise(self, value):
+        Memory.is_real(value, "noise")
+        if value is None:
+            value = 0
+        if self._temperature_param is None:
+            t = Memory._validate_temperature(None, value)
+            if not t:
+                warn(f"Setting noise to {value} will make the temperature too low; setting temperature to 1")
+                self.temperature = 1
+            else:
+                self._temperature = t
+        self._noise = float(value)
+
+    @property
+    def decay(self):
+        """The rate at which activations decay with the passage of time, as for :attr:`Memory.decay`."""
+        return self._decay
+
+    @decay.setter
+    def decay(self, value):
+        Memory.is_real(value, "decay")
+        if value is not None:
+            if value >= 1 and self._optimized_learning:
+                raise ValueError(f"The decay, {value}, must be less than one if optimized_learning is used")
+            self._decay = float(value)
+        else:
+            self._decay = None
+
+    @property
+    def temperature(self):
+        """The temperature parameter used for blending values, as for :attr:`Memory.temperature`."""
+        return self._temperature_param
+
+    @temperature.setter
+    def temperature(self, value):
+        if value is None or value is False:
+            value = None
+        else:
+            Memory.is_real(value, "temperature", True, True)
+            value = float(value)
+        t = Memory._validate_temperature(value, self._noise)
+        if not t:
+            if value is None:
+                raise ValueError(f"The noise, {self._noise}, is too low to for the temperature to be set to None.")
+            else:
+                raise ValueError(f"The temperature, {value}, must not be less than {MINIMUM_TEMPERATURE}.")
+        self._temperature_param = value
+        self._temperature = t
+
+    @property
+    def threshold(self):
+        """The minimum activation value required for a chunk to contribute to a blend, as for :attr:`Memory.threshold`."""
+        return self._threshold
+
+    @threshold.setter
+    def threshold(self, value):
+        Memory.is_real(value, "threshold", False)
+        self._threshold = None if value is None else float(value)
+
+    @property
+    def mismatch(self):
+        """The mismatch penalty applied to partially matching values, as for :attr:`Memory.mismatch`."""
+        return self._mismatch
+
+    @mismatch.setter
+    def mismatch(self, value):
+        if value is False:
+            value = None
+        Memory.is_real(value, "mismatch")
+        self._mismatch = None if value is None else float(value)
+
+    @property
+    def optimized_learning(self):
+        """Whether or not the optimized learning approximation is used.
+        Unlike :attr:`Memory.optimized_learning` it can only be ``True`` or ``False``, and
+        cannot be changed once the :class:`PopulationMemory` contains chunks.
+        """
+        return self._optimized_learning
+
+    @optimized_learning.setter
+    def optimized_learning(self, value):
+        value = bool(value)
+        if value == self._optimized_learning:
+            return
+        if value and self._decay is not None and self._decay >= 1:
+            raise ValueError(f"Optimized learning cannot be used when the decay, "
+                             f"{self._decay}, is greater than or equal to one.")
+        if getattr(self, "_chunks", None):
+            raise RuntimeError("Cannot change optimized learning for a PopulationMemory that "
+                               "already contains chunks")
+        self._optimized_learning = value
+        if hasattr(self, "_chunks"):
+            self.reset()
+
+    def similarity(self, attributes, function=None, weight=None):
+        """Assigns a similarity function and/or corresponding weight to be used when comparing attribute values with the given *attributes*.
+        The arguments are as for :meth:`Memory.similarity`.
+        """
+        attributes = Memory._ensure_slot_names(attributes)
+        if function is not None and not (callable(function) or function is True):
+            raise ValueError(f"Function {function} is neither callable nor True")
+        if weight is not None and weight <= 0:
+            raise ValueError(f"Similarity weight, {weight}, is not a positive number")
+        for a in attributes:
+            if function is None and weight is None:
+                self._similarities.pop(a, None)
+            else:
+                sim = self._similarities[a]
+                sim._memory = self
+                if function is not None and function != sim._function:
+                    sim._function = function
+                    sim._clear()
+                if weight is not None:
+                    sim._weight = weight
+
+    def _intern(self, name, value):
+        codes = self._interned[name]
+        if (code := codes.get(value)) is None:
+            code = codes[value] = len(codes)
+            self._interned_values[name].append(value)
+        return code
+
+    def _chunk(self, slots):
+        # The index of the chunk with the given contents, creating it if need be.
+        signature = Memory._signature(slots, "learn")
+        if (i := self._signatures.get(signature)) is None:
+            i = self._signatures[signature] = len(self._chunks)
+            self._chunks.append(slots)
+            if i >= self._counts.shape[1]:
+                self._resize(2 * self._counts.shape[1], None)
+            for name, value in slots.items():
+                if name not in self._codes:
+                    self._codes[name] = np.full(self._counts.shape[1], -1, dtype=np.intp)
+                self._codes[name][i] = self._intern(name, value)
+            self._outcomes.clear()
+        return i
+
+    def _resize(self, nchunks, nreferences):
+        # Enlarges the arrays to hold nchunks chunks and nreferences references per chunk.
+        old = self._counts.shape[1]
+        if nchunks is not None and nchunks > old:
+            extra = nchunks - old
+            self._counts = np.pad(self._counts, ((0, 0), (0, extra)))
+            self._creations = np.pad(self._creations, ((0, 0), (0, extra)),
+                                     constant_values=np.nan)
+            self._serials = np.pad(self._serials, ((0, 0), (0, extra)))
+            for name, codes in self._codes.items():
+                self._codes[name] = np.pad(codes, (0, extra), constant_values=-1)
+            if self._references is not None:
+                self._references = np.pad(self._references, ((0, 0), (0, extra), (0, 0)),
+                                          constant_values=-np.inf)
+        if nreferences is not None and nreferences > self._references.shape[2]:
+            self._references = np.pad(self._references,
+                                      ((0, 0), (0, 0),
+                                       (0, nreferences - self._references.shape[2])),
+                                      constant_values=-np.inf)
+
+    def _participants(self, participants):
+        if participants is None:
+            return np.arange(self._population)
+        participants = np.asarray(participants)
+        if participants.dtype == bool:
+            if participants.shape != (self._population,):
+                raise ValueError(f"A mask of participants must have {self._population} elements")
+            return np.flatnonzero(participants)
+        if participants.ndim != 1 or (participants.size and (participants.min() < 0
+                                        or participants.max() >= self._population)):
+            raise ValueError(f"Participants {participants} are not indices of this population")
+        return participants
+
+    def learn(self, slots, participants=None):
+        """Adds, or reinforces, a chunk in the memories of the given *participants*, at the current time.
+        Each value of the :class:`Mapping` *slots* is either a single value, learned by
+        every one of the *participants*, or a :mod:`numpy` array with one value for each of
+        them, or for each participant of the population, so that different participants
+        may learn different chunks. The *participants*, by default all of them, are either
+        an array of indices or a Boolean mask of length :attr:`population`. Unlike
+        :meth:`Memory.learn` time is never advanced.
+        """
+        participants = self._participants(participants)
+        if participants.size == 0:
+            return
+        slots = dict(slots)
+        for name in slots.keys():
+            Memory._ensure_slot_name(name)
+        if not slots:
+            raise ValueError(f"No attributes provided to learn()")
+        varying = dict()
+        for n, v in slots.items():
+            if isinstance(v, np.ndarray):
+                if v.shape == (self._population,):
+                    v = v[participants]
+                elif v.shape != (participants.size,):
+                    raise ValueError(f"The values of {n} do not have one element per participant")
+                varying[n] = v
+        if not varying:
+            chunks = np.full(participants.size, self._chunk(slots), dtype=np.intp)
+        else:
+            # Intern the distinct combinations of values, rather than every participant's
+            codes = np.empty((participants.size, len(varying)), dtype=np.intp)
+            uniques = []
+            for col, v in enumerate(varying.values()):
+                u, codes[:, col] = np.unique(v, return_inverse=True)
+                uniques.append(u)
+            rows, inverse = np.unique(codes, axis=0, return_inverse=True)
+            found = np.empty(len(rows), dtype=np.intp)
+            for i, row in enumerate(rows):
+                s = dict(slots)
+                for (n, v), u, code in zip(varying.items(), uniques, row):
+                    s[n] = u[code].item() if isinstance(u[code], np.generic) else u[code]
+                found[i] = self._chunk(s)
+            chunks = found[inverse.ravel()]
+        counts = self._counts[participants, chunks]
+        if self._references is not None:
+            if (most := counts.max()) >= self._references.shape[2]:
+                self._resize(None, max(2 * self._references.shape[2], most + 1))
+            self._references[participants, chunks, counts] = self._time
+        new = counts == 0
+        self._creations[participants[new], chunks[new]] = self._time
+        self._serials[participants[new], chunks[new]] = self._next_serials[participants[new]]
+        self._next_serials[participants[new]] += np.uint64(1)
+        self._counts[participants, chunks] = counts + 1
+        self._base_level_cache = None
+
+    def reference_counts(self, slots):
+        """The number of times each participant has learned the chunk with the given *slots*, an array of length :attr:`population`."""
+        i = self._signatures.get(Memory._signature(dict(slots), "reference_counts"))
+        if i is None:
+            return np.zeros(self._population, dtype=np.int64)
+        return self._counts[:, i].copy()
+
+    def _base_levels(self, columns):
+        # The base-level activations of the chunks with the given indices, for every
+        # participant, -inf for chunks a participant has never learned. Those of all the
+        # chunks are computed together, and cached until time passes or a chunk is learned.
+        if self._base_level_cache is None or self._base_level_cache[0] != self._time:
+            self._base_level_cache = (self._time, self._compute_base_levels())
+        return self._base_level_cache[1][:, columns]
+
+    def _compute_base_levels(self):
+        counts = self._counts[:, :len(self._chunks)]
+        present = counts > 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if self._decay is None:
+                result = np.zeros(counts.shape)
+            elif self._optimized_learning:
+                ages = self._time - self._creations[:, :len(self._chunks)]
+                if np.any(ages[present] <= 0):
+                    raise RuntimeError(f"Error when computing activations, perhaps a "
+                                       f"chunk's creation time is not in the past?")
+                result = np.log(counts / (1 - self._decay)) - self._decay * np.log(ages)
+            elif self._decay == 0:
+                result = np.log(counts)
+            else:
+                # only as many references as the most referenced chunk has
+                ages = self._time - self._references[:, :len(self._chunks), :counts.max()]
+                if np.any(ages <= 0):
+                    raise RuntimeError(f"Error when computing activations, perhaps a "
+                                       f"chunk's creation or reinforcement time is not in "
+                                       f"the past?")
+                # summed sequentially, so that the unused references, contributing zero,
+                # and so the size of the population, cannot affect the rounding
+                result = np.log(np.cumsum(ages ** -self._decay, axis=2)[:, :, -1])
+        return np.where(present, result, -np.inf)
+
+    def _outcome_values(self, outcome_attribute):
+        if (values := self._outcomes.get(outcome_attribute)) is None:
+            try:
+                values = np.array([c.get(outcome_attribute, np.nan) for c in self._chunks],
+                                  dtype=np.float64)
+            except Exception as e:
+                raise RuntimeError(f"Error computing blended value, is perhaps the value "
+                                   f"of the {outcome_attribute} slot not numeric in "
+                                   f"one of the matching chunks? ({e})")
+            self._outcomes[outcome_attribute] = values
+        return values
+
+    def _matching(self, outcome_attribute, slots):
+        # The indices of the chunks containing outcome_attribute and matching the exact
+        # slots, and the mismatch penalties of those chunks for the partial slots.
+        nchunks = len(self._chunks)
+        names = set(slots.keys()) | {outcome_attribute}
+        if not nchunks or any(n not in self._codes for n in names):
+            return np.empty(0, dtype=np.intp), None
+        mask = np.ones(nchunks, dtype=bool)
+        for n in names:
+            mask &= self._codes[n][:nchunks] >= 0
+        exact_slots, partial_slots = Memory._split_slots(self, slots, True)
+        for n, v in exact_slots:
+            code = self._interned[n].get(v)
+            if code is None:
+                return np.empty(0, dtype=np.intp), None
+            mask &= self._codes[n][:nchunks] == code
+        columns = np.flatnonzero(mask)
+        penalties = None
+        if partial_slots:
+            penalties = np.zeros(columns.size)
+            for n, v, s in partial_slots:
+                penalties += Memory._penalty_column(self, n, v, s, self._codes[n][columns])
+            penalties *= self._mismatch
+        return columns, penalties
+
+    def blend_many(self, outcome_attribute, slots_list):
+        """Returns the blended values of *outcome_attribute* for each of the :class:`Mapping` objects in *slots_list*, for every participant.
+        The result is an array of shape ``(len(slots_list), population)``, each element
+        being the value :meth:`Memory.blend` would return for that participant and
+        element of *slots_list*, or NaN where that would be ``None``. Every participant
+        and element of *slots_list* receives its own, independent activation noise.
+        """
+        Memory._ensure_slot_name(outcome_attribute)
+        outcomes = self._outcome_values(outcome_attribute)
+        result = np.full((len(slots_list), self._population), np.nan)
+        if self._draw_time != self._time:
+            self._draw_time = self._time
+            self._draws[:] = 0
+        for i, slots in enumerate(slots_list):
+            slots = dict(slots)
+            for name in slots.keys():
+                Memory._ensure_slot_name(name)
+            columns, penalties = self._matching(outcome_attribute, slots)
+            if columns.size == 0:
+                continue
+            activations = self._base_levels(columns)
+            if self._noise:
+                # as for a Memory, a draw is used only by participants with a candidate
+                learned = np.isfinite(activations).any(axis=1)
+                activations = activations + _logistic_noise(
+                    self._seeds[:, np.newaxis], self._time, self._serials[:, columns],
+                    self._draws[:, np.newaxis], self._noise)
+                self._draws += learned.astype(np.uint64)
+            if penalties is not None:
+                activations = activations + penalties
+            if self._threshold is not None:
+                activations[activations < self._threshold] = -np.inf
+            retrieved = np.isfinite(activations).any(axis=1)
+            activations = activations[retrieved]
+            with np.errstate(under="ignore"):
+                wp = np.exp((activations - activations.max(axis=1, keepdims=True))
+                            / self._temperature)
+            # Each participant's chunks are summed sequentially in the order it learned
+            # them, those it hasn't learned, of zero weight, last, so that its blended
+            # value is the same however the population is made up.
+            order = np.argsort(np.where(self._counts[retrieved][:, columns] > 0,
+                                        self._serials[retrieved][:, columns],
+                                        np.iinfo(np.uint64).max),
+                               axis=1, kind="stable")
+            wp = np.take_along_axis(wp, order, axis=1)
+            result[i, retrieved] = (np.cumsum(wp * outcomes[columns][order], axis=1)[:, -1]
+                                    / np.cumsum(wp, axis=1)[:, -1])
+        return result
+
+    def blend(self, outcome_attribute, slots={}):
+        """Returns the blended value of *outcome_attribute* for the chunks matching *slots*, for every participant, as an array of length :attr:`population`.
+        Participants with no matching chunk have a blended value of NaN. See
+        :meth:`blend_many`.
+        """
+        return self.blend_many(outcome_attribute, [slots])[0]
 
 
 class Chunk(dict):
@@ -1467,7 +2650,8 @@ class Chunk(dict):
     `[]` notation, or with `.get()`.
     """
 
-    __slots__ = ["_name", "_memory", "_creation", "_references", "_reference_count" ]
+    __slots__ = ["_name", "_memory", "_creation", "_references", "_reference_count", "_id",
+                 "_codes", "_serial" ]
 
     _name_counter = 0;
 
@@ -1476,10 +2660,17 @@ class Chunk(dict):
         Chunk._name_counter += 1
         self._memory = memory
         self.update(content)
+        self._codes = {n: memory._intern(n, v) for n, v in content.items()}
         self._creation = memory._time
-        self._references = np.empty(1 if self._memory._optimized_learning != 0 else 0,
-                                    dtype=np.int32)
+        self._serial = memory._chunk_serial
+        memory._chunk_serial += 1
         self._reference_count = 0
+        self._id = None
+        size = 1 if self._memory._optimized_learning != 0 else 0
+        if memory._store is not None:
+            memory._store.add(self, size)
+        else:
+            self._references = np.empty(size, dtype=np.int32)
 
     def __repr__(self):
         return "<Chunk {} {} {}>".format(self._name, dict(self), self._reference_count)
@@ -1511,14 +2702,409 @@ class Chunk(dict):
                                                  self._memory._optimized_learning))])
 
 
+class ChunkStore:
+    """Columnar storage for the chunks of a :class:`Memory` whose :attr:`Memory.columnar` is true.
+    The reference times of all the chunks are held in a single, flat array, in which each
+    chunk owns a contiguous segment, described by a start offset and a capacity; a chunk's
+    ``_references`` is a view onto its segment, so the usual per-chunk manipulations of
+    them continue to work. The creation times and reference counts of the chunks are
+    held in parallel arrays, indexed by the chunks' ``_id``. When a chunk's segment fills
+    up it is moved to the end of the flat array with a larger capacity; when the flat
+    array itself fills up it is reallocated, discarding the abandoned segments.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._chunks = []
+        self._starts = np.zeros(INITIAL_STORE_SIZE, dtype=np.intp)
+        self._capacities = np.zeros(INITIAL_STORE_SIZE, dtype=np.intp)
+        self._counts = np.zeros(INITIAL_STORE_SIZE, dtype=np.intp)
+        self._creations = np.zeros(INITIAL_STORE_SIZE, dtype=np.float64)
+        self._references = np.empty(INITIAL_STORE_SIZE, dtype=np.int32)
+        self._used = 0
+        self._live = 0
+
+    def __setstate__(self, state):
+        # The chunks' views onto the references array are copied, rather than shared,
+        # when pickled, so reestablish them.
+        self.__dict__.update(state)
+        for c in self._chunks:
+            if c is not None:
+                self._bind(c)
+
+    def _bind(self, chunk):
+        start = self._starts[chunk._id]
+        chunk._references = self._references[start:start + self._capacities[chunk._id]]
+
+    def add(self, chunk, capacity):
+        chunk._id = len(self._chunks)
+        if chunk._id >= self._counts.size:
+            n = 2 * self._counts.size
+            for a in ("_starts", "_capacities", "_counts", "_creations"):
+                grown = np.zeros(n, dtype=getattr(self, a).dtype)
+                grown[:chunk._id] = getattr(self, a)
+                setattr(self, a, grown)
+        self._chunks.append(chunk)
+        self._creations[chunk._id] = chunk._creation
+        self._counts[chunk._id] = chunk._reference_count
+        self._allocate(chunk, capacity)
+
+    def _allocate(self, chunk, capacity):
+        if self._used + capacity > self._references.size:
+            self._compact(capacity)
+        self._starts[chunk._id] = self._used
+        self._capacities[chunk._id] = capacity
+        self._used += capacity
+        self._live += capacity
+        self._bind(chunk)
+
+    def resize(self, chunk, capacity):
+        old = chunk._references[:capacity].copy()
+        self._live -= self._capacities[chunk._id]
+        self._capacities[chunk._id] = 0
+        self._allocate(chunk, capacity)
+        chunk._references[:old.size] = old
+
+    def remove(self, chunk):
+        self._live -= self._capacities[chunk._id]
+        self._capacities[chunk._id] = 0
+        self._counts[chunk._id] = 0
+        self._chunks[chunk._id] = None
+
+    def _compact(self, needed):
+        references = np.empty(max(2 * (self._live + needed),
+                                  INITIAL_STORE_SIZE),
+                              dtype=self._references.dtype)
+        used = 0
+        for c in self._chunks:
+            if c is None:
+                continue
+            n = self._capacities[c._id]
+            start = self._starts[c._id]
+            references[used:used + n] = self._references[start:start + n]
+            self._starts[c._id] = used
+            used += n
+        self._references = references
+        self._used = used
+        for c in self._chunks:
+            if c is not None:
+                self._bind(c)
+
+    @staticmethod
+    def ids(chunks):
+        return np.fromiter((c._id for c in chunks), dtype=np.intp, count=len(chunks))
+
+    def power_sums(self, ids, time, decay):
+        # For each chunk in ids, the sum over its references of the time since that
+        # reference raised to the power -decay, computed as a single segmented reduction
+        # over the concatenation of the chunks' references.
+        counts = self._counts[ids]
+        ends = np.cumsum(counts)
+        offsets = ends - counts
+        indices = np.arange(ends[-1]) + np.repeat(self._starts[ids] - offsets, counts)
+        return np.add.reduceat((time - self._references[indices]) ** -decay, offsets)
+
+
+class ActivationHistory:
+    """A compact record of the activation computations of a :class:`Memory`, for use as its :attr:`Memory.activation_history`.
+    Rather than appending a dictionary for every chunk whose activation is computed, it
+    stores the same details as rows of a preallocated NumPy structured array, doubling
+    its capacity as needed, so that collecting them costs a few vectorized assignments
+    per retrieval or blend. Each row describes one chunk at one retrieval or blend, and
+    has the fields
+
+    ``query``
+        the number of the retrieval or blend, counting from zero, to which this row belongs
+
+    ``time``
+        the time at which the activation was computed
+
+    ``creation_time``
+        the time at which the chunk was created
+
+    ``reference_count``
+        the number of times the chunk had been reinforced
+
+    ``base_level_activation``, ``activation_noise``, ``mismatch``, ``extra_activation``
+        the terms of the activation, zero for those not computed
+
+    ``activation``
+        the chunk's total activation
+
+    ``meets_threshold``
+        whether or not the activation is at least the :attr:`Memory.threshold`, always
+        true if there is no threshold
+
+    ``retrieval_probability``
+        the chunk's retrieval probability, for blends, and NaN otherwise
+
+    The rows, the chunks they describe and the similarities of the partially matched
+    attributes are available as :attr:`records`, :attr:`chunks` and
+    :attr:`similarities`. For convenience an :class:`ActivationHistory` can also be
+    indexed or iterated over, yielding dictionaries like those appended to a list
+    :attr:`Memory.activation_history`, though building them gives up much of the
+    advantage of this class.
+
+    >>> m = Memory()
+    >>> m.learn({"color": "red", "size": 3})
+    <Chunk 0000 {'color': 'red', 'size': 3} 1>
+    >>> m.advance()
+    1
+    >>> m.learn({"color": "red", "size": 5})
+    <Chunk 0001 {'color': 'red', 'size': 5} 1>
+    >>> m.advance()
+    2
+    >>> m.activation_history = ActivationHistory()
+    >>> m.blend("size", {"color": "red"})
+    4.810539051819914
+    >>> m.activation_history.records["base_level_activation"]
+    array([-0.34657359,  0.        ])
+    >>> m.activation_history.records["retrieval_probability"]
+    array([0.09473047, 0.90526953])
+    """
+
+    DTYPE = np.dtype([("query", np.int64),
+                      ("time", np.float64),
+                      ("creation_time", np.float64),
+                      ("reference_count", np.int64),
+                      ("base_level_activation", np.float64),
+                      ("activation_noise", np.float64),
+                      ("mismatch", np.float64),
+                      ("extra_activation", np.float64),
+                      ("activation", np.float64),
+                      ("meets_threshold", np.bool_),
+                      ("retrieval_probability", np.float64)])
+
+    def __init__(self, capacity=HISTORY_INITIAL_SIZE):
+        capacity = max(int(capacity), 1)
+        self._rows = np.empty(capacity, dtype=ActivationHistory.DTYPE)
+        self._similarities = np.empty((capacity, 0))
+        self.clear()
+
+    def clear(self):
+        """Discards all the rows recorded, retaining the storage allocated for them."""
+        self._similarities = self._similarities[:, :0]
+        self._similarity_names = []
+        self._chunks = []
+        # for each query its time, and which terms of the activation it computed
+        self._queries = []
+        self._starts = []
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._row_dict(i) for i in range(*index.indices(self._size))]
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("ActivationHistory index out of range")
+        return self._row_dict(index)
+
+    def __iter__(self):
+        for i in range(self._size):
+            yield self._row_dict(i)
+
+    @property
+    def records(self):
+        """A NumPy structured array of the rows recorded, described above.
+        It is a view onto this history's storage, and is only valid until further rows
+        are recorded or the history is cleared.
+        """
+        return self._rows[:self._size]
+
+    @property
+    def chunks(self):
+        """A list of the chunks described by the rows, in the same order."""
+        return self._chunks
+
+    @property
+    def similarity_names(self):
+        """A list of the names of the attributes partially matched in any of the rows."""
+        return self._similarity_names
+
+    @property
+    def similarities(self):
+        """A two dimensional array, with one row for each row of :attr:`records` and one column for each of the :attr:`similarity_names`.
+        Each element is the similarity computed for that attribute, or NaN if it was not
+        partially matched in that query.
+        """
+        return self._similarities[:self._size]
+
+    @property
+    def queries(self):
+        """The number of retrievals and blends recorded."""
+        return len(self._queries)
+
+    def _reserve(self, n):
+        needed = self._size + n
+        if needed > len(self._rows):
+            capacity = max(2 * len(self._rows), needed)
+            rows = np.empty(capacity, dtype=ActivationHistory.DTYPE)
+            rows[:self._size] = self._rows[:self._size]
+            self._rows = rows
+            similarities = np.empty((capacity, self._similarities.shape[1]))
+            similarities[:self._size] = self._similarities[:self._size]
+            self._similarities = similarities
+
+    def _similarity_columns(self, names):
+        columns = []
+        for n in names:
+            if n not in self._similarity_names:
+                self._similarity_names.append(n)
+                self._similarities = np.concatenate(
+                    [self._similarities, np.full((len(self._similarities), 1), np.nan)],
+                    axis=1)
+            columns.append(self._similarity_names.index(n))
+        return columns
+
+    def _record(self, time, chunks, base, noise, similarities, partial_names, mismatch,
+                extra, activations, threshold):
+        # Appends one row for each of the chunks, noise, similarities, mismatch and extra
+        # being None if not computed. Returns the index of the first row.
+        n = len(chunks)
+        self._reserve(n)
+        start = self._size
+        rows = self._rows[start:start + n]
+        rows["query"] = len(self._queries)
+        rows["time"] = time
+        rows["creation_time"] = [c._creation for c in chunks]
+        rows["reference_count"] = [c._reference_count for c in chunks]
+        rows["base_level_activation"] = base
+        rows["activation_noise"] = 0 if noise is None else noise
+        rows["mismatch"] = 0 if mismatch is None else mismatch
+        rows["extra_activation"] = 0 if extra is None else extra
+        rows["activation"] = activations
+        rows["meets_threshold"] = True if threshold is None else activations >= threshold
+        rows["retrieval_probability"] = np.nan
+        self._similarities[start:start + n] = np.nan
+        if similarities is not None:
+            columns = self._similarity_columns(partial_names)
+            self._similarities[start:start + n, columns] = similarities
+        self._queries.append((time, noise is not None, tuple(partial_names or ()),
+                              mismatch is not None, extra is not None, threshold is not None))
+        self._starts.append(start)
+        self._chunks.extend(chunks)
+        self._size += n
+        return start
+
+    def _query_rows(self, first, last):
+        # The indices of the first row of the query first and of the row following those
+        # of the query last - 1
+        return (self._starts[first] if first < len(self._starts) else self._size,
+                self._starts[last] if last < len(self._starts) else self._size)
+
+    def _set_probabilities(self, start, stop, probabilities):
+        # The retrieval probabilities of those of the rows from start to stop that met the
+        # threshold, in order.
+        rows = self._rows[start:stop]
+        rows["retrieval_probability"][np.flatnonzero(rows["meets_threshold"])] = probabilities
+
+    def _row_dict(self, i):
+        # The row as the dictionary that would be appended to a list activation_history
+        r = self._rows[i]
+        c = self._chunks[i]
+        time, noise, partial_names, mismatch, extra, threshold = self._queries[r["query"]]
+        result = {"time": time,
+                  "name": c._name,
+                  "creation_time": c._creation,
+                  "attributes": tuple(c.items()),
+                  "reference_count": int(r["reference_count"]),
+                  "references": c.references,
+                  "base_level_activation": float(r["base_level_activation"])}
+        if noise:
+            result["activation_noise"] = float(r["activation_noise"])
+        if partial_names:
+            result["similarities"] = {
+                n: float(self._similarities[i, self._similarity_names.index(n)])
+                for n in partial_names}
+        if mismatch:
+            result["mismatch"] = float(r["mismatch"])
+        if extra:
+            result["extra_activation"] = float(r["extra_activation"])
+        result["activation"] = float(r["activation"])
+        if threshold:
+            result["meets_threshold"] = bool(r["meets_threshold"])
+        if not np.isnan(r["retrieval_probability"]):
+            result["retrieval_probability"] = float(r["retrieval_probability"])
+        return result
+
+
 @dataclass
 class Similarity:
     _memory: Memory = None
     _function: callable = True
     _derivative: callable = None
     _weight: float = 1.0
+    _vectorized: bool = False
+    _domain: tuple = None
+    _matrix: np.ndarray = None
+    _domain_positions: np.ndarray = None
     _cache: lrucache = field(default_factory=lambda: lrucache(SIMILARITY_CACHE_SIZE))
 
+    def _clear(self):
+        self._cache.clear()
+        self._matrix = None
+        self._domain_positions = None
+
+    def _rows(self):
+        # Returns a square matrix of the unweighted mismatch penalties between all pairs of
+        # the values of the declared domain, indexed by their positions in it, computing
+        # it the first time it is needed.
+        if self._matrix is None:
+            n = len(self._domain)
+            matrix = np.empty((n, n))
+            for j in range(n):
+                # the similarity function is assumed to be commutative
+                matrix[j, :j + 1] = matrix[:j + 1, j] = self._unweighted(self._domain[:j + 1],
+                                                                      self._domain[j])
+                matrix[j, j] = 0
+            self._matrix = matrix
+        return self._matrix
+
+    def _positions(self, values):
+        # Returns an array of the position in the declared domain of each of the interned
+        # values of a slot, indexed by their codes, or -1 for those outside the domain,
+        # extending it if further values have been interned since it was last computed.
+        positions = self._domain_positions
+        n = 0 if positions is None else len(positions)
+        if n < len(values):
+            index = {v: i for i, v in enumerate(self._domain)}
+            extended = np.empty(len(values), dtype=np.intp)
+            if n:
+                extended[:n] = positions
+            extended[n:] = [index.get(v, -1) for v in values[n:]]
+            self._domain_positions = positions = extended
+        return positions
+
+    def _unweighted(self, xs, y):
+        if self._vectorized:
+            return self._penalties(xs, y)
+        return np.array([0 if x == y else self._cached_penalty(x, y) for x in xs],
+                        dtype=np.float64)
+
+    def _penalties(self, xs, y):
+        # The vectorized analogue of _penalty(), calling the similarity function just
+        # once, with an array of all the xs.
+        result = np.asarray(self._function(np.asarray(xs), y), dtype=np.float64)
+        if result.shape != (len(xs),):
+            raise ValueError(f"vectorized similarity function returned {result.shape} "
+                             f"values for {len(xs)} arguments")
+        if result.size:
+            if (least := result.min()) < self._memory._minimum_similarity:
+                raise ValueError(f"similarity value, {least}, is less than the minimum "
+                                 f"allowed, {self._memory._minimum_similarity}")
+            elif (most := result.max()) > self._memory._maximum_similarity:
+                raise ValueError(f"similarity value, {most}, is greater than the maximum "
+                                 f"allowed, {self._memory._maximum_similarity}")
+        if not self._memory._use_actr_similarity:
+            result -= 1
+        return result
+
     def _similarity(self, x, y):
         # returns the mismatch penalty, a non-positive number that has already been
         # weighted on a per slot basis
@@ -1526,10 +3112,21 @@ class Similarity:
             return 0
         if self._function is True:
             return -self._weight
+        return self._cached_penalty(x, y) * self._weight
+
+    def _cached_penalty(self, x, y):
+        # The cache holds unweighted penalties, so that changing the weight need not
+        # invalidate it.
         signature = (x, y)
         result = self._cache.get(signature)
-        if result is not None:
-            return result
+        if result is None:
+            result = self._penalty(x, y)
+            self._cache[signature] = result
+            self._cache[(y, x)] = result
+        return result
+
+    def _penalty(self, x, y):
+        # returns the unweighted mismatch penalty
         result = self._function(x, y)
         if result < self._memory._minimum_similarity:
             raise ValueError(f"similarity value, {result}, is less than the minimum "
@@ -1539,9 +3136,6 @@ class Similarity:
                              f"allowed, {self._memory._maximum_similarity}")
         if not self._memory._use_actr_similarity:
             result -= 1
-        result *= self._weight
-        self._cache[signature] = result
-        self._cache[(y, x)] = result
         return result
 
 
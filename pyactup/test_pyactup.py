@@ -441,7 +441,8 @@ def test_similarity():
     test_one(4, 3, 2, -0.25, 2, 0, -1, 0)
     m.similarity("a", weight=2)
     m.similarity(["b"], weight=10)
-    test_one(4, 3, 0, -0.50, 2, 0, -10, 0)
+    # the cache holds unweighted values, so survives a change of weight
+    test_one(4, 3, 2, -0.50, 2, 0, -10, 0)
     m.similarity(["b"])
     assert m._similarities.get("b") is None
     m.use_actr_similarity = True
@@ -581,6 +582,80 @@ def test_activation_history():
     assert isclose(m.activation_history[3]["similarities"]["x"], -0.65)
     assert isclose(m.activation_history[3]["similarities"]["y"], -0.15)
 
+def test_activation_history_records():
+    from pyactup import ActivationHistory
+    def run(history, threshold=None):
+        m = Memory(mismatch=1, threshold=threshold, seed=17)
+        m.similarity(["x"], lambda x, y: 1 - abs(x - y) / 10)
+        for i in range(10):
+            m.learn({"w": i % 2, "x": i, "y": i * i})
+            m.advance()
+        m.activation_history = history
+        return ([m.blend("y", {"w": 1, "x": 4}), m.retrieve({"w": 0}), m.blend("y", {"x": 2})],
+                m.activation_history)
+    for threshold in (None, -0.8):
+        values, dicts = run([], threshold)
+        assert run(ActivationHistory(capacity=3), threshold)[0] == values
+        values, h = run(ActivationHistory(capacity=3), threshold)
+        assert len(h) == len(dicts) == 20
+        assert h.queries == 3
+        assert h.similarity_names == ["x"]
+        r = h.records
+        assert list(r["query"]) == [0] * 5 + [1] * 5 + [2] * 10
+        assert all(c.memory is not None for c in h.chunks)
+        for i, d in enumerate(dicts):
+            e = h[i]
+            assert e.keys() == d.keys()
+            assert e["attributes"] == d["attributes"]
+            for k in ("base_level_activation", "activation_noise", "activation"):
+                assert isclose(r[k][i], d[k])
+                assert isclose(e[k], d[k])
+            if "similarities" in d:
+                assert isclose(h.similarities[i, 0], d["similarities"]["x"])
+                assert isclose(r["mismatch"][i], d["mismatch"])
+            else:
+                assert np.isnan(h.similarities[i, 0])
+            if "retrieval_probability" in d:
+                assert isclose(r["retrieval_probability"][i], d["retrieval_probability"])
+            else:
+                assert np.isnan(r["retrieval_probability"][i])
+            assert r["meets_threshold"][i] == d.get("meets_threshold", True)
+        assert isclose(np.nansum(r["retrieval_probability"][r["query"] == 2]), 1)
+        def make():
+            m = Memory(mismatch=1, threshold=threshold, seed=5)
+            m.similarity(["x"], lambda x, y: 1 - abs(x - y) / 10)
+            for i in range(10):
+                m.learn({"w": i % 3, "x": i, "y": i * i})
+                m.advance()
+            return m
+        queries = [{"w": 1, "x": 4}, {"w": 5}, {"x": 2}, {"w": 0}]
+        m = make()
+        m.activation_history = ActivationHistory()
+        many = m.blend_many("y", queries)
+        h = m.activation_history
+        m = make()
+        m.activation_history = []
+        separate = [m.blend("y", q) for q in queries]
+        assert [b is None for b in many] == [b is None for b in separate]
+        assert all(isclose(b, c) for b, c in zip(many, separate) if b is not None)
+        assert [e.keys() for e in h] == [d.keys() for d in m.activation_history]
+        for e, d in zip(h, m.activation_history):
+            assert e["attributes"] == d["attributes"]
+            for k in d:
+                if k not in ("name", "attributes", "references", "similarities"):
+                    assert isclose(e[k], d[k])
+        assert h._query_rows(1, 2) == (3, 13)
+        assert len(h[-3:]) == 3
+        with pytest.raises(IndexError):
+            h[20]
+        h.clear()
+        assert len(h) == 0 and h.queries == 0 and len(h.records) == 0
+    m = Memory()
+    m.activation_history = ActivationHistory()
+    assert isinstance(m.activation_history, ActivationHistory)
+    with pytest.raises(ValueError):
+        m.activation_history = ActivationHistory
+
 def test_noise_distribution():
     m = Memory(temperature=1, noise=0)
     assert m.noise_distribution is None
@@ -971,6 +1046,65 @@ def test_fixed_noise():
             assert ah[i]["activation_noise"] != ah[i + 2 * N]["activation_noise"]
             assert ah[i + N]["activation_noise"] == ah[i + 2 * N]["activation_noise"]
 
+def test_seed():
+    def run(m, history=None):
+        m.activation_history = history
+        results = []
+        for t in range(30):
+            m.learn({"d": "a", "u": t % 3})
+            m.learn({"d": "b", "u": t % 4})
+            m.advance()
+            results.append(m.blend_many("u", [{"d": "x"}, {"d": "a"}, {"d": "b"}]))
+            results.append(m.retrieve({"d": "a"})["u"])
+            with m.fixed_noise:
+                results.append([m.blend("u", {"d": "b"}) for i in range(2)])
+        return results
+    first = run(Memory(seed=17))
+    random.seed(3)
+    run(Memory(seed=18))
+    assert run(Memory(seed=17)) == first
+    # blend_many draws noise as if each query were blended separately
+    ah = []
+    assert run(Memory(seed=17), ah) == first
+    assert all(r[0] == r[1] for r in first[2::3])
+    assert run(Memory(seed=18)) != first
+    random.seed(5)
+    x = run(Memory())
+    random.seed(5)
+    assert run(Memory()) == x
+    m = Memory(seed=2**64 - 1)
+    assert m.seed == 2**64 - 1
+    for bad in [-1, 2**64, 1.5, "seed", True]:
+        with pytest.raises(ValueError):
+            Memory(seed=bad)
+    m = Memory(noise=1, seed=0)
+    for i in range(2000):
+        m.learn({"n": i})
+    m.advance()
+    m.activation_history = []
+    m.blend_many("n", [{}])
+    noise = np.array([h["activation_noise"] for h in m.activation_history])
+    assert abs(np.mean(noise)) < 0.15
+    assert abs(np.var(noise) - math.pi ** 2 / 3) < 0.4
+    m = Memory(seed=4)
+    m.learn({"a": 1})
+    m.learn({"a": 2})
+    m.learn({"a": 3}, advance=1)
+    m.reset(True)
+    assert m.learn({"a": 4}).__class__.__name__ == "Chunk"
+    assert sorted(c._serial for c in m.values()) == [0, 1, 2, 3]
+    # Memories draw from random only when created, as they always have
+    random.seed(8)
+    m = Memory(seed=None)
+    m.reset()
+    m.seed = None
+    x = random.random()
+    random.seed(8)
+    [random.randint(0, 2**62) for i in range(16)]
+    assert random.random() == x
+    m.reset()
+    assert m.seed != Memory(seed=None).seed
+
 def test_forget():
     for m in [Memory(), Memory(index="n"), Memory(index="s"), Memory(index="n s")]:
         assert not m.forget({"n":1}, 0)
@@ -1215,12 +1349,14 @@ def test_index():
         for k in keys:
             m.blend("u", {"d": k})
         return default_timer() - start
+    # Exact matches are found through the automatically maintained value index even
+    # without a declared index, so declaring one should no longer make much difference.
     no_index = f()
     m.reset()
     m.index = "d"
-    assert f() < no_index / 4
+    assert f() < no_index * 4
     m = Memory(index="d")
-    assert f() < no_index / 4
+    assert f() < no_index * 4
 
 def test_print_chunks(tmp_path):
     m = Memory(index=["d"])
@@ -1460,3 +1596,426 @@ def test_salience():
         m.blend("a", {"r": 6, "h": 6}, feature_salience=True)
     with pytest.raises(RuntimeError):
         m.blend("a", {"r": 6, "h": 6}, True, True)
+
+def test_columnar():
+    m = Memory()
+    assert not m.columnar
+    m.columnar = True
+    assert m.columnar
+    m.learn({"n": 1}, advance=True)
+    with pytest.raises(RuntimeError):
+        m.columnar = False
+    m.reset()
+    m.columnar = False
+    assert not m.columnar
+    for ol in [False, True, 3]:
+        mems = [Memory(noise=0, temperature=1, optimized_learning=ol),
+                Memory(noise=0, temperature=1, optimized_learning=ol, columnar=True)]
+        for m in mems:
+            random.seed(7)
+            for i in range(500):
+                m.learn({"n": random.randrange(40), "u": random.randrange(5)})
+                m.advance(random.randint(1, 3))
+        assert [c.references for c in mems[0].chunks] == [c.references for c in mems[1].chunks]
+        assert [c.reference_count for c in mems[0].chunks] == [c.reference_count for c in mems[1].chunks]
+        for n in range(40):
+            assert isclose(mems[0].blend("u", {"n": n}), mems[1].blend("u", {"n": n}))
+        mems[1] = pickle.loads(pickle.dumps(mems[1]))
+        for m in mems:
+            m.learn({"n": 41, "u": 2}, advance=True)
+        for n in range(42):
+            b = mems[0].blend("u", {"n": n})
+            assert b is None or isclose(b, mems[1].blend("u", {"n": n}))
+    mems = [Memory(noise=0, temperature=1), Memory(noise=0, temperature=1, columnar=True)]
+    for m in mems:
+        for i in range(3):
+            m.learn({"n": i, "u": i})
+        for t in range(1, 30):
+            m.advance()
+            m.learn({"n": t % 3, "u": t % 3})
+            m.learn({"n": 3 + t, "u": 4})
+        assert m.forget({"n": 1, "u": 1}, 1)
+        assert m.forget({"n": 10, "u": 4}, 7)
+        assert not m.forget({"n": 10, "u": 4}, 7)
+        m.advance()
+    assert len(mems[0]) == len(mems[1])
+    assert isclose(mems[0].blend("u"), mems[1].blend("u"))
+    for m in mems:
+        m.reset(True)
+        m.advance()
+    assert [c.references for c in mems[0].chunks] == [c.references for c in mems[1].chunks]
+    assert isclose(mems[0].blend("u"), mems[1].blend("u"))
+
+def test_base_level_cache():
+    for columnar in [False, True]:
+        m = Memory(noise=0, temperature=1, mismatch=1, columnar=columnar)
+        m.similarity("n", lambda x, y: 1 - abs(x - y) / 10)
+        for i in range(10):
+            m.learn({"n": i, "u": i}, advance=True)
+        m.learn({"n": 3, "u": 3}, advance=True)
+        m.activation_history = []
+        b = m.blend("u", {"n": 3})
+        assert len(m._base_level_cache) == 10
+        assert m.blend("u", {"n": 7}) != b
+        base = {h["name"]: h["base_level_activation"] for h in m.activation_history}
+        assert len(m.activation_history) == 20
+        for h in m.activation_history[10:]:
+            assert h["base_level_activation"] == base[h["name"]]
+        m.learn({"n": 3, "u": 3})
+        assert len(m._base_level_cache) == 9
+        with pytest.raises(RuntimeError):
+            m.blend("u", {"n": 3})
+        m.advance()
+        b = m.blend("u", {"n": 3})
+        m._base_level_cache.clear()
+        assert m.blend("u", {"n": 3}) == b
+        m.decay = 0.2
+        assert not m._base_level_cache
+        m.blend("u", {"n": 3})
+        m.activation_history = []
+        with m.current_time:
+            m.advance(100)
+            m.blend("u", {"n": 3})
+        m.blend("u", {"n": 3})
+        assert (m.activation_history[0]["base_level_activation"]
+                < m.activation_history[10]["base_level_activation"])
+        assert m.forget({"n": 0, "u": 0}, 0)
+        assert len(m._base_level_cache) == 9
+        m.reset()
+        assert not m._base_level_cache
+
+def test_blend_many():
+    m = Memory()
+    assert m.blend_many("u", [{"n": 1}, {"n": 2}]) == [None, None]
+    for index in [None, "s"]:
+        for mismatch in [None, 0, 1.5]:
+            for threshold in [None, -0.5]:
+                mems = []
+                for i in range(2):
+                    random.seed(17)
+                    m = Memory(noise=0.3, mismatch=mismatch, threshold=threshold, index=index)
+                    m.similarity("n", lambda x, y: 1 - abs(x - y) / 10)
+                    for t in range(60):
+                        m.learn({"n": t % 7, "s": "ab"[t % 2], "u": t % 5}, advance=True)
+                    if not index:
+                        m.learn({"n": 2, "s": "c", "x": 4}, advance=True)
+                    mems.append(m)
+                queries = [{"n": n, "s": s} for n in range(8) for s in "abc"]
+                queries.append({"n": 3})
+                single = [mems[0].blend("u", q) for q in queries]
+                many = mems[1].blend_many("u", queries)
+                assert len(many) == len(single)
+                for x, y in zip(single, many):
+                    assert (x is None and y is None) or isclose(x, y)
+                assert mems[1].blend_many("u", []) == []
+                if mismatch is None:
+                    assert many[-4] is None
+                    assert many[-3] is None
+                with mems[1].fixed_noise:
+                    x, y = mems[1].blend_many("u", [{"n": 3}] * 2)
+                    # with a threshold whether anything is retrieved depends on the noise
+                    assert x == y and (x is not None or threshold is not None)
+                    x, y = mems[1].blend_many("u", [{"n": 3, "s": "a"}] * 2)
+                    assert x == y
+    m = Memory(noise=0)
+    m.learn({"n": 1, "u": "foo"}, advance=True)
+    with pytest.raises(RuntimeError):
+        m.blend_many("u", [{"n": 1}])
+    m.activation_history = []
+    m.learn({"n": 2, "u": 2}, advance=True)
+    assert m.blend_many("u", [{"n": 2}]) == [2]
+    assert len(m.activation_history) == 1
+    assert m.activation_history[0]["retrieval_probability"] == 1
+
+def test_vectorized_similarity():
+    def linear(x, y):
+        return 1 - abs(x - y) / 10
+    results = []
+    for function, vectorized in [(lambda x, y: 1 if x == y else 0, None), (True, None),
+                                 (linear, None), (linear, True)]:
+        m = Memory(mismatch=1, noise=0)
+        m.similarity("n", function, weight=2, vectorized=vectorized)
+        for t in range(30):
+            m.learn({"n": t % 7, "s": "ab"[t % 2], "u": t % 5}, advance=True)
+        queries = [{"n": n, "s": s} for n in range(9) for s in "ab"]
+        results.append(m.blend_many("u", queries))
+        assert results[-1] == pytest.approx([m.blend("u", q) for q in queries])
+        m.activation_history = []
+        m.blend("u", {"n": 8})
+        assert all(h["mismatch"] < 0 for h in m.activation_history)
+    assert results[0] == pytest.approx(results[1])
+    assert results[2] == pytest.approx(results[3])
+    assert results[0] != pytest.approx(results[2])
+    m = Memory(mismatch=1)
+    m.similarity("n", lambda xs, y: np.full(len(xs) + 1, 0.5), vectorized=True)
+    m.learn({"n": 1, "u": 1})
+    m.learn({"n": 2, "u": 2}, advance=True)
+    with pytest.raises(ValueError):
+        m.blend("u", {"n": 3})
+    m.similarity("n", lambda xs, y: np.full(len(xs), 2), vectorized=True)
+    with pytest.raises(ValueError):
+        m.blend("u", {"n": 3})
+
+def test_value_index():
+    for preserve in [False, True]:
+        m = Memory(noise=0)
+        for t in range(200):
+            m.learn({"a": t % 3, "b": t % 5, "c": t % 7}, advance=True)
+            if t % 4 == 0:
+                m.learn({"a": t % 3, "b": t % 5}, advance=True)
+        m.forget({"a": 1, "b": 1}, 34)
+        m.reset(preserve)
+        m.learn({"a": 1, "b": 0}, advance=True)
+        def scan(conditions):
+            return [c for k, cs in m._slot_name_index.items()
+                    if set(conditions) <= k
+                    for c in cs if all(c[n] == v for n, v in conditions.items())]
+        for conditions in [{"a": 1}, {"a": 1, "b": 0}, {"a": 2, "b": 3, "c": 5},
+                           {"b": 4, "c": 6}, {"a": 9}, {"c": (1, 2)}, {"a": 0, "b": 1}]:
+            assert m._matching_chunks(conditions, set(conditions),
+                                      list(conditions.items())) == scan(conditions)
+    m = Memory(noise=0)
+    for t in range(1000):
+        m.learn({"a": t % 10, "b": t % 11, "c": t % 13}, advance=True)
+    for t in range(1000):
+        assert m.forget({"a": t % 10, "b": t % 11, "c": t % 13}, t)
+    assert not m and not m._value_index
+
+def test_similarity_domain():
+    calls = 0
+    def f(x, y):
+        nonlocal calls
+        calls += 1
+        return 1 - abs(x - y) / 10
+    results = []
+    for domain in [None, range(6)]:
+        m = Memory(mismatch=1, noise=0)
+        m.similarity("n", f, domain=domain)
+        for t in range(30):
+            m.learn({"n": t % 6, "u": t % 5}, advance=True)
+        queries = [{"n": n} for n in range(6)]
+        results.append([m.blend("u", q) for q in queries])
+        if domain:
+            calls = 0
+            m.similarity("n", weight=3)
+            results.append([m.blend("u", q) for q in queries])
+            assert calls == 0
+            m.learn({"n": 9, "u": 1}, advance=True)
+            assert m.blend("u", {"n": 9}) is not None and calls > 0
+            m.similarity("n", weight=1)
+            assert [m.blend("u", q) for q in queries] != pytest.approx(results[-1])
+            m.use_actr_similarity = True
+            m.use_actr_similarity = False
+            m.similarity("n", lambda x, y: f(x, y) / 2)
+            assert m.blend("u", {"n": 0}) != pytest.approx(results[1][0])
+    assert results[0] == pytest.approx(results[1])
+    assert results[1] != pytest.approx(results[2])
+    m = Memory(mismatch=1, noise=0)
+    m.similarity("n", f, weight=3)
+    for t in range(30):
+        m.learn({"n": t % 6, "u": t % 5}, advance=True)
+    assert [m.blend("u", {"n": n}) for n in range(6)] == pytest.approx(results[2])
+
+def test_similarity_domain_outside():
+    # values outside a domain are compared with the candidates' values only, and do not
+    # grow the matrix, so a domain costs nothing for a continuous attribute
+    results = []
+    for domain in [None, range(3)]:
+        m = Memory(mismatch=1, noise=0)
+        m.similarity("x", lambda a, b: 1 - abs(a - b) / 1000, domain=domain)
+        for t in range(200):
+            m.learn({"x": t if t < 3 else t + 0.5, "u": t % 7}, advance=True)
+        results.append([m.blend("u", {"x": x}) for x in (0, 2, 3.5, 1000)])
+        if domain:
+            assert m._similarities["x"]._matrix.shape == (3, 3)
+    assert results[0] == pytest.approx(results[1])
+    m = Memory(mismatch=1, noise=0)
+    m.similarity("x", True, domain=range(3))
+    m.learn({"x": 1, "u": 1})
+    m.advance()
+    assert m.blend("u", {"x": 1}) == 1 and m._similarities["x"]._matrix is None
+
+def test_reset_interned():
+    m = Memory(mismatch=1, noise=0)
+    m.similarity("x", lambda a, b: 1 - abs(a - b) / 10, domain=range(3))
+    m.learn({"x": 1, "u": 0.5})
+    def run(preserve):
+        m.reset(preserve)
+        m.advance()
+        results = []
+        for t in range(50):
+            m.learn({"x": t % 4, "u": t / 7}, advance=True)
+            results.append(m.blend("u", {"x": t % 5}))
+        return results
+    for preserve in (True, False):
+        expected = run(preserve)
+        for i in range(3):
+            assert run(preserve) == expected
+            # only the values of the chunks of the latest run, and of the domain, remain
+            assert len(m._interned_values["u"]) == 50 + preserve
+            assert len(m._interned_values["x"]) == 4
+        m.reset(preserve)
+        assert len(m) == preserve
+        assert m._interned_values["x"][:3] == [0, 1, 2]
+        assert all(m._interned[n][c[n]] == c._codes[n] for c in m.values() for n in c)
+
+def test_similarity_only_candidates():
+    for vectorized in (False, True):
+        m = Memory(mismatch=1, noise=0)
+        m.similarity(["x"], lambda a, b: 1 - abs(a - b) / 10, vectorized=vectorized)
+        m.learn({"kind": "a", "x": 1, "u": 5})
+        m.learn({"kind": "b", "x": "foo", "u": 3})
+        m.advance()
+        assert m.blend("u", {"kind": "a", "x": 2}) == 5.0
+        assert m.blend_many("u", [{"kind": "a", "x": 2}, {"kind": "a", "x": 1}]) == [5.0, 5.0]
+
+def test_set_weights():
+    calls = 0
+    def f(x, y):
+        nonlocal calls
+        calls += 1
+        return 1 - abs(x - y) / 10
+    mems = [Memory(mismatch=1, noise=0) for i in range(2)]
+    for m in mems:
+        m.similarity("n m", f)
+        for t in range(30):
+            m.learn({"n": t % 6, "m": t % 4, "u": t % 5}, advance=True)
+    queries = [{"n": n, "m": k} for n in range(6) for k in range(4)]
+    for m in mems:
+        [m.blend("u", q) for q in queries]
+    for weights in [{"n": 2, "m": 0.5}, {"n": 0.25}, {"m": 3}]:
+        for n, w in weights.items():
+            mems[0].similarity(n, weight=w)
+        mems[1].set_weights(weights)
+        expected = [mems[0].blend("u", q) for q in queries]
+        calls = 0
+        assert [mems[1].blend("u", q) for q in queries] == pytest.approx(expected)
+        assert calls == 0
+    with pytest.raises(ValueError):
+        mems[1].set_weights({"n": 1, "m": 0})
+    assert mems[1]._similarities["n"]._weight == 0.25
+    mems[1].set_weights([("x", 2)])
+    assert mems[1]._similarities["x"]._function is True
+
+def test_population_memory():
+    from pyactup import PopulationMemory
+    with pytest.raises(ValueError):
+        PopulationMemory(0)
+    with pytest.raises(ValueError):
+        PopulationMemory(2.5)
+    m = PopulationMemory(3)
+    assert m.population == 3 and len(m) == 0 and m.time == 0
+    assert np.isnan(m.blend("u", {"n": 1})).all()
+    for decay in [None, 0, 0.5]:
+        for optimized_learning in [False, True]:
+            p = 15
+            pm = PopulationMemory(p, noise=0, temperature=0.8, decay=decay, mismatch=1,
+                                  optimized_learning=optimized_learning)
+            pm.similarity("n", lambda x, y: 1 - abs(x - y) / 10)
+            mems = [Memory(noise=0, temperature=0.8, decay=decay, mismatch=1,
+                           optimized_learning=optimized_learning) for i in range(p)]
+            for m in mems:
+                m.similarity("n", lambda x, y: 1 - abs(x - y) / 10)
+            rng = np.random.default_rng(23)
+            for t in range(25):
+                ns = rng.integers(0, 6, p)
+                us = rng.integers(0, 4, p) * 1.5
+                learners = rng.random(p) < 0.8
+                pm.learn({"n": ns, "s": "a", "u": us}, participants=learners)
+                for m, n, u, learner in zip(mems, ns, us, learners):
+                    if learner:
+                        m.learn({"n": int(n), "s": "a", "u": float(u)})
+                assert pm.advance() == t + 1
+                for m in mems:
+                    m.advance()
+                queries = [{"n": 2, "s": "a"}, {"n": 8, "s": "a"}, {"n": 1, "s": "b"}]
+                many = pm.blend_many("u", queries)
+                assert many.shape == (3, p)
+                for q, row in zip(queries, many):
+                    for m, x in zip(mems, row):
+                        y = m.blend("u", q)
+                        assert (y is None and np.isnan(x)) or isclose(x, y)
+            assert (pm.reference_counts({"n": 3, "s": "a", "u": 3.0})
+                    == [m.get((("n", 3), ("s", "a"), ("u", 3.0))).reference_count
+                        if m.get((("n", 3), ("s", "a"), ("u", 3.0))) else 0
+                        for m in mems]).all()
+    random.seed(5)
+    pm = PopulationMemory(20000, noise=0.5)
+    pm.learn({"d": "a", "u": 0})
+    pm.learn({"d": "a", "u": 10})
+    pm.advance()
+    blended = pm.blend("u", {"d": "a"})
+    assert 0 < blended.min() < 5 < blended.max() < 10
+    assert abs(np.mean(blended) - 5) < 0.1
+    m = Memory(noise=0.5)
+    m.learn({"d": "a", "u": 0})
+    m.learn({"d": "a", "u": 10})
+    m.advance()
+    assert abs(np.mean([m.blend("u", {"d": "a"}) for i in range(2000)]) - 5) < 0.3
+    pm = PopulationMemory(2, noise=0, temperature=1)
+    pm.learn({"d": "a", "u": 1}, participants=[True, False])
+    with pytest.raises(RuntimeError):
+        pm.blend("u", {"d": "a"})
+    pm.advance()
+    assert np.isnan(pm.blend("u", {"d": "a"})).tolist() == [False, True]
+    with pytest.raises(ValueError):
+        pm.learn({"d": np.array(["a", "b", "c"]), "u": 1})
+    with pytest.raises(ValueError):
+        pm.learn({"d": "a", "u": 1}, participants=[0, 2])
+    with pytest.raises(ValueError):
+        pm.learn({})
+    pm.learn({"d": "a", "u": "x"})
+    pm.advance()
+    with pytest.raises(RuntimeError):
+        pm.blend("u", {"d": "a"})
+    pm.reset()
+    assert len(pm) == 0 and pm.time == 0
+
+def test_unit_interval():
+    for w in (0, 0xFFFFFFFF):
+        words = np.full(3, w, dtype=np.uint64)
+        for u in (pyactup._unit_interval(w, w), pyactup._unit_interval(words, words)):
+            assert np.all(0 < u) and np.all(u < 1)
+            assert np.all(np.isfinite(np.log(u / (1 - u))))
+
+def test_population_memory_noise():
+    from pyactup import PopulationMemory
+    seeds = [3, 2**40, 77, 2**64 - 1, 12]
+    params = dict(noise=0.4, mismatch=1, threshold=-2)
+    pm = PopulationMemory(5, seeds=seeds, **params)
+    parts = [PopulationMemory(2, seeds=seeds[:2], **params),
+             PopulationMemory(3, seeds=seeds[2:], **params)]
+    mems = [Memory(seed=s, **params) for s in seeds]
+    for m in [pm, *parts, *mems]:
+        m.similarity("n", lambda x, y: 1 - abs(x - y) / 10)
+    rng = np.random.default_rng(31)
+    queries = [{"n": 2}, {"n": 9, "s": "a"}, {"n": 4}]
+    for t in range(20):
+        ns = rng.integers(0, 6, 5)
+        us = rng.integers(0, 4, 5) * 1.5
+        learners = rng.random(5) < 0.7
+        pm.learn({"n": ns, "s": "a", "u": us}, participants=learners)
+        for p, k in zip(parts, [slice(0, 2), slice(2, 5)]):
+            p.learn({"n": ns[k], "s": "a", "u": us[k]}, participants=learners[k])
+        for m, n, u, learner in zip(mems, ns, us, learners):
+            if learner:
+                m.learn({"n": int(n), "s": "a", "u": float(u)})
+        for m in [pm, *parts, *mems]:
+            m.advance()
+        for i in range(2):
+            many = pm.blend_many("u", queries)
+            split = np.concatenate([p.blend_many("u", queries) for p in parts], axis=1)
+            assert np.array_equal(many, split, equal_nan=True)
+            for m, column in zip(mems, many.T):
+                for x, y in zip(m.blend_many("u", queries), column):
+                    assert (x is None and np.isnan(y)) or isclose(x, y)
+    assert pm.seeds.tolist() == seeds
+    pm.reset()
+    assert pm.seeds.tolist() == seeds
+    pm.seeds = None
+    derived = pm.seeds
+    pm.reset()
+    assert len(set(derived.tolist() + pm.seeds.tolist())) == 10
+    for bad in [[1, 2], [1, 2, 3, 4, -5], [0, 1, 2, 3, "x"]]:
+        with pytest.raises(ValueError):
+            PopulationMemory(5, seeds=bad)
@@ -1 +1,3 @@
-from .pyibl import Agent 
\ No newline at end of file
+from .pyibl import (Agent, DelayedResponse, PopulationAgent, TraceBuffer, render_trace,
+                    positive_linear_similarity, positive_quadratic_similarity,
+                    bounded_linear_similarity, bounded_quadratic_similarity)
@@ -0,0 +1,45 @@
+# Copyright 2024 Carnegie Mellon University
+# Binary choice example using a PyIBL PopulationAgent, simulating all the participants at once
+
+import matplotlib.pyplot as plt
+import numpy as np
+from pyibl import PopulationAgent
+
+HIGH_PAYOUTS = [4, 6, 12]
+SAFE_PAYOUT = 3
+PLOT_FILE = "binary-choice.png"
+ROUNDS = 60
+PARTICIPANTS = 10_000
+PREPOPULATED_MULTIPLIER = 1.2
+
+def run_condition(high_payout):
+    high_probability = SAFE_PAYOUT / high_payout
+    agent = PopulationAgent(PARTICIPANTS,
+                            default_utility=(PREPOPULATED_MULTIPLIER * high_payout))
+    results = np.empty((ROUNDS, PARTICIPANTS))
+    for round in range(ROUNDS):
+        risky = agent.choose(["safe", "risky"]) == "risky"
+        payoffs = np.where(risky,
+                           np.where(np.random.random(PARTICIPANTS) < high_probability,
+                                    high_payout, 0),
+                           SAFE_PAYOUT)
+        agent.respond(payoffs)
+        results[round] = risky
+    return results
+
+def main():
+    for payout in HIGH_PAYOUTS:
+        plt.plot(range(1, ROUNDS + 1),
+                 np.mean(run_condition(payout), axis=1),
+                 label=f"risky high payoff = {payout} points")
+    plt.xticks([1] + [10 * n for n in range(1, round((ROUNDS + 10) / 10))])
+    plt.ylim([0, 1])
+    plt.yticks([round(n / 4, 2) for n in range(5)])
+    plt.ylabel("fraction choosing risky")
+    plt.xlabel("round")
+    plt.legend()
+    plt.title(f"Safe ({SAFE_PAYOUT} points) versus risky, {PARTICIPANTS:,} participants")
+    plt.savefig(PLOT_FILE)
+
+if __name__ == '__main__':
+    main()
@@ -14,24 +14,26 @@ facilitating debugging, logging and fine grained control of complex models.
 
 __version__ = "5.1.6.dev1"
 
-PYACTUP_MINIMUM_VERSION = "2.2.3"
+PYACTUP_MINIMUM_VERSION = "2.2.4.dev1"
 
 import collections.abc as abc
 import csv
 import io
+import json
 import math
 import matplotlib.pyplot as plt
 import numbers
 import numpy as np
 import os
 import pandas as pd
+import pickle
 import pyactup
 import random
 import sys
 import warnings
 
-from collections import Counter, defaultdict
-from itertools import count
+from collections import Counter, defaultdict, deque
+from itertools import chain, count
 from numbers import Real
 from packaging import version
 from prettytable import PrettyTable
@@ -45,17 +47,30 @@ warnings.formatwarning = (lambda message, category, filename, lineno, line=None:
 if version.parse(pyactup.__version__) < version.parse(PYACTUP_MINIMUM_VERSION):
     warn(f"PyACTUp version {pyactup.__version__} is older than that required by this version of PyIBL")
 
-__all__ = ["Agent", "DelayedResponse",
+__all__ = ["Agent", "DelayedResponse", "PopulationAgent", "TraceBuffer", "render_trace",
            "positive_linear_similarity", "positive_quadratic_similarity",
            "bounded_linear_similarity", "bounded_quadratic_similarity"]
 
 LEGEND_LIMIT = 10
 
+PROBABILITY_SAMPLES = 1024
+
+AGGREGATE_CHUNK_ROWS = 65_536
+AGGREGATE_FILE_FORMAT = "pyibl.aggregate_details"
+
 SQRT2 = math.sqrt(2)
 AGGREGATE_COLUMNS = tuple(("iteration,time,choice,utility,option,blended_value,"
                            "retrieval_probability,activation,base_level_activation,"
                            "activation_noise").split(","))
 
+# The columns of a trace taken from an Agent's activation history, by the names of the
+# fields of its records; cf. Agent._trace_rows() and render_trace()
+TRACE_FIELDS = {"base activation": "base_level_activation",
+                "activation noise": "activation_noise",
+                "mismatch adjustment": "mismatch",
+                "total activation": "activation",
+                "retrieval probability": "retrieval_probability"}
+
 
 class Agent:
     """A cognitive entity learning and making decisions based on its experience from prior decisions.
@@ -109,9 +124,11 @@ class Agent:
         self.default_utility_populates = default_utility_populates
         self._details = None
         self._aggregate_details = None
+        self._aggregate_statistics = None
         self._aggregate_similarities = False
         self._aggregate_iteration = 0
         self._trace = False
+        self._history = None
         self._fixed_noise = fixed_noise
         self.reset()
         self._test_default_utility()
@@ -492,6 +509,15 @@ class Agent:
         is created from an internal data structure. If you wish to modify a DataFrame and
         have those changes retained you need to retain this DataFrame.
 
+        For simulations of many participants, whose details might not fit in memory,
+        ``aggregate_details`` can instead be set to the name of a directory, a string or
+        path. The rows are then gathered into typed buffers of a fixed number of rows and,
+        each time they fill, appended to a file per column in that directory, replacing
+        any written there before. The directory must be empty, or one previously used in
+        this way; otherwise a :exc:`ValueError` is raised. The DataFrame is then read lazily from these files,
+        memory-mapped, with the ``choice`` and ``option`` columns categorical, and
+        :meth:`plot` computes its averages a chunk of rows at a time.
+
         .. warning::
             Collecting ``aggregate_details`` incurs costs, both in space and time, and for
             large, complex models some thought may be needed to balance these costs
@@ -539,24 +565,92 @@ class Agent:
         cols = AGGREGATE_COLUMNS
         if self._aggregate_similarities:
             cols += ("mismatch",) + tuple(f"{a}.similarity" for a in self._attributes)
-        result = pd.DataFrame(self._aggregate_details, columns=cols)
+        if isinstance(self._aggregate_details, _AggregateFile):
+            result = self._aggregate_details.frame()
+            return result[[c for c in cols if c in result.columns]]
+        blocks = self._aggregate_details
+        data = {}
+        for col in cols:
+            parts = [b[col] if col in b else np.full(len(b["time"]), np.nan) for b in blocks]
+            if parts and isinstance(parts[0], list):
+                data[col] = list(chain.from_iterable(parts))
+            else:
+                data[col] = np.concatenate(parts) if parts else []
+        result = pd.DataFrame(data, columns=cols)
         result.dropna(axis="columns", how="all", inplace=True)
         return result
 
     @aggregate_details.setter
     def aggregate_details(self, value):
-        if value:
+        if isinstance(value, (str, os.PathLike)):
+            self._aggregate_details = _AggregateFile(value)
+        elif value:
             self._aggregate_details = []
         else:
             self._aggregate_details = None
         self._aggregate_similarities = False
         self._aggregate_iteration = 0
 
+    @property
+    def aggregate_statistics(self):
+        """A Pandas DataFrame of running means of the values recorded by :attr:`aggregate_details`, kept without recording any of the rows themselves.
+        Set to ``True`` to begin accumulating them, or to ``False`` (the default) to not
+        do so; if already accumulating them setting this to ``True`` starts over.
+
+        Every kind of :meth:`plot` depends only on means over the virtual participants
+        at each time, so rather than recording a row for every instance at every
+        decision this keeps only running sums and counts, for each time and each
+        instance, described by its option and utility, and the number of times each
+        choice was made at each time. The space this takes is independent of the number
+        of virtual participants, and :meth:`plot`, which uses these statistics in
+        preference to :attr:`aggregate_details` if both are being collected, is
+        immediate even after very many participants. Note, however, that an instance
+        is identified by its utility, so if outcomes take on very many different values
+        many statistics will be kept.
+
+        The DataFrame has one row per option, utility and time, with columns ``option``,
+        ``utility`` and ``time``, a ``count`` column, the number of rows of
+        :attr:`aggregate_details` summarized, and the mean of each of
+        ``blended_value``, ``retrieval_probability``, ``activation``,
+        ``base_level_activation`` and ``activation_noise`` and, if partial matching has
+        been used, ``mismatch`` and the similarities of the attributes.
+
+        >>> a = Agent()
+        >>> a.aggregate_statistics = True
+        >>> a.populate(["a", "b"], 2.2)
+        >>> for participant in range(100_000):
+                a.reset(True)
+                for round in range(60):
+                    choice = a.choose(["a", "b"])
+                    if choice == "a":
+                        a.respond(1)
+                    else:
+                        a.respond(2 if random.random() < 0.5 else 0)
+        >>> a.plot("choice")
+        """
+        if self._aggregate_statistics is None:
+            return None
+        return self._aggregate_statistics.frame()
+
+    @aggregate_statistics.setter
+    def aggregate_statistics(self, value):
+        if value:
+            self._aggregate_statistics = _AggregateStatistics(
+                tuple(f"{a}.similarity" for a in self._attributes))
+        else:
+            self._aggregate_statistics = None
+
     @property
     def trace(self):
         """A boolean which, if ``True``, causes the :class:`Agent` to print details of its computations to standard output.
         Intended for use as a tool for debugging models. By default it is ``False``.
 
+        Printing these tables is slow, so rather than ``True`` this may instead be set
+        to a :class:`TraceBuffer`, or to any other object with a ``record`` method, in
+        which case the same information is passed to that method, a decision at a
+        time, instead of being printed, at little cost; the tables can be produced
+        later with :func:`render_trace`.
+
         The output is divided into blocks, the first line of which describes the
         choice being described and the blended value of its outcome. This is followed by
         a tabular description of various intermediate values used to arrive at this
@@ -610,7 +704,10 @@ class Agent:
 
     @trace.setter
     def trace(self, value):
-        self._trace = bool(value)
+        if callable(getattr(value, "record", None)):
+            self._trace = value
+        else:
+            self._trace = bool(value)
 
     @property
     def default_utility(self):
@@ -905,8 +1002,14 @@ class Agent:
         self._previous_choices = choices
         det = [] if self._details is not None else None
         try:
-            if details or det is not None or self._trace or self._aggregate_details is not None:
-                history = []
+            trace = self._trace_entry() if self._trace is not False else None
+            if (details or det is not None or trace is not None
+                    or self._aggregate_details is not None
+                    or self._aggregate_statistics is not None):
+                if self._history is None:
+                    self._history = pyactup.ActivationHistory()
+                history = self._history
+                history.clear()
                 self._memory.activation_history = history
             else:
                 history = None
@@ -914,10 +1017,28 @@ class Agent:
                 self._memory.advance(self._last_learn_time - self._memory.time + 1)
             utilities = []
             ret_probs = []
-            agg_len = len(self._aggregate_details) if self._aggregate_details is not None else None
+            # the blended value of each query recorded in the history
+            history_utilities = []
             def do_choose(history):
-                for c, q in zip(choices, queries):
-                    u = self._memory.blend("_utility", q)
+                next_query = history.queries if history is not None else None
+                if history is None or not (self._default_utility is not None
+                                           and self._default_utility_populates):
+                    # All the choices are blended together; but if a default utility
+                    # populates memory those after it are blended individually, as the
+                    # new instance may partially match them.
+                    blended = self._memory.blend_many("_utility", queries)
+                else:
+                    blended = None
+                for i, c, q in zip(count(), choices, queries):
+                    if blended is not None:
+                        u = blended[i]
+                        # this Agent's Memory has no threshold, so the activations of a
+                        # choice are recorded if and only if it has a blended value
+                        recorded = int(u is not None)
+                    else:
+                        recorded = history.queries if history is not None else 0
+                        u = self._memory.blend("_utility", q)
+                        recorded = history.queries - recorded if history is not None else 0
                     if u is None:
                         if self._default_utility is not None:
                             if self._callable_default_utility:
@@ -926,44 +1047,27 @@ class Agent:
                                 u = self._default_utility
                             if self._default_utility_populates:
                                 self._at_time(0, lambda: self._memory.learn(Agent._add_utility(q, u)))
+                                blended = None
                         else:
                             raise RuntimeError(f"No experience available for choice {c}")
                     utilities.append(u)
+                    if history is None:
+                        continue
+                    history_utilities.extend([u] * recorded)
+                    start, stop = history._query_rows(next_query, next_query + recorded)
+                    next_query += recorded
                     if details:
-                        ret_probs.append([{"utility": Agent._extract_instance_utility(inst),
-                                           "retrieval_probability": inst["retrieval_probability"]}
-                                          for inst in self._memory.activation_history])
+                        ret_probs.append([{"utility": inst["_utility"],
+                                           "retrieval_probability": p}
+                                          for inst, p in zip(history.chunks[start:stop],
+                                                             history.records["retrieval_probability"][start:stop])])
                     if det is not None:
                         d = dict(q) if self.attributes else {"decision": q["_decision"]}
-                        d["activations"] = history
+                        d["activations"] = history[start:stop]
                         d["blended"] = u
                         det.append(d)
-                    if history is not None:
-                        if self._trace:
-                            self._print_trace(q, u, history)
-                        if (ad := self._aggregate_details) is not None:
-                            agg = None
-                            for d in history:
-                                # cf. the definition of AGGREGATE_COLUMNS near the top of
-                                #     this file
-                                agg = [self._aggregate_iteration,
-                                       self.time,
-                                       None,
-                                       (att := d["attributes"])[0][1],
-                                       tuple(a[1] for a in att[1:]) if self._attributes else att[1][1],
-                                       u,
-                                       d["retrieval_probability"],
-                                       d["activation"],
-                                       d["base_level_activation"],
-                                       d.get("activation_noise", 0)]
-                                if sim := d.get("similarities"):
-                                    self._aggregate_similarities = True
-                                    agg.append(d.get("mismatch", 0))
-                                    agg.extend([sim.get(a, np.nan) for a in self._attributes])
-                                if agg is not None:
-                                    ad.append(agg)
-                        history = []
-                        self._memory.activation_history = history
+                    if trace is not None:
+                        trace["choices"].append(self._trace_choice(q, u, start, stop))
             if (not self._fixed_noise):
                 do_choose(history)
             else:
@@ -973,8 +1077,13 @@ class Agent:
             self._memory.activation_history = None
         if self._details is not None:
             self._details.append(det)
-        if self._trace:
-            print(f"\n   {'='*140}")
+        if trace is not None:
+            self._trace_rows(trace, history)
+            trace["time"] = self.time
+            if self._trace is True:
+                print(render_trace(trace), flush=True)
+            else:
+                self._trace.record(trace)
         best_indecies = [0]
         best_utility = utilities[0]
         for u, i in zip(utilities[1:], count(1)):
@@ -985,9 +1094,15 @@ class Agent:
                 best_indecies.append(i)
         best = random.choice(best_indecies)
         self._pending_decision = (best, choices, queries, utilities)
-        if agg_len is not None:
-            for v in self._aggregate_details[agg_len:]:
-                v[2] = tuple(queries[best].values()) if self._attributes else queries[best]["_decision"]
+        if ((self._aggregate_details is not None or self._aggregate_statistics is not None)
+                and len(history)):
+            block = self._aggregate_block(
+                history, history_utilities,
+                tuple(queries[best].values()) if self._attributes else queries[best]["_decision"])
+            if self._aggregate_details is not None:
+                self._aggregate_details.append(block)
+            if self._aggregate_statistics is not None:
+                self._aggregate_statistics.add(block)
         result = choices[best]
         if details:
             return result, sorted(({"choice": c,
@@ -999,45 +1114,159 @@ class Agent:
         else:
             return result
 
-    def _extract_instance_utility(inst):
-        first_attr = inst["attributes"][0]
-        assert first_attr[0] == "_utility"
-        return first_attr[1]
+    def choice_probabilities(self, choices=None, samples=PROBABILITY_SAMPLES):
+        """Returns the probability that :meth:`choose` would select each of the *choices*, as a list of floats in the same order.
+        The *choices* are as for :meth:`choose`, and if none are supplied those of the
+        most recent call to :meth:`choose` are used. These probabilities reflect the
+        activation noise: each choice is selected when its noisy blended value is the
+        largest, ties being broken at random. Rather than simulating many agents they are
+        computed in a single vectorized pass over a fixed, quasi-random set of *samples*
+        noise values, a rank one lattice mapped through the inverse of the noise
+        distribution, and shared between calls. The result is thus deterministic, and
+        changes smoothly as parameters such as :attr:`noise` or :attr:`decay` are
+        changed, making it suitable for computing expected learning curves or the
+        likelihood of a human's choices. Its error shrinks roughly as one over the number
+        of *samples*, which must be a positive integer.
+
+        This method does not change the state of this :class:`Agent`, and may be called
+        either just before :meth:`choose`, with the same *choices*, or between
+        :meth:`choose` and :meth:`respond`, describing the choice just made. A choice for
+        which there is no experience has the :attr:`default_utility` as its value, but
+        even if :attr:`default_utility_populates` is true no instance is added to memory.
+        If there is no experience of a choice and no :attr:`default_utility` a
+        :exc:`RuntimeError` is raised.
 
-    def _print_trace(self, query, utility, history):
-        print()
-        if self.attributes:
-            print(", ".join(list(f"{k}: {v}" for k, v in query.items())), end="")
+        If :attr:`noise_distribution` has been set its values cannot be derived from a
+        lattice, and pseudo-random values drawn from it are used instead, so the result
+        is then no longer deterministic.
+
+        >>> a = Agent(noise=0.5)
+        >>> a.populate(["safe"], 3)
+        >>> a.populate(["risky"], 0)
+        >>> a.populate(["risky"], 10)
+        >>> a.choice_probabilities(["safe", "risky"])
+        [0.3095703125, 0.6904296875]
+        >>> a.choose(["safe", "risky"])
+        'risky'
+        >>> a.respond(0)
+        >>> a.choice_probabilities()
+        [0.59375, 0.40625]
+        """
+        if not (isinstance(samples, numbers.Integral) and samples > 0):
+            raise ValueError(f"The number of samples, {samples}, is not a positive integer")
+        choices = list(choices if choices is not None else [])
+        if not choices:
+            if self._previous_choices:
+                choices = self._previous_choices
+            else:
+                raise ValueError("no choices were supplied and no default ones are available")
+        queries = self._make_queries(choices)
+        memory = self._memory
+        # The time at which choose() would compute these activations
+        when = max(memory.time, self._last_learn_time + 1)
+        saved = memory._time
+        try:
+            memory._time = when
+            activations, chunks = memory._activation_matrix("_utility", queries, False)
+        finally:
+            memory._time = saved
+        nchoices = len(queries)
+        if chunks is None:
+            retrieved = np.zeros(nchoices, dtype=bool)
         else:
-            print(query["_decision"], end="")
-        print(f" → {utility} @ time={self.time}")
-        tab = PrettyTable()
-        fields = (["id"] + (list(self.attributes) or ["decision"]) +
-                  ["created", "occurrences", "outcome", "base activation", "activation noise"])
-        if self._memory.mismatch:
-            fields.append("mismatch adjustment")
-        fields.extend(["total activation", "exp(act / temp)", "retrieval probability"])
-        tab.field_names = fields
-        for h in history:
-            attrs = dict(h["attributes"])
-            row = [h["name"]]
-            if self.attributes:
-                for a in self.attributes:
-                    row.append(attrs.get(a, ""))
+            retrieved = np.isfinite(activations).any(axis=1)
+        defaults = np.zeros(nchoices)
+        for i, c in enumerate(choices):
+            if not retrieved[i]:
+                if self._default_utility is None:
+                    raise RuntimeError(f"No experience available for choice {c}")
+                defaults[i] = (self._default_utility(c) if self._callable_default_utility
+                               else self._default_utility)
+        if chunks is None or not memory.noise:
+            samples = 1
+        values = np.broadcast_to(defaults, (samples, nchoices)).copy()
+        if chunks is not None:
+            activations = activations[retrieved]
+            outcomes = np.array([c["_utility"] for c in chunks], dtype=np.float64)
+            if memory.noise:
+                # with fixed noise a chunk has the same noise in every choice
+                shape = (1 if self._fixed_noise else len(activations), len(chunks))
+                activations = activations + memory.noise * _noise_samples(
+                    samples, shape, memory.noise_distribution)
             else:
-                row.append(attrs["_decision"])
-            row.append(h["creation_time"])
-            row.append(h["references"] if self._memory.optimized_learning else list(h["references"]))
-            row.append(attrs["_utility"])
-            row.append(h["base_level_activation"])
-            row.append(h.get("activation_noise") or 0.0)
-            if self._memory.mismatch:
-                row.append(h["mismatch"])
-            row.append(h["activation"])
-            row.append(math.exp(h["activation"] / (self.temperature or SQRT2 * self.noise)))
-            row.append(h["retrieval_probability"])
-            tab.add_row(row)
-        print(tab, flush=True)
+                activations = activations[np.newaxis]
+            with np.errstate(under="ignore", invalid="ignore"):
+                wp = np.exp((activations - np.max(activations, axis=2, keepdims=True))
+                            / memory._temperature)
+                values[:, retrieved] = np.sum(wp * outcomes, axis=2) / np.sum(wp, axis=2)
+        best = values == np.max(values, axis=1, keepdims=True)
+        probabilities = np.mean(best / np.sum(best, axis=1, keepdims=True), axis=0)
+        return [float(p) for p in probabilities]
+
+    def _aggregate_block(self, history, utilities, choice):
+        # The columns of the rows of aggregate_details describing the activations recorded
+        # in history during one call of choose(); cf. the definition of AGGREGATE_COLUMNS
+        # near the top of this file
+        records = history.records
+        n = len(records)
+        chunks = history.chunks
+        block = {"iteration": np.full(n, self._aggregate_iteration),
+                 "time": np.full(n, self.time),
+                 "choice": [choice] * n,
+                 "utility": [c["_utility"] for c in chunks],
+                 "option": ([tuple(c.values())[1:] for c in chunks] if self._attributes
+                            else [c["_decision"] for c in chunks]),
+                 "blended_value": np.array(utilities)[records["query"]],
+                 "retrieval_probability": records["retrieval_probability"].copy(),
+                 "activation": records["activation"].copy(),
+                 "base_level_activation": records["base_level_activation"].copy(),
+                 "activation_noise": records["activation_noise"].copy()}
+        if history.similarity_names:
+            self._aggregate_similarities = True
+            # rows of queries in which nothing was partially matched have NaNs throughout
+            partial = ~np.all(np.isnan(history.similarities), axis=1)
+            block["mismatch"] = np.where(partial, records["mismatch"], np.nan)
+            for a in self._attributes:
+                if a in history.similarity_names:
+                    block[f"{a}.similarity"] = history.similarities[
+                        :, history.similarity_names.index(a)].copy()
+        return block
+
+    def _trace_entry(self):
+        # The description of a decision passed to a trace's record method, to which
+        # _trace_choice() adds the description of each choice, and _trace_rows() the rows
+        # of the activation history they describe; cf. render_trace()
+        return {"decision": None,
+                "time": None,
+                "attributes": list(self.attributes) or None,
+                "mismatch": bool(self._memory.mismatch),
+                "optimized_learning": bool(self._memory.optimized_learning),
+                "temperature": self.temperature or SQRT2 * self.noise,
+                "choices": []}
+
+    def _trace_choice(self, query, utility, start, stop):
+        return {"query": dict(query) if self.attributes else query["_decision"],
+                "utility": utility,
+                "start": start,
+                "stop": stop}
+
+    def _trace_rows(self, trace, history):
+        # The rows of all the choices are kept as a copy of the history's records, the
+        # chunks they describe, whose contents never change, and the times at which
+        # those chunks had been reinforced, concatenated, with the offset of each row's
+        # first one; nothing is converted to Python objects until render_trace().
+        chunks = tuple(history.chunks)
+        records = history.records.copy()
+        counts = records["reference_count"]
+        if (ol := self._memory._optimized_learning) is not None:
+            counts = np.minimum(counts, ol)
+        offsets = np.zeros(len(chunks) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        trace["chunks"] = chunks
+        trace["records"] = records
+        trace["references"] = (np.concatenate([c._references[:n] for c, n in zip(chunks, counts)])
+                               if chunks else np.empty(0))
+        trace["reference_offsets"] = offsets
 
     def respond(self, outcome=None, choice=None):
         """Provide the *outcome* resulting from the most recent decision selected by :meth:`choose`.
@@ -1163,7 +1392,8 @@ class Agent:
              legend=None, limits=None, filename=None, show=None):
         """Generates a variety of plots of the evolution of this Agent's state over time.
         These plots can often be helpful in understanding how a PyIBL model is working.
-        To generate these plots :attr:`aggregate_details` must be set to ``True``. The
+        To generate these plots :attr:`aggregate_details` must be set to ``True``, or to
+        the name of a directory, or :attr:`aggregate_statistics` to ``True``. The
         constraints on the model for producing useful :attr:`aggregate_details` similarly
         apply for producing useful plots. Note that these plots are of values averaged
         over all the virtual participants. The *kind* argument to :meth:`plot` should be
@@ -1267,9 +1497,19 @@ class Agent:
             raise ValueError("The max value, {max}, is neither a Real number nor None")
         if show is None:
             show = filename is None
-        agg = self.aggregate_details
-        if agg is None:
-            raise RuntimeError("Can't make plot unless aggregate_details is set")
+        if self._aggregate_details is None and self._aggregate_statistics is None:
+            raise RuntimeError("Can't make plot unless aggregate_details or "
+                               "aggregate_statistics is set")
+        if self._aggregate_statistics is not None:
+            chunks = self._aggregate_statistics
+            columns = self._aggregate_statistics.columns()
+        elif isinstance(self._aggregate_details, _AggregateFile):
+            chunks = self._aggregate_details.chunks()
+            columns = self._aggregate_details._columns
+        else:
+            agg = self.aggregate_details
+            chunks = [agg]
+            columns = agg.columns
         plot_kind = {"choice":      ChoicePlot("choice", "Fraction making choice", True),
                      "bv":          OptionPlot("blended_value", "Mean blended value"),
                      "probability": InstancePlot("retrieval_probability",
@@ -1280,15 +1520,15 @@ class Agent:
                      }.get(kind)
         if not plot_kind:
             if isinstance(kind, str) and kind.endswith(".similarity"):
-                if kind in agg:
+                if kind in columns:
                     plot_kind = InstancePlot(kind, f"Mean similarities of {kind[0:-11]}",  True)
                 else:
                     raise ValueError(f"The {kind[0:-11]} attribute is either absent or not partially matched")
             else:
                 raise ValueError(f"Unknown plot kind {kind}")
-        if kind == "mismatch" and "mismatch" not in agg:
+        if kind == "mismatch" and "mismatch" not in columns:
             raise ValueError("Can't generate a mismatch plot when no attributes were partially matched")
-        data = plot_kind.get_data(agg, include, exclude, min, max, earliest, latest)
+        data = plot_kind.get_data(chunks, include, exclude, min, max, earliest, latest)
         plt.clf()
         for k, (t, v) in data.items():
             plt.plot(t, v, label=str(k))
@@ -1322,7 +1562,8 @@ class Agent:
         except:
             raise TypeError(f"{argname} should be a sequence of strings")
 
-    def similarity(self, attributes=None, function=None, weight=None):
+    def similarity(self, attributes=None, function=None, weight=None, vectorized=None,
+                   domain=None):
         """Assigns a function and/or corresponding weight to be used when computing the similarity of attribute values.
         The *attributes* are names of attributes of the :class:`Agent`. The value of
         *attributes*, if present, should be an :class:`Iterable` of strings. As a
@@ -1353,6 +1594,20 @@ class Agent:
         supplied item is set with the omitted one unchanged. If called with neither
         *function* nor *weight* the similarity function is removed.
 
+        If *vectorized* is true the *function* is declared to accept a NumPy array of
+        attribute values as its first argument, returning an array of their similarities
+        to its second argument, which is a single value; it is then called once for many
+        values rather than once per value, which can be much faster for an :class:`Agent`
+        with many instances. Passing ``True`` as the *function* is always handled in this
+        vectorized way, so it should be preferred to an equivalent equality function.
+
+        If *domain* is supplied it should be an :class:`Iterable` of the values the
+        attributes can take on, such as a small set of categorical values. The
+        similarities of all pairs of these values are then computed once, in advance,
+        and simply looked up thereafter, even if the *weight* is subsequently changed.
+        Other values are compared as usual, and a *domain* has no effect if *function*
+        is ``True``.
+
         In the following examples the height and width are assumed to range from zero to
         ten, and similarity of either is computed linearly, as the difference between them
         normalized by the maximum length of ten. The colors pink and red are considered
@@ -1374,12 +1629,287 @@ class Agent:
         self._memory.similarity((pyactup.Memory._ensure_slot_names(attributes)
                                  or [ "_decision" ]),
                                 function,
-                                weight)
+                                weight,
+                                vectorized=vectorized,
+                                domain=domain)
         try:
             self._memory.index = self._preferred_index()
         except RuntimeError:
             pass
 
+    def set_weights(self, weights):
+        """Changes the similarity weights of several attributes at once.
+        The *weights* should be a :class:`Mapping` from attribute names to positive, real
+        numbers. This has the same effect as calling :meth:`similarity` with just a
+        *weight* for each of the attributes, but is cheaper, and never discards the
+        similarity values already computed, making it suitable for models that adjust
+        attention weights on every trial.
+
+        >>> a.set_weights({"height": 2, "width": 0.5})
+        """
+        self._memory.set_weights(weights)
+        try:
+            self._memory.index = self._preferred_index()
+        except RuntimeError:
+            pass
+
+
+class _AggregateFile:
+    # The rows of an Agent's aggregate_details, written to the directory path. The rows
+    # are gathered in typed buffers of chunk_rows rows, one per column, and each time the
+    # buffers fill they are appended to a raw binary file per column, which are read
+    # back memory-mapped. The choice and option columns are stored as the codes of
+    # categories, kept in categories.pkl, and the time and utility as integers until a
+    # value is seen that is not, when they are converted to floats. A column first seen
+    # after rows have been written, such as a similarity, is filled with NaN for the
+    # earlier rows. Only an empty directory, or one previously written by an
+    # _AggregateFile, as recorded in its meta.json, is used, and only the files that
+    # meta.json lists are replaced.
+
+    DTYPES = {"iteration": np.int64, "time": np.int64, "choice": np.int32,
+              "utility": np.int64, "option": np.int32}
+
+    def __init__(self, path, chunk_rows=None):
+        self._path = os.fspath(path)
+        self._chunk_rows = int(chunk_rows or AGGREGATE_CHUNK_ROWS)
+        os.makedirs(self._path, exist_ok=True)
+        meta = os.path.join(self._path, "meta.json")
+        if os.path.exists(meta):
+            try:
+                with open(meta) as f:
+                    previous = json.load(f)
+                if previous.get("format") != AGGREGATE_FILE_FORMAT:
+                    raise ValueError()
+                names = [c["name"] for c in previous["columns"]]
+            except (ValueError, KeyError, TypeError, AttributeError):
+                raise ValueError(f"The directory {self._path} contains a meta.json not "
+                                 f"written by aggregate_details")
+            for name in names:
+                if os.path.exists(file := self._file(name)):
+                    os.remove(file)
+        elif os.listdir(self._path):
+            raise ValueError(f"The directory {self._path} is neither empty nor one "
+                             f"previously written by aggregate_details")
+        self._columns = {}
+        self._buffers = {}
+        self._categories = {"choice": {}, "option": {}}
+        self._written = 0
+        self._pending = 0
+        for name in AGGREGATE_COLUMNS:
+            self._add_column(name)
+        self.flush()
+
+    def __len__(self):
+        return self._written + self._pending
+
+    @property
+    def path(self):
+        return self._path
+
+    def _file(self, name):
+        return os.path.join(self._path, f"{name}.bin")
+
+    def _add_column(self, name):
+        dtype = np.dtype(_AggregateFile.DTYPES.get(name, np.float64))
+        self._columns[name] = dtype
+        self._buffers[name] = np.empty(self._chunk_rows, dtype=dtype)
+        if self._pending:
+            self._buffers[name][:self._pending] = np.nan
+        with open(self._file(name), "wb") as f:
+            # the rows written before this column appeared
+            for start in range(0, self._written, self._chunk_rows):
+                np.full(min(self._chunk_rows, self._written - start), np.nan,
+                        dtype=dtype).tofile(f)
+
+    def _widen(self, name):
+        # Converts an integer column to floats
+        self._columns[name] = np.dtype(np.float64)
+        self._buffers[name] = self._buffers[name].astype(np.float64)
+        if self._written:
+            values = np.fromfile(self._file(name), dtype=np.int64)
+            values.astype(np.float64).tofile(self._file(name))
+
+    def _codes(self, name, values):
+        categories = self._categories[name]
+        return [categories.setdefault(v, len(categories)) for v in values]
+
+    def append(self, block):
+        n = len(block["time"])
+        for name in block:
+            if name not in self._columns:
+                self._add_column(name)
+        for name in ("time", "utility"):
+            if (self._columns[name].kind == "i"
+                    and np.asarray(block[name]).dtype.kind not in "iub"):
+                self._widen(name)
+        done = 0
+        while done < n:
+            k = min(n - done, self._chunk_rows - self._pending)
+            rows = slice(self._pending, self._pending + k)
+            for name, buffer in self._buffers.items():
+                if name not in block:
+                    buffer[rows] = np.nan
+                elif name in self._categories:
+                    buffer[rows] = self._codes(name, block[name][done:done + k])
+                else:
+                    buffer[rows] = block[name][done:done + k]
+            self._pending += k
+            done += k
+            if self._pending == self._chunk_rows:
+                self.flush()
+
+    def flush(self):
+        if self._pending:
+            for name, buffer in self._buffers.items():
+                with open(self._file(name), "ab") as f:
+                    buffer[:self._pending].tofile(f)
+            self._written += self._pending
+            self._pending = 0
+        with open(os.path.join(self._path, "categories.pkl"), "wb") as f:
+            pickle.dump({name: list(c) for name, c in self._categories.items()}, f)
+        with open(os.path.join(self._path, "meta.json"), "w") as f:
+            json.dump({"format": AGGREGATE_FILE_FORMAT,
+                       "rows": self._written,
+                       "columns": [{"name": name, "dtype": dtype.str}
+                                   for name, dtype in self._columns.items()]},
+                      f, indent=1)
+
+    def frame(self, start=0, stop=None):
+        # The rows from start to stop as a DataFrame whose numeric columns are views
+        # onto the memory-mapped files
+        self.flush()
+        stop = self._written if stop is None else min(stop, self._written)
+        data = {}
+        categories = {name: list(c) for name, c in self._categories.items()}
+        for name, dtype in self._columns.items():
+            if self._written == 0:
+                column = np.empty(0, dtype=dtype)
+            else:
+                column = np.memmap(self._file(name), dtype=dtype, mode="r",
+                                   shape=(self._written,))[start:stop]
+            if name in categories:
+                c = categories[name]
+                column = pd.Categorical.from_codes(
+                    column, categories=pd.Index(c, dtype=object, tupleize_cols=False))
+            data[name] = column
+        return pd.DataFrame(data, copy=False)
+
+    def chunks(self):
+        # The rows as a sequence of DataFrames of at most chunk_rows rows each
+        self.flush()
+        for start in range(0, self._written, self._chunk_rows):
+            yield self.frame(start, start + self._chunk_rows)
+
+
+class _AggregateStatistics:
+    # The running sums and counts of the numeric columns of an Agent's
+    # aggregate_details, for each distinct option, utility and time, together with the
+    # number of times each choice was made at each time; these suffice for all the
+    # plots, in space independent of the number of rows summarized. The sums and counts
+    # are arrays with a row for each key, in the order the keys were first seen, and a
+    # column for each of the columns, grown as needed. As with groupby, NaNs are not
+    # counted, and as in a DataFrame, once any utility is not an integer all are
+    # reported as floats.
+
+    def __init__(self, similarities=()):
+        self._columns = list(AGGREGATE_COLUMNS[5:]) + ["mismatch"] + list(similarities)
+        self._seen = set(AGGREGATE_COLUMNS)
+        self._keys = {}
+        self._rows = np.zeros(16, dtype=np.int64)
+        self._sums = np.zeros((16, len(self._columns)))
+        self._counts = np.zeros((16, len(self._columns)), dtype=np.int64)
+        self._choices = Counter()
+        self._float_utilities = False
+
+    def _grow(self, rows, columns):
+        if rows > len(self._rows) or columns > self._sums.shape[1]:
+            old = self._sums.shape
+            rows = max(rows, 2 * old[0]) if rows > old[0] else old[0]
+            self._rows = np.concatenate((self._rows,
+                                         np.zeros(rows - old[0], dtype=np.int64)))
+            sums = np.zeros((rows, columns))
+            sums[:old[0], :old[1]] = self._sums
+            self._sums = sums
+            counts = np.zeros((rows, columns), dtype=np.int64)
+            counts[:old[0], :old[1]] = self._counts
+            self._counts = counts
+
+    def add(self, block):
+        # Adds the rows of a block, as returned by Agent._aggregate_block(); all the rows
+        # of a block are of a single choice at a single time
+        for name in block:
+            if name not in self._seen:
+                self._seen.add(name)
+                if name not in self._columns:
+                    self._columns.append(name)
+        if not self._float_utilities:
+            self._float_utilities = any(not isinstance(u, numbers.Integral)
+                                        for u in block["utility"])
+        keys = self._keys
+        rows = np.array([keys.setdefault(k, len(keys))
+                         for k in zip(block["option"], block["utility"], block["time"])],
+                        dtype=np.int64)
+        n = len(keys)
+        self._grow(n, len(self._columns))
+        self._rows[:n] += np.bincount(rows, minlength=n)
+        for i, name in enumerate(self._columns):
+            if name not in block:
+                continue
+            values = np.asarray(block[name], dtype=np.float64)
+            present = ~np.isnan(values)
+            self._sums[:n, i] += np.bincount(rows[present], values[present], minlength=n)
+            self._counts[:n, i] += np.bincount(rows[present], minlength=n)
+        if len(rows):
+            self._choices[block["choice"][0], block["time"][0]] += 1
+
+    def columns(self):
+        # The names of the columns of aggregate_details these statistics summarize
+        return [name for name in list(AGGREGATE_COLUMNS) + self._columns
+                if name in self._seen]
+
+    def _selected(self, earliest, latest):
+        # The keys and their rows, restricted to times between earliest and latest
+        for key, i in self._keys.items():
+            t = key[2]
+            if (earliest is None or t >= earliest) and (latest is None or t <= latest):
+                yield key, i
+
+    def means(self, column, keys, earliest, latest):
+        # The same as Plot._means() computes from the rows themselves
+        c = self._columns.index(column)
+        n = len(keys)
+        result = {}
+        for key, i in self._selected(earliest, latest):
+            if n > 1 and self._float_utilities:
+                key = (key[0], float(key[1]), key[2])
+            s = result.setdefault(key[:n], {}).setdefault(key[2], [0, 0])
+            s[0] += self._sums[i, c]
+            s[1] += self._counts[i, c]
+        return result
+
+    def choices(self, earliest, latest):
+        # A dict mapping choices, in the order they were first made, to Counters of the
+        # number of times they were made at each time between earliest and latest
+        result = {}
+        for (ch, t), n in self._choices.items():
+            if (earliest is None or t >= earliest) and (latest is None or t <= latest):
+                result.setdefault(ch, Counter())[t] = n
+        return result
+
+    def frame(self):
+        n = len(self._keys)
+        columns = [name for name in self._columns if name in self._seen]
+        data = {"option": [k[0] for k in self._keys],
+                "utility": [float(k[1]) if self._float_utilities else k[1]
+                            for k in self._keys],
+                "time": [k[2] for k in self._keys],
+                "count": self._rows[:n].copy()}
+        with np.errstate(invalid="ignore", divide="ignore"):
+            for name in columns:
+                i = self._columns.index(name)
+                data[name] = self._sums[:n, i] / self._counts[:n, i]
+        return pd.DataFrame(data)
+
 
 class Plot():
 
@@ -1388,31 +1918,74 @@ class Plot():
         self._description = description
         self._default_ylim = (-0.05, 1.05) if limit_range else None
 
-    def get_data(self, data, include, exclude, min, max):
+    def get_data(self, chunks, include, exclude, min, max, earliest, latest):
+        # The chunks are an iterable of DataFrames of the aggregate details, typically
+        # just one, but successive pieces of them if they have been written to disk, so
+        # the data are accumulated a chunk at a time.
         raise NotImplementedError()
 
+    @staticmethod
+    def _between(d, earliest, latest):
+        if earliest is not None:
+            d = d[d.time >= earliest]
+        if latest is not None:
+            d = d[d.time <= latest]
+        return d
+
+    def _means(self, chunks, keys, earliest, latest):
+        # The means of the column, as a dict mapping each distinct value of the keys, in
+        # order of appearance, to a dict mapping times to [sum, count] pairs
+        if isinstance(chunks, _AggregateStatistics):
+            return chunks.means(self._column, keys, earliest, latest)
+        result = {}
+        for data in chunks:
+            d = Plot._between(data, earliest, latest)
+            grouped = (d.groupby(keys + ["time"], sort=False, observed=True)[self._column]
+                       .agg(["sum", "count"]))
+            for k, (total, n) in zip(grouped.index, grouped.to_numpy()):
+                s = result.setdefault(k[:-1], {}).setdefault(k[-1], [0, 0])
+                s[0] += total
+                s[1] += n
+        return result
+
+    @staticmethod
+    def _series(sums):
+        times = sorted(sums)
+        return (times, pd.Series([sums[t][0] / sums[t][1] if sums[t][1] else np.nan
+                                  for t in times], index=times, dtype=np.float64))
+
 
 class ChoicePlot(Plot):
     def __init__(self, column, description, limit_range=False):
         super().__init__(column, description, limit_range)
 
-    def get_data(self, data, include, exclude, min, max, earliest, latest):
-        counters = {}
-        sums = defaultdict(int)
-        times = set()
-        for ch in data.choice.unique():
-            d = data[data.choice==ch]
-            if earliest is not None:
-                d = d[d.time >= earliest]
-            if latest is not None:
-                d = d[d.time <= latest]
-            grouped = d.groupby(["iteration", "time"])
-            # There's probably a better way to do this within Pandas, right?
-            cnt = Counter([t for (i, t), ignore in grouped[["iteration", "time"]]])
-            times.update(cnt.keys())
-            for k in cnt:
-                sums[k] += cnt[k]
-            counters[ch] = cnt
+    def get_data(self, chunks, include, exclude, min, max, earliest, latest):
+        if isinstance(chunks, _AggregateStatistics):
+            counters = chunks.choices(earliest, latest)
+            sums = Counter()
+            for cnt in counters.values():
+                sums.update(cnt)
+            chunks = ()
+        else:
+            counters = {}
+            sums = defaultdict(int)
+        last = None
+        for data in chunks:
+            # One row for each round, a distinct iteration and time; the rows of a round
+            # are consecutive, but may be split between two chunks.
+            d = data[["iteration", "time", "choice"]].drop_duplicates(["iteration", "time"])
+            if len(d) == 0:
+                continue
+            first, previous = (d.iteration.iloc[0], d.time.iloc[0]), last
+            last = (d.iteration.iloc[-1], d.time.iloc[-1])
+            if first == previous:
+                d = d.iloc[1:]
+            d = Plot._between(d, earliest, latest)
+            for (ch, t), n in d.groupby(["choice", "time"], sort=False,
+                                        observed=True).size().items():
+                counters.setdefault(ch, Counter())[t] += n
+                sums[t] += n
+        times = set(sums)
         result = {}
         for ch, cnt in counters.items():
             if include and ch not in include:
@@ -1432,21 +2005,14 @@ class OptionPlot(Plot):
     def __init__(self, column, description, limit_range=False):
         super().__init__(column, description, limit_range)
 
-    def get_data(self, data, include, exclude, min, max, earliest, latest):
+    def get_data(self, chunks, include, exclude, min, max, earliest, latest):
         result = {}
-        for opt in data.option.unique():
+        for (opt,), sums in self._means(chunks, ["option"], earliest, latest).items():
             if include and opt not in include:
                 continue
             if exclude and opt in exclude:
                 continue
-            d = data[(data.option==opt)]
-            if earliest is not None:
-                d = d[d.time >= earliest]
-            if latest is not None:
-                d = d[d.time <= latest]
-            grouped = d.groupby("time")
-            result[opt] = ([t for t, ignore in grouped["time"]],
-                           grouped[self._column].mean())
+            result[opt] = Plot._series(sums)
         return result
 
 
@@ -1454,9 +2020,10 @@ class InstancePlot(Plot):
     def __init__(self, column, description, limit_range=False):
         super().__init__(column, description, limit_range)
 
-    def get_data(self, data, include, exclude, min, max, earliest, latest):
+    def get_data(self, chunks, include, exclude, min, max, earliest, latest):
         result = {}
-        for opt, util in data[["option", "utility"]].drop_duplicates().itertuples(index=False, name=None):
+        for (opt, util), sums in self._means(chunks, ["option", "utility"],
+                                             earliest, latest).items():
             if include and opt not in include:
                 continue
             if exclude and opt in exclude:
@@ -1465,14 +2032,7 @@ class InstancePlot(Plot):
                 continue
             if max and util > max:
                 continue
-            d = data[(data.option==opt) & (data.utility==util)]
-            if earliest is not None:
-                d = d[d.time >= earliest]
-            if latest is not None:
-                d = d[d.time <= latest]
-            grouped = d.groupby("time")
-            result[f"{opt}, {util}"] = ([t for t, ignore in grouped["time"]],
-                                        grouped[self._column].mean())
+            result[f"{opt}, {util}"] = Plot._series(sums)
         return result
 
 
@@ -1573,6 +2133,446 @@ class DelayedResponse:
         return old
 
 
+class TraceBuffer:
+    """A ring buffer in which an :class:`Agent` can record its :attr:`trace` cheaply, rather than printing it.
+    Set an agent's :attr:`trace` to a :class:`TraceBuffer` and each call of
+    :meth:`choose` adds to it a description of its computations, the same information
+    printed when :attr:`trace` is ``True``, as a dictionary holding a copy of the rows
+    of the activation history, the instances they describe and their reinforcement
+    times as NumPy arrays; nothing is formatted, nor converted to Python lists, until
+    it is wanted. Only the most recent *capacity* decisions are kept, or all of them if
+    *capacity* is ``None``.
+
+    Decisions are numbered from zero in the order they are recorded, and indexing a
+    :class:`TraceBuffer` by such a number returns the corresponding decision, if it is
+    still held; negative numbers count back from the most recent. Iterating over it
+    yields the decisions held, oldest first. :func:`render_trace` turns a decision
+    into the tables :attr:`trace` prints, and :meth:`save` and :meth:`load` write and
+    read the decisions as JSON Lines, one decision to a line. Since a long trace is
+    slow to parse, :meth:`read` reads just one decision of a saved file.
+
+    >>> a = Agent(default_utility=10, default_utility_populates=True)
+    >>> a.trace = TraceBuffer()
+    >>> for i in range(1000):
+            a.choose(["a", "b", "c"])
+            a.respond(random.random())
+    >>> len(a.trace)
+    1000
+    >>> a.trace.save("trace.jsonl")
+    >>> print(render_trace(TraceBuffer.read("trace.jsonl", 999)))
+    """
+
+    def __init__(self, capacity=1000):
+        if capacity is not None and (not isinstance(capacity, numbers.Integral)
+                                     or capacity < 1):
+            raise ValueError(f"The capacity, {capacity}, is neither a positive integer nor None")
+        self._entries = deque(maxlen=capacity)
+        self._count = 0
+
+    @property
+    def capacity(self):
+        """The maximum number of decisions held, or ``None`` if there is no limit.
+        """
+        return self._entries.maxlen
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __getitem__(self, n):
+        if n < 0:
+            n += self._count
+        first = self._count - len(self._entries)
+        if not first <= n < self._count:
+            raise IndexError(f"Decision {n} is not in this TraceBuffer")
+        return self._entries[n - first]
+
+    def record(self, decision):
+        """Adds *decision*, a dictionary describing one call of :meth:`Agent.choose`, to this buffer, discarding the oldest if it is full.
+        """
+        decision["decision"] = self._count
+        self._count += 1
+        self._entries.append(decision)
+
+    def clear(self):
+        """Discards all the decisions held, and starts numbering them again from zero.
+        """
+        self._entries.clear()
+        self._count = 0
+
+    def save(self, file):
+        """Writes the decisions held to the file with path *file* as JSON Lines.
+        Alongside it, in a file of the same name with ``.index`` appended, are written the
+        byte offsets of the lines, as used by :meth:`read`.
+        """
+        file = os.fspath(file)
+        offsets = [0]
+        with open(file, "wb") as f:
+            for decision in self._entries:
+                line = (json.dumps(_trace_json(decision), default=_json_value) + "\n").encode()
+                f.write(line)
+                offsets.append(offsets[-1] + len(line))
+        # The number of the first decision, followed by the offset of every line and of
+        # the end of the file
+        first = self._count - len(self._entries)
+        np.array([first] + offsets, dtype="<i8").tofile(file + ".index")
+
+    @staticmethod
+    def load(file, capacity=None):
+        """Returns a new :class:`TraceBuffer` holding the decisions in *file*, a path or a text file, as written by :meth:`save`.
+        The decisions retain their original numbers.
+        """
+        if isinstance(file, (str, os.PathLike)):
+            with open(file) as f:
+                return TraceBuffer.load(f, capacity)
+        result = TraceBuffer(capacity)
+        for line in file:
+            if line.strip():
+                decision = _trace_arrays(json.loads(line))
+                result._entries.append(decision)
+                result._count = decision["decision"] + 1
+        return result
+
+    @staticmethod
+    def read(file, n):
+        """Returns decision number *n* of the file with path *file*, as written by :meth:`save`, without reading the rest of it.
+        As for indexing a :class:`TraceBuffer`, negative numbers count back from the
+        most recent decision. Raises an :exc:`IndexError` if the decision is not in the file.
+        """
+        file = os.fspath(file)
+        with open(file + ".index", "rb") as f:
+            first = int(np.fromfile(f, dtype="<i8", count=1)[0])
+            stop = first + f.seek(0, os.SEEK_END) // 8 - 2
+            if n < 0:
+                n += stop
+            if not first <= n < stop:
+                raise IndexError(f"Decision {n} is not in {file}")
+            f.seek(8 * (n - first + 1))
+            start, end = np.fromfile(f, dtype="<i8", count=2)
+        with open(file, "rb") as f:
+            f.seek(start)
+            return _trace_arrays(json.loads(f.read(end - start)))
+
+
+def _trace_columns(decision):
+    # The id, values, creation time and outcome of the instance described by each row of
+    # a decision recorded by a trace, as lists
+    if "chunks" not in decision:
+        return decision["id"], decision["values"], decision["created"], decision["outcome"]
+    chunks = decision["chunks"]
+    attributes = decision["attributes"]
+    return ([c._name for c in chunks],
+            ([[c.get(a, "") for a in attributes] for c in chunks]
+             if attributes else [[c["_decision"]] for c in chunks]),
+            [c._creation for c in chunks],
+            [c["_utility"] for c in chunks])
+
+
+def _trace_json(decision):
+    # A decision recorded by a trace with its instances replaced by their contents, and
+    # only the fields of its records that are rendered, for TraceBuffer.save()
+    result = {k: v for k, v in decision.items() if k not in ("chunks", "records")}
+    result["id"], result["values"], result["created"], result["outcome"] = _trace_columns(decision)
+    result["records"] = {field: decision["records"][field] for field in TRACE_FIELDS.values()
+                         if field != "mismatch" or decision["mismatch"]}
+    return result
+
+
+def _trace_arrays(decision):
+    # Restores the arrays of a decision read by TraceBuffer.load() or TraceBuffer.read()
+    decision["records"] = {k: np.asarray(v, dtype=float) for k, v in decision["records"].items()}
+    decision["references"] = np.asarray(decision["references"])
+    decision["reference_offsets"] = np.asarray(decision["reference_offsets"], dtype=np.int64)
+    return decision
+
+
+def _json_value(x):
+    # Converts NumPy values, and anything else json can't, for TraceBuffer.save()
+    if isinstance(x, np.ndarray):
+        return x.tolist()
+    if isinstance(x, np.generic):
+        return x.item()
+    return str(x)
+
+
+def render_trace(decision):
+    """Returns a string of the tables describing a decision as printed by :attr:`Agent.trace`.
+    The *decision* should be one recorded by setting :attr:`Agent.trace` to a
+    :class:`TraceBuffer`, or to another object with a ``record`` method.
+    """
+    attributes = decision["attributes"]
+    fields = (["id"] + (attributes or ["decision"]) +
+              ["created", "occurrences", "outcome", "base activation", "activation noise"])
+    if decision["mismatch"]:
+        fields.append("mismatch adjustment")
+    fields.extend(["total activation", "exp(act / temp)", "retrieval probability"])
+    temperature = decision["temperature"]
+    ids, values, created, outcomes = _trace_columns(decision)
+    records = decision["records"]
+    columns = [records[TRACE_FIELDS[name]] for name in fields if name in TRACE_FIELDS
+               and name != "retrieval probability"]
+    probabilities = records["retrieval_probability"]
+    references = decision["references"]
+    offsets = decision["reference_offsets"]
+    result = []
+    for choice in decision["choices"]:
+        if attributes:
+            result.append("\n" + ", ".join(f"{k}: {v}" for k, v in choice["query"].items()))
+        else:
+            result.append(f"\n{choice['query']}")
+        result.append(f" → {choice['utility']} @ time={decision['time']}\n")
+        tab = PrettyTable()
+        tab.field_names = fields
+        for i in range(choice["start"], choice["stop"]):
+            occurrences = references[offsets[i]:offsets[i + 1]].tolist()
+            if decision["optimized_learning"]:
+                occurrences = tuple(occurrences)
+            row = [column[i] for column in columns]
+            tab.add_row([ids[i], *values[i], created[i], occurrences, outcomes[i],
+                         *row, math.exp(row[-1] / temperature), probabilities[i]])
+        result.append(f"{tab}\n")
+    result.append(f"\n   {'='*140}")
+    return "".join(result)
+
+
+class PopulationAgent:
+    """A population of cognitive entities, all making the same kind of decisions, each learning from its own experience.
+    A :class:`PopulationAgent` behaves as *population* independent :class:`Agent` objects
+    with the same attributes and parameters, but its :meth:`choose` and :meth:`respond`
+    methods operate on all of them at once, taking and returning arrays with one element
+    per participant. Their memories are held in a single :class:`pyactup.PopulationMemory`,
+    so simulating thousands of virtual participants takes about as long as a few
+    :class:`Agent` objects, with no need for several processes.
+
+    The *attributes*, *name* and the properties :attr:`noise`, :attr:`decay`,
+    :attr:`temperature`, :attr:`mismatch_penalty`, :attr:`optimized_learning`,
+    :attr:`default_utility` and :attr:`default_utility_populates` are as for an
+    :class:`Agent`, and shared by every participant, except that :attr:`optimized_learning`
+    may only be ``True`` or ``False``. The *population* must be a positive integer. Every
+    participant is offered the same choices at each decision, though each selects and
+    is rewarded individually. Details, traces, delayed feedback and fixed noise are not
+    supported; a model needing them should use :class:`Agent`.
+
+    Because of noise the results returned by :meth:`choose` are stochastic, so the
+    results of running the following example may differ in their details from those shown.
+
+    >>> a = PopulationAgent(4, default_utility=10)
+    >>> a.choose(["safe", "risky"])
+    array(['risky', 'safe', 'safe', 'risky'], dtype=object)
+    >>> a.respond(np.array([0, 3, 3, 12]))
+    >>> a.choose()
+    array(['safe', 'risky', 'risky', 'risky'], dtype=object)
+    """
+
+    def __init__(self,
+                 population,
+                 attributes=[],
+                 name=None,
+                 noise=pyactup.DEFAULT_NOISE,
+                 decay=pyactup.DEFAULT_DECAY,
+                 temperature=None,
+                 mismatch_penalty=None,
+                 optimized_learning=False,
+                 default_utility=None,
+                 default_utility_populates=False):
+        self._attributes = pyactup.Memory._ensure_slot_names(attributes)
+        if name is None:
+            Agent._agent_number += 1
+            name = f"agent-{Agent._agent_number}"
+        elif not (isinstance(name, str) and len(name) > 0):
+            raise TypeError(f"Agent name {name} is not a non-empty string")
+        self._name = name
+        self._memory = pyactup.PopulationMemory(population,
+                                                optimized_learning=optimized_learning)
+        self.temperature = temperature # set temperature BEFORE noise
+        self.noise = noise
+        self.decay = decay
+        self.mismatch_penalty = mismatch_penalty
+        self.default_utility = default_utility
+        self.default_utility_populates = default_utility_populates
+        self._rng = np.random.default_rng([random.randint(0, 2**62) for i in range(4)])
+        self.reset()
+        self._test_default_utility()
+
+    def __repr__(self):
+        return f"<PopulationAgent {str(self)} {self.population} {id(self)}>"
+
+    def __str__(self):
+        return str(self._name)
+
+    name = Agent.name
+    attributes = Agent.attributes
+    time = Agent.time
+    advance = Agent.advance
+    noise = Agent.noise
+    temperature = Agent.temperature
+    decay = Agent.decay
+    mismatch_penalty = Agent.mismatch_penalty
+    default_utility = Agent.default_utility
+    default_utility_populates = Agent.default_utility_populates
+    _test_default_utility = Agent._test_default_utility
+    _canonicalize_choice = Agent._canonicalize_choice
+    _make_queries = Agent._make_queries
+    _at_time = Agent._at_time
+
+    @property
+    def population(self):
+        """The number of participants in this :class:`PopulationAgent`. It cannot be changed."""
+        return self._memory.population
+
+    @property
+    def optimized_learning(self):
+        """Whether or not the optimized learning approximation is used; it is set when this :class:`PopulationAgent` is created."""
+        return self._memory.optimized_learning
+
+    def reset(self):
+        """Erases the memories of all the participants and resets their time to zero."""
+        self._memory.reset()
+        self._last_learn_time = 0
+        self._previous_choices = None
+        self._pending_decision = None
+
+    def similarity(self, attributes=None, function=None, weight=None):
+        """Assigns a function and/or corresponding weight to be used when computing the similarity of attribute values.
+        The arguments are as for :meth:`Agent.similarity`.
+        """
+        self._memory.similarity((pyactup.Memory._ensure_slot_names(attributes)
+                                 or [ "_decision" ]),
+                                function,
+                                weight)
+
+    def _outcomes(self, outcome):
+        # A real number, or an array of one per participant
+        if isinstance(outcome, (np.ndarray, abc.Sequence)):
+            outcome = np.asarray(outcome)
+            if outcome.shape != (self.population,):
+                raise ValueError(f"There must be one outcome for each of the "
+                                 f"{self.population} participants")
+            if not np.issubdtype(outcome.dtype, np.number) or np.iscomplexobj(outcome):
+                raise ValueError(f"The outcomes do not have (non-complex) numeric values")
+            return outcome.astype(np.float64)
+        return Agent._outcome_value(outcome)
+
+    def populate(self, choices, outcome, when=None):
+        """Adds instances to the memories of every participant, one for each of the *choices*, with the given *outcome*, at the current time or at time *when*.
+        The *outcome* is either a real number or an array of one real number per
+        participant. Otherwise this is as :meth:`Agent.populate`.
+        """
+        if when is not None:
+            if when > self.time:
+                raise ValueError(f"The when argument ({when}) must not be in the future")
+            return self._at_time(when, lambda: self.populate(choices, outcome))
+        outcome = self._outcomes(outcome)
+        for query in self._make_queries(choices):
+            self._memory.learn(Agent._add_utility(query, outcome))
+        self._last_learn_time = max(self._last_learn_time, self._memory.time)
+
+    def choose(self, choices=None):
+        """Selects, for each participant, which of the *choices* is expected to result in the largest payoff, and returns them as an array.
+        The *choices* are as for :meth:`Agent.choose`, and are offered to every
+        participant; if none are supplied those of the previous call are reused. Each
+        participant selects the choice with its highest blended value, computed with its
+        own memory and activation noise, ties being broken at random. The result is a
+        :mod:`numpy` object array of length :attr:`population`, each element being one of
+        the *choices*.
+
+        After a call to :meth:`choose` a corresponding call must be made to
+        :meth:`respond` before calling :meth:`choose` again, or a :exc:`RuntimeError` will
+        be raised.
+        """
+        if self._pending_decision is not None:
+            raise RuntimeError("choice requested before previous outcome was supplied")
+        choices = list(choices if choices is not None else [])
+        if not choices:
+            if self._previous_choices:
+                choices = self._previous_choices
+            else:
+                raise ValueError("no choices were supplied and no default ones are available")
+        queries = self._make_queries(choices)
+        self._previous_choices = choices
+        if self._last_learn_time >= self._memory.time:
+            self._memory.advance(self._last_learn_time - self._memory.time + 1)
+        utilities = self._memory.blend_many("_utility", queries)
+        for i, c, q in zip(count(), choices, queries):
+            if not np.isnan(utilities[i]).any():
+                continue
+            if self._default_utility is None:
+                raise RuntimeError(f"No experience available for choice {c}")
+            u = self._default_utility(c) if self._callable_default_utility else self._default_utility
+            missing = np.isnan(utilities[i])
+            if self._default_utility_populates:
+                self._at_time(0, lambda: self._memory.learn(Agent._add_utility(q, u),
+                                                            participants=missing))
+            utilities[i, missing] = u
+        best = utilities == np.max(utilities, axis=0)
+        # a random one of the choices with the highest blended value
+        best = np.argmax(best * self._rng.random(best.shape), axis=0)
+        self._pending_decision = (best, choices, queries)
+        result = np.empty(len(choices), dtype=object)
+        for i, c in enumerate(choices):
+            result[i] = c
+        return result[best]
+
+    def respond(self, outcome, choice=None):
+        """Provides the outcomes resulting from the most recent decisions selected by :meth:`choose`.
+        The *outcome* is either a real number, received by every participant, or an array
+        of one real number per participant. By default each participant's outcome is
+        attached to the choice it selected; if *choice* is supplied it should be an array
+        of one of the choices passed to :meth:`choose` for each participant, as for the
+        second argument of :meth:`Agent.respond`.
+
+        If there has not been a call to :meth:`choose` since the last time :meth:`respond`
+        was called a :exc:`RuntimeError` is raised. If *outcome* is neither a real number
+        nor an array of them of length :attr:`population`, or *choice* contains a value
+        that is not one of the choices, a :exc:`ValueError` is raised.
+        """
+        if self._pending_decision is None:
+            raise RuntimeError(
+                f"outcome {outcome} supplied when no decision requiring an outcome is pending")
+        best, choices, queries = self._pending_decision
+        outcome = self._outcomes(outcome)
+        if choice is not None:
+            if len(choice) != self.population:
+                raise ValueError(f"There must be one choice for each of the "
+                                 f"{self.population} participants")
+            try:
+                best = np.array([choices.index(c) for c in choice], dtype=np.intp)
+            except ValueError:
+                raise ValueError(f"{choice} contains a value not one of the choices originally provided")
+        for i, q in enumerate(queries):
+            participants = best == i
+            if participants.any():
+                value = outcome[participants] if isinstance(outcome, np.ndarray) else outcome
+                self._memory.learn(Agent._add_utility(q, value), participants=participants)
+        self._last_learn_time = self._memory.time
+        self._pending_decision = None
+
+
+def _lattice(samples, dimensions):
+    # A rank one lattice of samples points in the unit hypercube, using the generalized
+    # golden ratio sequence of Roberts (2018), and offset so that no point is on a face.
+    # It is not cached: its dimensions grow with the number of instances, so it would
+    # rarely be reused, while a cache would keep several large arrays alive.
+    phi = 2.0
+    for i in range(30):
+        phi = (1 + phi) ** (1 / (dimensions + 1))
+    alpha = (1 / phi) ** np.arange(1, dimensions + 1)
+    return np.modf(0.5 + np.arange(1, samples + 1)[:, np.newaxis] * alpha)[0]
+
+def _noise_samples(samples, shape, distribution=None):
+    # Standard noise values, of the given shape for each of samples samples, from a
+    # lattice through the quantile function of the logistic distribution, or drawn from
+    # a custom distribution
+    size = math.prod(shape)
+    if distribution is not None:
+        return np.array([distribution() for i in range(samples * size)],
+                        dtype=np.float64).reshape((samples,) + shape)
+    u = _lattice(samples, size)
+    return np.log(u / (1 - u)).reshape((samples,) + shape)
+
+
 def positive_linear_similarity(x, y):
     """Returns a similarity value of two positive :class:`Real` numbers, scaled linearly by the larger of them.
 If *x* and *y* are equal the value is one, and otherwise a positive float less than one
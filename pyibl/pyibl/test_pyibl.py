@@ -1,6 +1,7 @@
 # Copyright 2014-2024 Carnegie Mellon University
 
 import math
+import numpy as np
 import pytest
 import random
 import re
@@ -480,17 +481,17 @@ def test_safe_risky():
     # Note that tiny changes to the code could change the values being asserted.
     with randomseed():
         x = safe_risky()
-        assert isclose(x, 0.25675)
+        assert isclose(x, 0.22525)
         x = safe_risky(optimized_learning=True)
-        assert isclose(x, 0.2215)
+        assert isclose(x, 0.21225)
         x = safe_risky(decay=2)
-        assert isclose(x, 0.1375)
+        assert isclose(x, 0.1225)
         x = safe_risky(temperature=1, noise=0)
-        assert isclose(x, 0.0865)
+        assert isclose(x, 0.082)
         x = safe_risky(risky_wins=0.6)
-        assert isclose(x, 0.3445)
+        assert isclose(x, 0.398)
         x = safe_risky(risky_wins=0.4)
-        assert isclose(x, 0.158)
+        assert isclose(x, 0.14625)
         results = []
         results.append(safe_risky())
         results.append(safe_risky(optimized_learning=True))
@@ -498,7 +499,7 @@ def test_safe_risky():
         results.append(safe_risky(temperature=1, noise=0))
         results.append(safe_risky(risky_wins=0.6))
         results.append(safe_risky(risky_wins=0.4))
-        assert all(isclose(r, x) for r, x in zip(results, [0.224, 0.313, 0.13325, 0.161, 0.38125, 0.135]))
+        assert all(isclose(r, x) for r, x in zip(results, [0.2815, 0.249, 0.13, 0.1485, 0.38025, 0.16925]))
 
 def form_choice(d):
     n = random.randrange(6)
@@ -666,7 +667,7 @@ def test_insider():
     # Note that tiny changes to the code could change the value being asserted.
     with randomseed():
         x = insider.run()
-        assert isclose(x, 0.6795)
+        assert isclose(x, 0.6835)
 
 def test_delayed_feedback():
     with randomseed():
@@ -787,6 +788,37 @@ def test_details():
     assert a.details[0] == "a"
     assert len(a.details) == 2
 
+def test_details_same_choices():
+    # Collecting details must not change the choices made.
+    cards = [(n, c) for n in range(1, 5) for c in "ryg"]
+    def run(collect):
+        with randomseed(3):
+            a = Agent(["n", "color"], mismatch_penalty=1)
+            a.populate(cards, 3.2)
+            a.similarity(["n"], bounded_linear_similarity(1, 4))
+            a.aggregate_details = collect
+            a.details = collect
+            choices = []
+            for p in range(5):
+                a.reset(True)
+                for r in range(8):
+                    choice = a.choose(cards)
+                    choices.append(choice)
+                    a.respond(int(choice[1] == "r") + (choice[0] == 1))
+            return choices, a
+    choices, a = run(False)
+    collected, b = run(True)
+    assert collected == choices
+    agg = b.aggregate_details
+    assert len(agg) == sum(len(d["activations"]) for det in b.details for d in det)
+    assert list(agg["choice"].iloc[:12]) == [choices[0]] * 12
+    for det in b.details:
+        for d in det:
+            assert isclose(sum(x["retrieval_probability"] for x in d["activations"]), 1)
+            assert isclose(sum(x["retrieval_probability"] * dict(x["attributes"])["_utility"]
+                               for x in d["activations"]),
+                           d["blended"])
+
 def test_trace(capsys):
     a = Agent(default_utility=10)
     a.choose("abcd")
@@ -812,6 +844,50 @@ def test_trace(capsys):
     a.noise = 0
     a.choose("abcd")            # shouldn't raise error with zero noise
 
+def test_trace_buffer(capsys, tmp_path):
+    def run(trace):
+        with randomseed(11):
+            a = Agent(["n", "color"], mismatch_penalty=1)
+            a.similarity(["n"], bounded_linear_similarity(1, 3))
+            a.populate([(1, "r"), (2, "y"), (3, "r")], 5)
+            a.trace = trace
+            for i in range(6):
+                a.choose([(1, "r"), (2, "y"), (3, "r")])
+                a.respond(i % 3)
+            return a
+    run(True)
+    printed = capsys.readouterr().out
+    buffer = TraceBuffer(4)
+    a = run(buffer)
+    assert capsys.readouterr().out == ""
+    assert a.trace is buffer and len(buffer) == 4 and buffer.capacity == 4
+    assert [d["decision"] for d in buffer] == [2, 3, 4, 5]
+    assert buffer[-1] is buffer[5]
+    with pytest.raises(IndexError):
+        buffer[1]
+    def without_ids(s):
+        # instances are numbered globally, so differ between runs
+        return re.sub(r"(?m)^[|+][^|+]*[|+]", "", s)
+    assert without_ids(printed).endswith(
+        without_ids("".join(render_trace(d) + "\n" for d in buffer)))
+    assert "mismatch adjustment" in render_trace(buffer[3])
+    d = buffer[3]
+    assert isinstance(d["references"], np.ndarray) and isinstance(d["records"], np.ndarray)
+    assert all(set(c) == {"query", "utility", "start", "stop"} for c in d["choices"])
+    buffer.save(tmp_path / "trace.jsonl")
+    loaded = TraceBuffer.load(tmp_path / "trace.jsonl")
+    assert len(loaded) == 4 and loaded.capacity is None
+    assert render_trace(loaded[3]) == render_trace(buffer[3])
+    for n in (2, 4, 5, -1, -4):
+        assert render_trace(TraceBuffer.read(tmp_path / "trace.jsonl", n)) == render_trace(buffer[n])
+    for n in (1, 6, -5):
+        with pytest.raises(IndexError):
+            TraceBuffer.read(tmp_path / "trace.jsonl", n)
+    buffer.clear()
+    assert len(buffer) == 0
+    with pytest.raises(ValueError):
+        TraceBuffer(0)
+
 def test_positive_linear_similarity():
     assert isclose(positive_linear_similarity(1, 2), 0.5)
     assert isclose(positive_linear_similarity(2, 1), 0.5)
@@ -977,6 +1053,112 @@ def test_fixed_noise():
     a.fixed_noise = True
     run_one(True)
 
+def test_choice_probabilities():
+    a = Agent(noise=0.5)
+    a.populate(["safe"], 3)
+    a.populate(["risky"], 0)
+    a.populate(["risky"], 10)
+    p = a.choice_probabilities(["safe", "risky"])
+    assert isclose(sum(p), 1)
+    assert a.choice_probabilities(["safe", "risky"]) == p
+    assert abs(a.choice_probabilities(["risky", "safe"])[1] - p[0]) < 0.02
+    random.seed(0)
+    n = 2000
+    chosen = 0
+    for i in range(n):
+        b = Agent(noise=0.5)
+        b.populate(["safe"], 3)
+        b.populate(["risky"], 0)
+        b.populate(["risky"], 10)
+        chosen += b.choose(["safe", "risky"]) == "safe"
+    assert abs(chosen / n - p[0]) < 0.05
+    assert a.choose(["safe", "risky"])
+    assert a.choice_probabilities() == p
+    a.respond(0, "risky")
+    assert a.choice_probabilities()[0] > p[0]
+    assert len(set(a.choice_probabilities(samples=8))) == 2
+    with pytest.raises(RuntimeError):
+        a.choice_probabilities(["safe", "other"])
+    a.default_utility = 20
+    assert a.choice_probabilities(["safe", "other"]) == [0, 1]
+    a.temperature = 1
+    a.noise = 0
+    assert a.choice_probabilities(["safe", "risky"]) == [1, 0]
+    a = Agent(default_utility=1)
+    assert a.choice_probabilities(["a", "b", "c", "d"]) == [0.25] * 4
+    with pytest.raises(ValueError):
+        a.choice_probabilities()
+    with pytest.raises(ValueError):
+        a.choice_probabilities(["a", "b"], 0)
+
+def test_choice_probabilities_memory():
+    import tracemalloc
+    a = Agent(noise=0.5)
+    a.populate(["safe", "risky"], 3)
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        for i in range(60):
+            a.choice_probabilities(["safe", "risky"])
+            a.choose(["safe", "risky"])
+            a.respond(random.random() * 4)
+        # each lattice is 1024 samples by 2 choices by up to 62 instances, about 1 MB
+        assert tracemalloc.get_traced_memory()[0] - before < 1_000_000
+    finally:
+        tracemalloc.stop()
+
+def test_population_agent():
+    with pytest.raises(ValueError):
+        PopulationAgent(0)
+    a = PopulationAgent(3, name="Population", default_utility=10)
+    assert a.population == 3 and a.name == "Population" and a.time == 0
+    with pytest.raises(ValueError):
+        a.choose()
+    with pytest.raises(RuntimeError):
+        a.respond(1)
+    c = a.choose(["left", "right"])
+    assert len(c) == 3 and set(c) <= {"left", "right"}
+    with pytest.raises(RuntimeError):
+        a.choose()
+    with pytest.raises(ValueError):
+        a.respond([1, 2])
+    a.respond([1, 2, 3], ["left", "left", "right"])
+    assert a.time == 1
+    c = a.choose()
+    assert list(c) == ["right", "right", "left"]
+    a.respond(0)
+    a = PopulationAgent(2)
+    with pytest.raises(RuntimeError):
+        a.choose(["a", "b"])
+    p = 25
+    a = PopulationAgent(p, ["x", "y"], noise=0, temperature=0.7, default_utility=5,
+                        default_utility_populates=True)
+    agents = [Agent(["x", "y"], noise=0, temperature=0.7, default_utility=5,
+                    default_utility_populates=True) for i in range(p)]
+    random.seed(3)
+    choices = [{"x": 1, "y": "a"}, {"x": 2, "y": "b"}, [3, "c"]]
+    for t in range(30):
+        chosen = a.choose(choices)
+        outcomes = [random.randrange(8) for i in range(p)]
+        for b, c, o in zip(agents, chosen, outcomes):
+            d = b.choose(choices, details=True)[1]
+            best = max(x["blended_value"] for x in d)
+            assert any(x["choice"] == c and isclose(x["blended_value"], best) for x in d)
+            b.respond(o, c)
+        a.respond(outcomes)
+    random.seed(7)
+    a = PopulationAgent(5000, default_utility=7.2)
+    a.populate(["safe"], 3)
+    for t in range(20):
+        risky = a.choose(["safe", "risky"]) == "risky"
+        payoffs = np.where(risky, np.where(np.random.random(a.population) < 0.5, 6, 0), 3)
+        a.respond(payoffs)
+    assert 0.05 < np.mean(risky) < 0.5
+    a.reset()
+    assert a.time == 0
+    with pytest.raises(ValueError):
+        a.choose()
+
 def test_similarity():
     def mismatch_value(agent, decision, chunk_name):
         activations = next(d for d in agent.details[-1]
@@ -1020,6 +1202,21 @@ def test_similarity():
     a.respond(0)
     assert mismatch_value(a, 1, "0000") is None
     assert mismatch_value(a, 2, "0001") is None
+    a = Agent("x y", mismatch_penalty=1)
+    a.similarity("x y", lambda v1, v2: 1 - abs(v1 - v2) / 10, domain=range(10))
+    Chunk._name_counter = 0
+    a.populate([{"x": 1, "y": 2}], 0)
+    a.populate([{"x": 3, "y": 7}], 0)
+    a.details = True
+    a.set_weights({"x": 2, "y": 0.5})
+    a.choose([{"x": 1, "y": 7}])
+    a.respond(0)
+    activations = a.details[-1][0]["activations"]
+    assert [d["name"] for d in activations] == ["0000", "0001"]
+    assert isclose(activations[0]["mismatch"], -0.25)
+    assert isclose(activations[1]["mismatch"], -0.4)
+    with pytest.raises(ValueError):
+        a.set_weights({"x": -1})
 
 def test_discrete_blend():
     a = Agent("a b", temperature=1, noise=0)
@@ -1267,6 +1464,104 @@ def test_aggregate():
     assert a.aggregate_details.shape == (9, 10)
 
 
+def test_aggregate_file(tmp_path, monkeypatch):
+    import pyibl
+    monkeypatch.setattr(pyibl, "AGGREGATE_CHUNK_ROWS", 100)
+    cards = [(n, c) for n in range(1, 4) for c in "ry"]
+    def run(aggregate):
+        with randomseed(5):
+            a = Agent(["n", "color"], mismatch_penalty=1)
+            a.populate(cards, 3)
+            a.aggregate_details = aggregate
+            for p in range(4):
+                a.reset(True)
+                for r in range(10):
+                    choice = a.choose(cards)
+                    a.respond(int(choice[1] == "r") + (0.5 if r == 6 and p == 2 else 0))
+                if p == 1:
+                    a.similarity(["n"], bounded_linear_similarity(1, 3))
+            return a
+    a = run(True)
+    b = run(tmp_path / "agg")
+    expected = a.aggregate_details
+    agg = b.aggregate_details
+    assert agg.shape == expected.shape and len(agg) > 100
+    assert list(agg.columns) == list(expected.columns)
+    assert list(agg["option"]) == list(expected["option"])
+    assert list(agg["choice"]) == list(expected["choice"])
+    for col in ("iteration", "time", "utility", "blended_value", "activation", "mismatch",
+                "n.similarity"):
+        assert np.allclose(agg[col].astype(float), expected[col].astype(float), equal_nan=True)
+    assert agg["time"].dtype == np.int64 and agg["utility"].dtype == np.float64
+    assert (tmp_path / "agg" / "meta.json").exists()
+    for kind in ("choice", "bv", "probability", "n.similarity"):
+        lines = [[(line.get_label(), list(line.get_xdata()), list(line.get_ydata()))
+                  for line in agent.plot(kind, show=False).axes[0].get_lines()]
+                 for agent in (a, b)]
+        assert [line[0] for line in lines[0]] == [line[0] for line in lines[1]]
+        for x, y in zip(*lines):
+            assert x[1] == y[1] and np.allclose(x[2], y[2], equal_nan=True)
+    b.aggregate_details = tmp_path / "agg"
+    assert len(b.aggregate_details) == 0
+    other = tmp_path / "other"
+    other.mkdir()
+    (other / "data.bin").write_bytes(b"precious")
+    with pytest.raises(ValueError):
+        b.aggregate_details = other
+    (other / "meta.json").write_text('{"rows": 3}')
+    with pytest.raises(ValueError):
+        b.aggregate_details = other
+    assert (other / "data.bin").read_bytes() == b"precious"
+    (tmp_path / "agg" / "notes.bin").write_bytes(b"keep")
+    b.aggregate_details = tmp_path / "agg"
+    assert (tmp_path / "agg" / "notes.bin").read_bytes() == b"keep"
+
+def test_aggregate_statistics():
+    cards = [(n, c) for n in range(1, 4) for c in "ry"]
+    def run(details, statistics):
+        with randomseed(7):
+            a = Agent(["n", "color"], mismatch_penalty=1)
+            a.populate(cards, 3)
+            a.aggregate_details = details
+            a.aggregate_statistics = statistics
+            for p in range(5):
+                a.reset(True)
+                for r in range(12):
+                    choice = a.choose(cards)
+                    a.respond(int(choice[1] == "r") + (0.5 if r == 6 and p == 2 else 0))
+                if p == 1:
+                    a.similarity(["n"], bounded_linear_similarity(1, 3))
+            return a
+    a = run(True, False)
+    b = run(False, True)
+    assert a.aggregate_statistics is None and b.aggregate_details is None
+    details = a.aggregate_details
+    stats = b.aggregate_statistics
+    assert list(stats.columns) == ["option", "utility", "time", "count", "blended_value",
+                                   "retrieval_probability", "activation",
+                                   "base_level_activation", "activation_noise",
+                                   "mismatch", "n.similarity"]
+    assert len(stats) == len(details.groupby(["option", "utility", "time"]))
+    assert stats["count"].sum() == len(details)
+    row = stats.iloc[-1]
+    d = details[(details.option == row.option) & (details.utility == row.utility)
+                & (details.time == row.time)]
+    assert row["count"] == len(d)
+    assert isclose(row["activation"], d["activation"].mean())
+    for kind in ("choice", "bv", "probability", "activation", "mismatch", "n.similarity"):
+        for earliest, latest in ((None, None), (4, 9)):
+            lines = [[(line.get_label(), list(line.get_xdata()), list(line.get_ydata()))
+                      for line in agent.plot(kind, earliest=earliest, latest=latest,
+                                             show=False).axes[0].get_lines()]
+                     for agent in (a, b)]
+            assert [line[0] for line in lines[0]] == [line[0] for line in lines[1]]
+            for x, y in zip(*lines):
+                assert x[1] == y[1] and np.allclose(x[2], y[2], equal_nan=True)
+    with pytest.raises(ValueError):
+        b.plot("color.similarity", show=False)
+    b.aggregate_statistics = True
+    assert len(b.aggregate_statistics) == 0
+
 def test_plot():
     def run_model(agent):
         agent.populate(["s", "r"], 3.2)